@@ -10,6 +10,7 @@ from pathlib import Path
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import partial
 import json
 
 # Add parent directory to path to import clustering module
@@ -45,7 +46,15 @@ class BatchRunResponse(BaseModel):
 @router.post("/batch/run", response_model=BatchRunResponse)
 async def run_batch(
     background_tasks: BackgroundTasks,
-    use_category_clustering: bool = Query(True, description="Use category-based clustering (recommended)")
+    use_category_clustering: bool = Query(True, description="Use category-based clustering (recommended)"),
+    n_clusters: int = Query(6, ge=2, le=50, description="Number of clusters (ignored when auto_k is true)"),
+    auto_k: bool = Query(False, description="Pick k automatically with a parallel sweep over [k_min, k_max]"),
+    k_min: int = Query(2, ge=2, le=50, description="Smallest k tried by the automatic selection"),
+    k_max: int = Query(10, ge=2, le=50, description="Largest k tried by the automatic selection"),
+    warm_start: bool = Query(False, description="Seed K-Means with the previous run's centroids"),
+    mode: str = Query("full", pattern="^(full|assign_only)$", description="full: refit the model | assign_only: reuse the saved model for new/changed customers only"),
+    backend: str = Query("auto", pattern="^(auto|lloyd|elkan|minibatch|sampled)$", description="Clustering backend; auto picks one from the number of customers and features"),
+    reduce_features: bool = Query(True, description="Drop near-constant/redundant category features and reduce with PCA before clustering")
 ):
     """
     Run batch processing for customer clustering and service assignment.
@@ -53,7 +62,21 @@ async def run_batch(
     Args:
         use_category_clustering: If True, uses category-based clustering (transaction/product categories).
                                  If False, uses aggregated numeric features clustering.
+        n_clusters: Number of clusters for category-based clustering.
+        auto_k: If True, fits every k in [k_min, k_max] in parallel and keeps the best one.
+        warm_start: If True, starts from the previous run's centroids (faster, more stable labels).
+        mode: "assign_only" skips refitting: new/changed customers are assigned with the saved
+              model and everyone else is carried forward from the last successful run.
+        backend: Clustering engine backend (lloyd, elkan, minibatch or sampled fit + full assign).
+                 "auto" uses sampled/mini-batch fits for large customer bases and Elkan for
+                 low-dimensional data.
+        reduce_features: Category clustering only. Drops near-constant and highly correlated
+                         features, then projects onto the principal components explaining 95%
+                         of the variance.
     """
+    if auto_k and k_min > k_max:
+        raise HTTPException(status_code=400, detail="k_min must be less than or equal to k_max")
+    
     try:
         # Check if required packages are available
         try:
@@ -77,16 +100,46 @@ async def run_batch(
         start_time = time.time()
         
         try:
-            if use_category_clustering:
+            if mode == "assign_only":
+                # Delta run with the saved model (no refit)
+                from implement_best_clustering_categories import run_assign_only
+                
+                if hasattr(asyncio, 'to_thread'):
+                    assign_result = await asyncio.to_thread(run_assign_only)
+                else:
+                    loop = asyncio.get_event_loop()
+                    assign_result = await loop.run_in_executor(executor, run_assign_only)
+                
+                result = {
+                    'run_id': assign_result['run_id'],
+                    'status': assign_result['status'],
+                    'customers_processed': assign_result['n_customers'],
+                    'clusters_count': assign_result['n_clusters'],
+                    'message': (
+                        f'Assigned {assign_result["n_reassigned"]} new/changed customers with the saved model; '
+                        f'carried forward the rest from run {assign_result["base_run_id"]}'
+                    )
+                }
+            elif use_category_clustering:
                 # Use category-based clustering (recommended)
                 from implement_best_clustering_categories import run_clustering
                 
+                clustering_job = partial(
+                    run_clustering,
+                    n_clusters=n_clusters,
+                    save_to_db=True,
+                    k_range=(k_min, k_max) if auto_k else None,
+                    warm_start=warm_start,
+                    backend=backend,
+                    reduce_features=reduce_features
+                )
+                
                 # Run clustering (it will create batch_runs entry internally)
                 if hasattr(asyncio, 'to_thread'):
-                    clustering_result = await asyncio.to_thread(run_clustering, n_clusters=6, save_to_db=True)
+                    clustering_result = await asyncio.to_thread(clustering_job)
                 else:
                     loop = asyncio.get_event_loop()
-                    clustering_result = await loop.run_in_executor(executor, run_clustering, 6, True)
+                    clustering_result = await loop.run_in_executor(executor, clustering_job)
                 
                 # Convert to batch run format
                 result = {
@@ -100,11 +153,12 @@ async def run_batch(
                 # Use aggregated features clustering (original method)
                 from customer_clustering import run_batch_processing
                 
+                batch_job = partial(run_batch_processing, backend=backend)
                 if hasattr(asyncio, 'to_thread'):
-                    result = await asyncio.to_thread(run_batch_processing)
+                    result = await asyncio.to_thread(batch_job)
                 else:
                     loop = asyncio.get_event_loop()
-                    result = await loop.run_in_executor(executor, run_batch_processing)
+                    result = await loop.run_in_executor(executor, batch_job)
             
             elapsed = time.time() - start_time
             print("=" * 50)
@@ -138,6 +192,44 @@ async def run_batch(
         )
 
 
+@router.post("/batch/k-selection")
+async def run_k_selection(
+    k_min: int = Query(2, ge=2, le=50, description="Smallest k to evaluate"),
+    k_max: int = Query(10, ge=2, le=50, description="Largest k to evaluate")
+):
+    """
+    Evaluate category-based clustering for every k in [k_min, k_max] without saving a run.
+    Features are loaded once and all k are fitted in parallel; returns the metric curve.
+    """
+    if k_min > k_max:
+        raise HTTPException(status_code=400, detail="k_min must be less than or equal to k_max")
+    
+    try:
+        from implement_best_clustering_categories import run_clustering
+        
+        sweep_job = partial(run_clustering, save_to_db=False, k_range=(k_min, k_max), select_best_k=False)
+        if hasattr(asyncio, 'to_thread'):
+            result = await asyncio.to_thread(sweep_job)
+        else:
+            loop = asyncio.get_event_loop()
+            result = await loop.run_in_executor(executor, sweep_job)
+        
+        return {
+            "best_k": result['best_k'],
+            "n_customers": result['n_customers'],
+            "n_features": result['n_features'],
+            "curve": result['k_curve']
+        }
+    except Exception as e:
+        import traceback
+        print("=" * 50)
+        print("K SELECTION ERROR:")
+        print("=" * 50)
+        print(traceback.format_exc())
+        print("=" * 50)
+        raise HTTPException(status_code=500, detail=f"K selection failed: {str(e)}")
+
+
 @router.get("/batch/last-run")
 async def get_last_run():
     """
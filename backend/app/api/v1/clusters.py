@@ -19,6 +19,11 @@ mentioned in the report/presentation as non-functional requirements.
 from fastapi import APIRouter, HTTPException, Query
 from typing import Optional, List, Dict
 from app.db import get_conn
+from app.services.recommendation_store import render_explanation
+from app.services.multi_view_clustering import get_customer_views
+from app.services.cluster_profiles import profiles_by_cluster
+from app.core.product_catalog import PRODUCTS, CATALOG, SWITCH_PRODUCTS
+from app.services.text_classifier import PROFESSION_CLASSIFIER
 import json
 
 router = APIRouter()
@@ -151,7 +156,8 @@ async def get_cluster_summary(run_id: int):
                 SELECT 
                     cluster_id,
                     COUNT(*) as customer_count,
-                    AVG(distance_to_centroid) as avg_distance
+                    AVG(distance_to_centroid) as avg_distance,
+                    AVG(centroid_margin) as avg_margin
                 FROM customer_clusters
                 WHERE run_id = ?
                 GROUP BY cluster_id
@@ -163,7 +169,8 @@ async def get_cluster_summary(run_id: int):
                 clusters.append({
                     "cluster_id": row['cluster_id'],
                     "customer_count": row['customer_count'],
-                    "avg_distance": row['avg_distance']
+                    "avg_distance": row['avg_distance'],
+                    "avg_margin": row['avg_margin']
                 })
             
             print(f"[CLUSTERS API] Found {len(clusters)} clusters for run {run_id}")
@@ -307,12 +314,75 @@ async def get_cluster_summary(run_id: int):
         raise HTTPException(status_code=500, detail=f"Error loading cluster summary: {str(e)}")
 
 
+@router.get("/clusters/{run_id}/profiles")
+async def get_cluster_profiles(
+    run_id: int,
+    cluster_id: Optional[int] = Query(None, description="Only this cluster (default: all clusters)"),
+    top_n: int = Query(5, ge=1, le=100, description="Most differentiating features per cluster")
+):
+    """
+    Precomputed feature profile of every cluster of a run: the top_n features that
+    set the cluster apart (largest standardized centroid delta) with their mean and
+    quartiles in the cluster next to the overall mean.
+    
+    Returns 404 if run_id does not exist in batch_runs table.
+    Returns a warning if the run has no stored profiles (older runs).
+    """
+    try:
+        conn = get_conn()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id FROM batch_runs WHERE id = ?", (run_id,))
+            if not cursor.fetchone():
+                raise HTTPException(status_code=404, detail=f"Batch run {run_id} not found")
+            
+            if cluster_id is not None:
+                cursor.execute("""
+                    SELECT * FROM cluster_feature_profiles
+                    WHERE run_id = ? AND cluster_id = ? AND rank <= ?
+                    ORDER BY rank
+                """, (run_id, cluster_id, top_n))
+            else:
+                cursor.execute("""
+                    SELECT * FROM cluster_feature_profiles
+                    WHERE run_id = ? AND rank <= ?
+                    ORDER BY cluster_id, rank
+                """, (run_id, top_n))
+            clusters = list(profiles_by_cluster(cursor.fetchall()).values())
+            
+            warnings = []
+            if not clusters:
+                warnings.append("No cluster profiles stored for this run. Re-run the clustering batch to compute them.")
+            
+            return {
+                "run_id": run_id,
+                "top_n": top_n,
+                "clusters": clusters,
+                "warnings": warnings
+            }
+        finally:
+            conn.close()
+    except HTTPException:
+        raise
+    except Exception as e:
+        import traceback
+        error_trace = traceback.format_exc()
+        print(f"Error in get_cluster_profiles: {e}")
+        print(error_trace)
+        raise HTTPException(status_code=500, detail=f"Error loading cluster profiles: {str(e)}")
+
+
 @router.get("/clusters/{run_id}/customers")
 async def get_cluster_customers(
     run_id: int,
     cluster_id: Optional[int] = Query(None, description="Filter by cluster ID"),
     limit: int = Query(100, ge=1, le=1000, description="Maximum number of customers to return"),
-    offset: int = Query(0, ge=0, description="Offset for pagination")
+    offset: int = Query(0, ge=0, description="Offset for pagination"),
+    order: str = Query(
+        "representative",
+        pattern="^(representative|borderline)$",
+        description="representative: closest to the centroid first; borderline: smallest margin to the next cluster first"
+    )
 ):
     """
     Get customers and their cluster assignments for a specific run.
@@ -330,12 +400,17 @@ async def get_cluster_customers(
             if not cursor.fetchone():
                 raise HTTPException(status_code=404, detail=f"Batch run {run_id} not found")
             
+            # Both orderings are served by the (run_id, cluster_id, rank/margin) indexes
+            order_column = "cc.centroid_rank" if order == "representative" else "cc.centroid_margin"
+            
             if cluster_id is not None:
-                cursor.execute("""
+                cursor.execute(f"""
                     SELECT 
                         cc.customer_id,
                         cc.cluster_id,
                         cc.distance_to_centroid,
+                        cc.centroid_rank,
+                        cc.centroid_margin,
                         c.first_name,
                         c.last_name,
                         c.annual_income,
@@ -344,15 +419,17 @@ async def get_cluster_customers(
                     FROM customer_clusters cc
                     JOIN customers c ON cc.customer_id = c.customer_id
                     WHERE cc.run_id = ? AND cc.cluster_id = ?
-                    ORDER BY cc.distance_to_centroid
+                    ORDER BY {order_column}
                     LIMIT ? OFFSET ?
                 """, (run_id, cluster_id, limit, offset))
             else:
-                cursor.execute("""
+                cursor.execute(f"""
                     SELECT 
                         cc.customer_id,
                         cc.cluster_id,
                         cc.distance_to_centroid,
+                        cc.centroid_rank,
+                        cc.centroid_margin,
                         c.first_name,
                         c.last_name,
                         c.annual_income,
@@ -361,7 +438,7 @@ async def get_cluster_customers(
                     FROM customer_clusters cc
                     JOIN customers c ON cc.customer_id = c.customer_id
                     WHERE cc.run_id = ?
-                    ORDER BY cc.cluster_id, cc.distance_to_centroid
+                    ORDER BY cc.cluster_id, {order_column}
                     LIMIT ? OFFSET ?
                 """, (run_id, limit, offset))
             
@@ -371,6 +448,8 @@ async def get_cluster_customers(
                     "customer_id": row['customer_id'],
                     "cluster_id": row['cluster_id'],
                     "distance_to_centroid": row['distance_to_centroid'],
+                    "centroid_rank": row['centroid_rank'],
+                    "centroid_margin": row['centroid_margin'],
                     "first_name": row['first_name'],
                     "last_name": row['last_name'],
                     "annual_income": row['annual_income'],
@@ -451,8 +530,9 @@ async def get_cluster_recommendations(
                     r.product_code,
                     r.acceptance_prob,
                     r.expected_revenue,
-                    re.narrative,
-                    re.key_factors_json
+                    COALESCE(re.narrative, et.narrative) as narrative,
+                    COALESCE(re.key_factors_json, et.key_factors_json) as key_factors_json,
+                    r.explanation_params_json
             """
             
             if status_fields:
@@ -483,6 +563,7 @@ async def get_cluster_recommendations(
                 query = base_select + status_select + """
                     FROM recommendations r
                     LEFT JOIN recommendation_explanations re ON r.id = re.recommendation_id
+                    LEFT JOIN explanation_templates et ON et.id = r.explanation_template_id
                     WHERE r.run_id = ? AND r.customer_id = ?
                     ORDER BY r.acceptance_prob DESC
                     LIMIT ? OFFSET ?
@@ -493,6 +574,7 @@ async def get_cluster_recommendations(
                 query = base_select + status_select + """
                     FROM recommendations r
                     LEFT JOIN recommendation_explanations re ON r.id = re.recommendation_id
+                    LEFT JOIN explanation_templates et ON et.id = r.explanation_template_id
                     WHERE r.run_id = ?
                     ORDER BY r.acceptance_prob DESC
                     LIMIT ? OFFSET ?
@@ -506,10 +588,13 @@ async def get_cluster_recommendations(
             recommendations = []
             for row in rows:
                 try:
+                    narrative, key_factors_json = render_explanation(
+                        row['narrative'], row['key_factors_json'], row['explanation_params_json']
+                    )
                     key_factors = {}
-                    if row['key_factors_json']:
+                    if key_factors_json:
                         try:
-                            key_factors = json.loads(row['key_factors_json'])
+                            key_factors = json.loads(key_factors_json)
                         except:
                             pass
                     
@@ -563,8 +648,8 @@ async def get_cluster_recommendations(
                         "product_code": row['product_code'],
                         "acceptance_probability": row['acceptance_prob'],
                         "expected_revenue": row['expected_revenue'],
-                        "narrative": edited_narrative if edited_narrative else row['narrative'],
-                        "original_narrative": row['narrative'],
+                        "narrative": edited_narrative if edited_narrative else narrative,
+                        "original_narrative": narrative,
                         "is_edited": edited_narrative is not None,
                         "key_factors": key_factors,
                         "model_confidence": "high" if row['acceptance_prob'] > 0.7 else "medium" if row['acceptance_prob'] > 0.5 else "low",
@@ -762,9 +847,10 @@ async def get_recommendation_detail(recommendation_id: int):
                     r.dismissed_by,
                     r.dismissed_reason,
                     r.created_at,
-                    re.narrative,
-                    re.key_factors_json,
-                    re.model_name,
+                    COALESCE(re.narrative, et.narrative) as narrative,
+                    COALESCE(re.key_factors_json, et.key_factors_json) as key_factors_json,
+                    COALESCE(re.model_name, et.model_name) as model_name,
+                    r.explanation_params_json,
                     c.first_name,
                     c.last_name,
                     c.birth_date,
@@ -775,6 +861,7 @@ async def get_recommendation_detail(recommendation_id: int):
                     cc.cluster_id
                 FROM recommendations r
                 LEFT JOIN recommendation_explanations re ON r.id = re.recommendation_id
+                LEFT JOIN explanation_templates et ON et.id = r.explanation_template_id
                 LEFT JOIN customers c ON r.customer_id = c.customer_id
                 LEFT JOIN customer_clusters cc ON r.customer_id = cc.customer_id AND r.run_id = cc.run_id
                 WHERE r.id = ?
@@ -784,10 +871,13 @@ async def get_recommendation_detail(recommendation_id: int):
             if not row:
                 raise HTTPException(status_code=404, detail=f"Recommendation {recommendation_id} not found")
             
+            narrative, key_factors_json = render_explanation(
+                row['narrative'], row['key_factors_json'], row['explanation_params_json']
+            )
             key_factors = {}
-            if row['key_factors_json']:
+            if key_factors_json:
                 try:
-                    key_factors = json.loads(row['key_factors_json'])
+                    key_factors = json.loads(key_factors_json)
                 except:
                     pass
             
@@ -857,8 +947,8 @@ async def get_recommendation_detail(recommendation_id: int):
                     "status": row['status'] or 'pending',
                 },
                 "ai_explanation": {
-                    "narrative": row['edited_narrative'] or row['narrative'] or "No explanation available",
-                    "original_narrative": row['narrative'],
+                    "narrative": row['edited_narrative'] or narrative or "No explanation available",
+                    "original_narrative": narrative,
                     "key_factors": key_factors,
                 },
                 "model_name": row['model_name'],
@@ -1073,10 +1163,12 @@ async def get_customer_recommendations(
                         r.edited_narrative,
                         r.sent_at,
                         r.dismissed_at,
-                        re.narrative as original_narrative,
-                        re.key_factors_json
+                        COALESCE(re.narrative, et.narrative) as original_narrative,
+                        COALESCE(re.key_factors_json, et.key_factors_json) as key_factors_json,
+                        r.explanation_params_json
                     FROM recommendations r
                     LEFT JOIN recommendation_explanations re ON r.id = re.recommendation_id
+                    LEFT JOIN explanation_templates et ON et.id = r.explanation_template_id
                     WHERE r.customer_id = ? AND r.run_id = ?
                     ORDER BY r.acceptance_prob DESC
                 """, (customer_id, run_id))
@@ -1092,20 +1184,25 @@ async def get_customer_recommendations(
                         r.edited_narrative,
                         r.sent_at,
                         r.dismissed_at,
-                        re.narrative as original_narrative,
-                        re.key_factors_json
+                        COALESCE(re.narrative, et.narrative) as original_narrative,
+                        COALESCE(re.key_factors_json, et.key_factors_json) as key_factors_json,
+                        r.explanation_params_json
                     FROM recommendations r
                     LEFT JOIN recommendation_explanations re ON r.id = re.recommendation_id
+                    LEFT JOIN explanation_templates et ON et.id = r.explanation_template_id
                     WHERE r.customer_id = ?
                     ORDER BY r.run_id DESC, r.acceptance_prob DESC
                 """, (customer_id,))
             
             recommendations = []
             for row in cursor.fetchall():
+                original_narrative, key_factors_json = render_explanation(
+                    row['original_narrative'], row['key_factors_json'], row['explanation_params_json']
+                )
                 key_factors = {}
-                if row['key_factors_json']:
+                if key_factors_json:
                     try:
-                        key_factors = json.loads(row['key_factors_json'])
+                        key_factors = json.loads(key_factors_json)
                     except:
                         pass
                 
@@ -1116,7 +1213,7 @@ async def get_customer_recommendations(
                     "acceptance_probability": row['acceptance_prob'],
                     "expected_revenue": row['expected_revenue'],
                     "status": row['status'],
-                    "narrative": row['edited_narrative'] or row['original_narrative'],
+                    "narrative": row['edited_narrative'] or original_narrative,
                     "is_edited": row['edited_narrative'] is not None,
                     "key_factors": key_factors,
                     "sent_at": row['sent_at'],
@@ -1136,6 +1233,100 @@ async def get_customer_recommendations(
         raise HTTPException(status_code=500, detail=f"Error loading customer recommendations: {str(e)}")
 
 
+@router.get("/customers/{customer_id}/clusters")
+async def get_customer_clusters(
+    customer_id: str,
+    run_id: Optional[int] = Query(None, description="Batch run ID (default: latest run with cluster views)")
+):
+    """
+    Category, client type and time pattern cluster of a customer, in the
+    'clusters' shape the profile agent expects.
+    """
+    try:
+        conn = get_conn()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT customer_id FROM customers WHERE customer_id = ?", (customer_id,))
+            if not cursor.fetchone():
+                raise HTTPException(status_code=404, detail=f"Customer {customer_id} not found")
+            
+            view_run_id, clusters = get_customer_views(conn, customer_id, run_id)
+            if view_run_id is None or all(value is None for value in clusters.values()):
+                raise HTTPException(status_code=404, detail=f"No cluster views for customer {customer_id}")
+            
+            return {"customer_id": customer_id, "run_id": view_run_id, "clusters": clusters}
+        finally:
+            conn.close()
+    except HTTPException:
+        raise
+    except Exception as e:
+        import traceback
+        error_trace = traceback.format_exc()
+        print(f"Error in get_customer_clusters: {e}")
+        print(error_trace)
+        raise HTTPException(status_code=500, detail=f"Error loading customer clusters: {str(e)}")
+
+
+@router.get("/customers/{customer_id}/time-profile")
+async def get_customer_time_profile(
+    customer_id: str,
+    run_id: Optional[int] = Query(None, description="Batch run ID (default: latest run with time profiles)")
+):
+    """
+    Time-pattern profile fields of a customer, precomputed by the batch, in the
+    'transaction_patterns' / 'financial_metrics' shape the profile agent expects.
+    """
+    try:
+        conn = get_conn()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT customer_id FROM customers WHERE customer_id = ?", (customer_id,))
+            if not cursor.fetchone():
+                raise HTTPException(status_code=404, detail=f"Customer {customer_id} not found")
+            
+            if run_id:
+                cursor.execute("""
+                    SELECT * FROM customer_time_profiles
+                    WHERE customer_id = ? AND run_id = ?
+                """, (customer_id, run_id))
+            else:
+                cursor.execute("""
+                    SELECT * FROM customer_time_profiles
+                    WHERE customer_id = ?
+                    ORDER BY run_id DESC
+                    LIMIT 1
+                """, (customer_id,))
+            row = cursor.fetchone()
+            if not row:
+                raise HTTPException(status_code=404, detail=f"No time profile for customer {customer_id}")
+            
+            return {
+                "customer_id": customer_id,
+                "run_id": row['run_id'],
+                "transaction_patterns": {
+                    "most_active_day": row['most_active_day'],
+                    "most_active_time": row['most_active_time'],
+                    "most_active_hour": row['most_active_hour'],
+                    "hour_concentration": row['hour_concentration'],
+                    "day_concentration": row['day_concentration']
+                },
+                "financial_metrics": {
+                    "spending_concentration": row['spending_concentration'],
+                    "spending_volatility": row['spending_volatility']
+                }
+            }
+        finally:
+            conn.close()
+    except HTTPException:
+        raise
+    except Exception as e:
+        import traceback
+        error_trace = traceback.format_exc()
+        print(f"Error in get_customer_time_profile: {e}")
+        print(error_trace)
+        raise HTTPException(status_code=500, detail=f"Error loading customer time profile: {str(e)}")
+
+
 @router.get("/recommendations/{recommendation_id}/suggest-services")
 async def get_ai_service_suggestions(recommendation_id: int):
     """
@@ -1156,7 +1347,7 @@ async def get_ai_service_suggestions(recommendation_id: int):
                     r.run_id,
                     c.annual_income,
                     c.profession,
-                    c.age,
+                    CAST((julianday('now') - julianday(c.birth_date)) / 365.25 AS INTEGER) as age,
                     cc.cluster_id
                 FROM recommendations r
                 JOIN customers c ON r.customer_id = c.customer_id
@@ -1198,99 +1389,31 @@ async def get_ai_service_suggestions(recommendation_id: int):
             balance_row = cursor.fetchone()
             total_balance = balance_row['total_balance'] or 0
             
-            # Define all available service types
-            all_services = {
-                "PREMIUM_INVESTMENT": {
-                    "name": "Premium Investment Portfolio",
-                    "category": "Investment",
-                    "base_prob": 0.85,
-                    "base_revenue": 5000.0,
-                    "requirements": {"min_income": 50000, "min_balance": 100000}
-                },
-                "WEALTH_MANAGEMENT": {
-                    "name": "Wealth Management Service",
-                    "category": "Investment",
-                    "base_prob": 0.75,
-                    "base_revenue": 3000.0,
-                    "requirements": {"min_income": 50000, "min_balance": 100000}
-                },
-                "REWARDS_CREDIT": {
-                    "name": "Rewards Credit Card",
-                    "category": "Credit",
-                    "base_prob": 0.70,
-                    "base_revenue": 800.0,
-                    "requirements": {"min_transactions": 50}
-                },
-                "PERSONAL_LOAN": {
-                    "name": "Personal Loan",
-                    "category": "Credit",
-                    "base_prob": 0.60,
-                    "base_revenue": 2000.0,
-                    "requirements": {"max_balance": 10000, "min_spending": 50000}
-                },
-                "SAVINGS_PLAN": {
-                    "name": "Savings Plan",
-                    "category": "Savings",
-                    "base_prob": 0.65,
-                    "base_revenue": 500.0,
-                    "requirements": {"max_age": 35, "min_income": 30000}
-                },
-                "BASIC_CHECKING": {
-                    "name": "Enhanced Checking Account",
-                    "category": "Account",
-                    "base_prob": 0.50,
-                    "base_revenue": 200.0,
-                    "requirements": {}
-                },
-                "BUSINESS_ACCOUNT": {
-                    "name": "Business Account",
-                    "category": "Account",
-                    "base_prob": 0.65,
-                    "base_revenue": 1500.0,
-                    "requirements": {"min_income": 40000}
-                },
-                "MORTGAGE": {
-                    "name": "Mortgage Loan",
-                    "category": "Credit",
-                    "base_prob": 0.55,
-                    "base_revenue": 10000.0,
-                    "requirements": {"min_income": 35000}
-                }
-            }
+            # Fit of every switchable service, from the catalog's compiled requirements
+            fit_scores = 0.5 + CATALOG.requirement_fit({
+                "annual_income": [annual_income],
+                "total_balance": [total_balance],
+                "transaction_count": [transaction_count],
+                "total_spent": [total_spent],
+                "age": [age]
+            }, SWITCH_PRODUCTS)[0]
             
             # AI-powered suggestions: Calculate improved acceptance probabilities
             suggestions = []
-            for product_code, service_info in all_services.items():
+            profession_labels = PROFESSION_CLASSIFIER.classify(profession)
+            for product_code, fit_score in zip(SWITCH_PRODUCTS, fit_scores.tolist()):
                 if product_code == current_product:
                     continue  # Skip current product
-                
-                # Calculate fit score based on customer profile
-                fit_score = 0.5  # Base score
-                
-                # Check requirements and adjust fit
-                reqs = service_info.get("requirements", {})
-                if "min_income" in reqs and annual_income >= reqs["min_income"]:
-                    fit_score += 0.15
-                if "min_balance" in reqs and total_balance >= reqs["min_balance"]:
-                    fit_score += 0.15
-                if "min_transactions" in reqs and transaction_count >= reqs["min_transactions"]:
-                    fit_score += 0.15
-                if "min_spending" in reqs and total_spent >= reqs["min_spending"]:
-                    fit_score += 0.10
-                if "max_age" in reqs and age <= reqs["max_age"]:
-                    fit_score += 0.10
-                if "max_balance" in reqs and total_balance <= reqs["max_balance"]:
-                    fit_score += 0.10
+                service_info = PRODUCTS[product_code]
                 
                 # Adjust based on profession keywords
-                profession_lower = profession.lower()
-                if "business" in profession_lower and "BUSINESS" in product_code:
+                if "business" in profession_labels and "BUSINESS" in product_code:
                     fit_score += 0.10
-                if any(word in profession_lower for word in ["manager", "director", "executive"]) and "PREMIUM" in product_code:
+                if "executive" in profession_labels and "PREMIUM" in product_code:
                     fit_score += 0.10
                 
                 # Calculate improved acceptance probability
-                base_prob = service_info["base_prob"]
+                base_prob = service_info["switch_prob"]
                 improved_prob = min(0.95, base_prob * (0.7 + fit_score * 0.3))
                 
                 # Calculate probability improvement vs current
@@ -1303,7 +1426,7 @@ async def get_ai_service_suggestions(recommendation_id: int):
                         "product_name": service_info["name"],
                         "category": service_info["category"],
                         "acceptance_probability": round(improved_prob, 3),
-                        "expected_revenue": service_info["base_revenue"],
+                        "expected_revenue": service_info["switch_revenue"],
                         "probability_improvement": round(prob_improvement, 3),
                         "fit_score": round(fit_score, 2),
                         "reason": _generate_suggestion_reason(product_code, annual_income, total_balance, transaction_count, age, profession)
@@ -1315,7 +1438,7 @@ async def get_ai_service_suggestions(recommendation_id: int):
             return {
                 "current_product": current_product,
                 "current_acceptance_probability": current_prob,
-                "available_services": list(all_services.keys()),
+                "available_services": SWITCH_PRODUCTS,
                 "suggestions": suggestions[:5],  # Top 5 suggestions
                 "customer_profile": {
                     "annual_income": annual_income,
@@ -1361,7 +1484,7 @@ def _generate_suggestion_reason(product_code, income, balance, tx_count, age, pr
         if income > 30000:
             reasons.append("Growing income potential")
     elif "BUSINESS" in product_code:
-        if "business" in profession.lower():
+        if PROFESSION_CLASSIFIER.matches(profession, "business"):
             reasons.append("Business professional")
     
     if not reasons:
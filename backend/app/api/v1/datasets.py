@@ -13,6 +13,7 @@ from fastapi.responses import JSONResponse
 
 from app.core.config import settings
 from app.db import get_conn  # create this helper (sqlite connection) as shown earlier
+from app.services.service_summary import get_services_summary, invalidate_services_summary
 
 router = APIRouter(tags=["datasets"])
 
@@ -66,6 +67,9 @@ COLUMN_MAPPING: Dict[str, Dict[str, str]] = {
         "data": "tx_date",
         "date": "tx_date",
         "tx_date": "tx_date",
+        "ora": "tx_time",
+        "time": "tx_time",
+        "tx_time": "tx_time",
         "importo": "amount",
         "amount": "amount",
         "valore": "amount",
@@ -209,6 +213,29 @@ def _map_csv_to_db_columns(csv_columns: List[str], table_name: str, allowed_cols
     return result
 
 
+_TIMESTAMP_FORMATS = ["%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%dT%H:%M", "%Y-%m-%d"]
+
+
+def _split_timestamp(value: str) -> tuple:
+    """Split a movimenti timestamp into (YYYY-MM-DD, HH:MM:SS or None); unparseable -> (value, None)."""
+    text = value[:19] if len(value) > 19 else value  # drop fractional seconds / timezone
+    for fmt in _TIMESTAMP_FORMATS:
+        try:
+            dt = datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+        has_time = "%H" in fmt
+        return dt.strftime("%Y-%m-%d"), dt.strftime("%H:%M:%S") if has_time else None
+    return value, None
+
+
+def _timestamp_columns(column_mapping: Dict[str, str], allowed_cols: List[str]) -> List[str]:
+    """DB columns filled from a movimenti timestamp: tx_date, plus tx_time when the table has it."""
+    if column_mapping.get("timestamp") != "tx_date":
+        return []
+    return ["tx_date"] + (["tx_time"] if "tx_time" in allowed_cols else [])
+
+
 def _sanitize_row(row: Dict[str, str], column_mapping: Dict[str, str], allowed_cols: List[str]) -> Dict[str, Any]:
     """Sanitize and map CSV row to database columns."""
     out: Dict[str, Any] = {}
@@ -216,22 +243,13 @@ def _sanitize_row(row: Dict[str, str], column_mapping: Dict[str, str], allowed_c
         if db_col in allowed_cols and csv_col in row:
             v = row[csv_col]
             vv = v.strip() if isinstance(v, str) else v
-            # Handle date conversion for timestamp -> tx_date
-            if db_col == "tx_date" and csv_col == "timestamp":
-                # Try to extract date from timestamp (assuming ISO format or similar)
-                try:
-                    from datetime import datetime
-                    if isinstance(vv, str):
-                        # Try parsing common timestamp formats
-                        for fmt in ["%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d"]:
-                            try:
-                                dt = datetime.strptime(vv.split()[0] if " " in vv else vv, fmt)
-                                vv = dt.strftime("%Y-%m-%d")
-                                break
-                            except:
-                                continue
-                except:
-                    pass
+            # timestamp -> tx_date, keeping the time of day in tx_time
+            if db_col == "tx_date" and csv_col == "timestamp" and isinstance(vv, str) and vv:
+                vv, tx_time = _split_timestamp(vv)
+                if tx_time is not None and "tx_time" in allowed_cols and not out.get("tx_time"):
+                    out["tx_time"] = tx_time
+            if db_col == "tx_time" and out.get("tx_time") and not vv:
+                continue
             out[db_col] = vv if vv != "" else None
     return out
 
@@ -286,6 +304,7 @@ def import_csv_job(job_id: int, dataset_type: str, table_name: str, csv_path: Pa
             # Get unique DB columns from mapping
             insert_cols = list(set(column_mapping.values()))
             insert_cols = [c for c in insert_cols if c in allowed_cols]
+            insert_cols += [c for c in _timestamp_columns(column_mapping, allowed_cols) if c not in insert_cols]
             
             if not insert_cols:
                 raise RuntimeError(
@@ -387,6 +406,8 @@ def import_csv_job(job_id: int, dataset_type: str, table_name: str, csv_path: Pa
         raise
     finally:
         conn.close()
+        # Rows may have been committed even if the import failed part-way
+        invalidate_services_summary()
 
 
 # ----------------------------
@@ -555,3 +576,9 @@ def list_uploaded_files():
     files_info.sort(key=lambda x: x["uploaded_at"] or "", reverse=True)
     
     return {"files": files_info}
+
+
+@router.get("/datasets/services-summary")
+def get_datasets_services_summary():
+    """Clients and active share per service domain (cached until the next import)."""
+    return {"services": get_services_summary()}
@@ -2,20 +2,19 @@
 API endpoints for offers and recommendations
 """
 from fastapi import APIRouter, HTTPException, Query
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, List
+import asyncio
+import time
+import numpy as np
 from app.db import get_conn
+from app.services.recommendation_store import render_explanation
+from app.core.product_catalog import product_display
+from app.services.recommender_service import get_recommender_service
 import json
 
 router = APIRouter()
 
-# Product catalog - this should match your product catalog
-OFFER_CATALOG = {
-    "REWARDS_CREDIT": {"display_name": "Rewards Credit Card", "category": "Credit Cards", "icon": "credit-card"},
-    "CADB439": {"display_name": "ZynaFlow Plus", "category": "Credit", "icon": "credit-card"},
-    "CACR432": {"display_name": "AureaCard Exclusive", "category": "Credit Cards", "icon": "credit-card"},
-    # Add more products as needed
-}
-
 @router.get("/offers/recommendations")
 async def get_pending_recommendations(
     status: str = Query('pending', description="Filter by status: pending, reviewed, sent, dismissed"),
@@ -53,13 +52,15 @@ async def get_pending_recommendations(
                     r.acceptance_prob,
                     r.expected_revenue,
                     r.status,
-                    re.narrative,
+                    COALESCE(re.narrative, et.narrative) as narrative,
+                    r.explanation_params_json,
                     c.first_name,
                     c.last_name,
                     c.segment_hint,
                     cc.cluster_id
                 FROM recommendations r
                 LEFT JOIN recommendation_explanations re ON r.id = re.recommendation_id
+                LEFT JOIN explanation_templates et ON et.id = r.explanation_template_id
                 LEFT JOIN customers c ON r.customer_id = c.customer_id
                 LEFT JOIN customer_clusters cc ON r.customer_id = cc.customer_id AND r.run_id = cc.run_id
                 WHERE r.run_id = ? AND r.status = ?
@@ -70,11 +71,7 @@ async def get_pending_recommendations(
             recommendations = []
             for row in cursor.fetchall():
                 # Get product info from catalog
-                product_info = OFFER_CATALOG.get(row['product_code'], {
-                    "display_name": row['product_code'],
-                    "category": "Unknown",
-                    "icon": "wallet"
-                })
+                product_info = product_display(row['product_code'])
                 
                 # Build customer name
                 customer_name = f"{row['first_name'] or ''} {row['last_name'] or ''}".strip()
@@ -92,7 +89,7 @@ async def get_pending_recommendations(
                     "acceptance_probability": float(row['acceptance_prob']),
                     "expected_revenue": float(row['expected_revenue']),
                     "status": row['status'] or 'pending',
-                    "narrative": row['narrative'] or "Pre-calculated recommendation",
+                    "narrative": render_explanation(row['narrative'], None, row['explanation_params_json'])[0] or "Pre-calculated recommendation",
                     "cluster_id": row['cluster_id'],
                     "segment_hint": row['segment_hint']
                 })
@@ -154,10 +151,12 @@ async def get_customer_top_recommendations(customer_id: str):
                     r.acceptance_prob,
                     r.expected_revenue,
                     r.status,
-                    re.narrative,
-                    re.key_factors_json
+                    COALESCE(re.narrative, et.narrative) as narrative,
+                    COALESCE(re.key_factors_json, et.key_factors_json) as key_factors_json,
+                    r.explanation_params_json
                 FROM recommendations r
                 LEFT JOIN recommendation_explanations re ON r.id = re.recommendation_id
+                LEFT JOIN explanation_templates et ON et.id = r.explanation_template_id
                 WHERE r.customer_id = ? AND r.run_id = ?
                 ORDER BY r.acceptance_prob DESC, r.expected_revenue DESC
                 LIMIT 3
@@ -166,17 +165,16 @@ async def get_customer_top_recommendations(customer_id: str):
             recommendations = []
             for row in cursor.fetchall():
                 # Get product info from catalog
-                product_info = OFFER_CATALOG.get(row['product_code'], {
-                    "display_name": row['product_code'],
-                    "category": "Unknown",
-                    "icon": "wallet"
-                })
+                product_info = product_display(row['product_code'])
                 
                 # Parse key factors if available
+                narrative, key_factors_json = render_explanation(
+                    row['narrative'], row['key_factors_json'], row['explanation_params_json']
+                )
                 key_benefits = []
-                if row['key_factors_json']:
+                if key_factors_json:
                     try:
-                        factors = json.loads(row['key_factors_json'])
+                        factors = json.loads(key_factors_json)
                         if isinstance(factors, dict):
                             key_benefits = factors.get('key_benefits', [])
                     except:
@@ -191,7 +189,7 @@ async def get_customer_top_recommendations(customer_id: str):
                     "acceptance_probability": float(row['acceptance_prob']),
                     "expected_revenue": float(row['expected_revenue']),
                     "status": row['status'] or 'pending',
-                    "narrative": row['narrative'] or "Pre-calculated recommendation",
+                    "narrative": narrative or "Pre-calculated recommendation",
                     "key_benefits": key_benefits
                 })
             
@@ -208,3 +206,196 @@ async def get_customer_top_recommendations(customer_id: str):
         print(f"Error in get_customer_top_recommendations: {e}")
         print(error_trace)
         raise HTTPException(status_code=500, detail=f"Error loading top recommendations: {str(e)}")
+
+
+@router.get("/offers/recommend/{customer_id}")
+def get_realtime_recommendations(
+    customer_id: str,
+    top_n: int = Query(3, ge=1, le=10, description="Number of recommendations to return")
+):
+    """
+    Online recommendations from the in-process recommender (hot-reloaded on new runs).
+    Customers of the loaded run use their precomputed cluster; others are scored live.
+    """
+    try:
+        result = get_recommender_service().recommend(customer_id, top_n=top_n)
+        if "error" in result:
+            raise HTTPException(status_code=404, detail=f"Customer {customer_id} not found")
+        
+        for rec in result["recommendations"]:
+            product_info = product_display(rec["product_code"])
+            rec["product_name"] = product_info["display_name"]
+            rec["category"] = product_info["category"]
+            rec["icon"] = product_info["icon"]
+        return result
+    except HTTPException:
+        raise
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=503, detail=f"No trained model available: {str(e)}")
+    except Exception as e:
+        import traceback
+        error_trace = traceback.format_exc()
+        print(f"Error in get_realtime_recommendations: {e}")
+        print(error_trace)
+        raise HTTPException(status_code=500, detail=f"Error generating recommendations: {str(e)}")
+
+
+@router.get("/offers/lookalike/{customer_id}")
+def get_lookalike_customers(
+    customer_id: str,
+    k: int = Query(10, ge=1, le=500, description="Number of similar customers to return"),
+    product_code: Optional[str] = Query(None, description="Only customers who already own this product")
+):
+    """
+    Customers most similar to customer_id (nearest neighbours in the clustering
+    feature space of the latest run), e.g. "similar customers who already bought X".
+    """
+    try:
+        started = time.perf_counter()
+        result = get_recommender_service().lookalikes(customer_id, k=k, product_code=product_code)
+        if "error" in result:
+            raise HTTPException(status_code=404, detail=f"Customer {customer_id} not found")
+        result["count"] = len(result["lookalikes"])
+        result["took_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        return result
+    except HTTPException:
+        raise
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=503, detail=f"No lookalike index available: {str(e)}")
+    except Exception as e:
+        import traceback
+        error_trace = traceback.format_exc()
+        print(f"Error in get_lookalike_customers: {e}")
+        print(error_trace)
+        raise HTTPException(status_code=500, detail=f"Error finding lookalike customers: {str(e)}")
+
+
+class BatchRecommendRequest(BaseModel):
+    customer_ids: List[str] = Field(..., min_length=1, max_length=100000)
+    top_n: int = Field(3, ge=1, le=10)
+    exclude_owned: bool = True
+
+
+def _run_batch_recommend(request: BatchRecommendRequest) -> Dict:
+    top = get_recommender_service().recommend_batch(
+        request.customer_ids, top_n=request.top_n, exclude_owned=request.exclude_owned
+    )
+    return {
+        "run_id": top["run_id"],
+        "n_customers": len(request.customer_ids),
+        "n_precomputed": top["n_precomputed"],
+        "count": int(len(top["row"])),
+        "customer_id": top["client_id"].tolist(),
+        "cluster": top["cluster"].tolist(),
+        "persona": top["persona"].tolist(),
+        "product_code": top["product_code"].tolist(),
+        "acceptance_probability": top["acceptance_prob"].tolist(),
+        "expected_revenue": top["expected_revenue"].tolist(),
+        "not_found": top["not_found"].tolist()
+    }
+
+
+@router.post("/offers/recommend/batch")
+async def get_batch_recommendations(request: BatchRecommendRequest):
+    """
+    Recommendations for many customers in one call (e.g. CRM campaign lists).
+    The result is columnar: one entry per recommendation in every list, grouped
+    by customer, best first. Unknown customer IDs are listed in not_found.
+    """
+    try:
+        return await asyncio.to_thread(_run_batch_recommend, request)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=503, detail=f"No trained model available: {str(e)}")
+    except Exception as e:
+        import traceback
+        error_trace = traceback.format_exc()
+        print(f"Error in get_batch_recommendations: {e}")
+        print(error_trace)
+        raise HTTPException(status_code=500, detail=f"Error generating batch recommendations: {str(e)}")
+
+
+class WhatIfRequest(BaseModel):
+    revenue_overrides: Dict[str, float] = Field(default_factory=dict, description="product_code -> expected revenue")
+    affinity_multipliers: Dict[str, float] = Field(default_factory=dict, description="product_code -> acceptance probability factor")
+    top_n: int = Field(3, ge=1, le=10)
+    objective: str = Field("probability", pattern="^(probability|expected_value)$")
+
+
+def _summarize_top_k(top: Dict[str, np.ndarray]) -> Dict:
+    """Aggregate a columnar top-k result into per-product counts and expected value."""
+    products, counts = np.unique(top['product_code'].astype(str), return_counts=True)
+    expected_value = top['acceptance_prob'] * top['expected_revenue']
+    return {
+        "recommendations": int(len(top['row'])),
+        "expected_revenue": round(float(expected_value.sum()), 2),
+        "product_counts": {str(p): int(c) for p, c in zip(products, counts)}
+    }
+
+
+def _run_what_if(request: WhatIfRequest) -> Dict:
+    recommender = get_recommender_service().current().recommender
+    
+    conn = get_conn()
+    try:
+        latest_run = conn.execute("""
+            SELECT id FROM batch_runs 
+            WHERE status = 'success' 
+            ORDER BY started_at DESC 
+            LIMIT 1
+        """).fetchone()
+        if not latest_run:
+            raise HTTPException(status_code=404, detail="No successful batch run available")
+        run_id = latest_run['id']
+        
+        rows = conn.execute(
+            "SELECT customer_id, cluster_id FROM customer_clusters WHERE run_id = ?",
+            (run_id,)
+        ).fetchall()
+        customer_ids = [row['customer_id'] for row in rows]
+        labels = np.array([row['cluster_id'] for row in rows], dtype=np.int64)
+        
+        owned = recommender.get_owned_matrix(customer_ids, conn)
+    finally:
+        conn.close()
+    
+    baseline = recommender.engine.top_k(labels, k=request.top_n, owned=owned, objective=request.objective)
+    scenario_engine = recommender.engine.with_overrides(
+        revenue=request.revenue_overrides,
+        affinity_multiplier=request.affinity_multipliers
+    )
+    scenario = scenario_engine.top_k(labels, k=request.top_n, owned=owned, objective=request.objective)
+    
+    # Customers whose best offer changes under the scenario
+    first_baseline = np.full(len(labels), -1)
+    first_scenario = np.full(len(labels), -1)
+    _, first = np.unique(baseline['row'], return_index=True)
+    first_baseline[baseline['row'][first]] = baseline['product_index'][first]
+    _, first = np.unique(scenario['row'], return_index=True)
+    first_scenario[scenario['row'][first]] = scenario['product_index'][first]
+    
+    return {
+        "run_id": run_id,
+        "n_customers": len(labels),
+        "baseline": _summarize_top_k(baseline),
+        "scenario": _summarize_top_k(scenario),
+        "customers_with_new_top_offer": int((first_baseline != first_scenario).sum())
+    }
+
+
+@router.post("/offers/what-if")
+async def what_if_rescoring(request: WhatIfRequest):
+    """
+    Rescore every customer of the latest successful run with changed product
+    revenue / acceptance tables and compare against the current tables.
+    Nothing is written to the database.
+    """
+    try:
+        return await asyncio.to_thread(_run_what_if, request)
+    except HTTPException:
+        raise
+    except Exception as e:
+        import traceback
+        error_trace = traceback.format_exc()
+        print(f"Error in what_if_rescoring: {e}")
+        print(error_trace)
+        raise HTTPException(status_code=500, detail=f"Error running what-if scenario: {str(e)}")
@@ -0,0 +1,704 @@
+"""
+Product Catalog
+Single source of product metadata, personas and eligibility rules.
+
+The catalog is loaded once at import. Each product's eligibility limits
+(min_age, max_age, min_income), target segments and switch requirements are
+compiled into per-product arrays (CATALOG), so eligibility over a whole
+customer table is one broadcast comparison instead of a loop per customer
+and product.
+
+Product fields:
+- name, display_name (short UI name, defaults to name), category, icon
+  (defaults to the category icon), type, description, key_benefits,
+  target_segments, base_cost
+- min_age / max_age / min_income: hard eligibility limits
+- expected_revenue: revenue used to score batch recommendations
+- switch_prob / switch_revenue / requirements: used when suggesting an
+  alternative to an existing recommendation. Requirements raise the fit
+  score when met but never exclude a product.
+"""
+
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+# Italian banking product catalog
+PRODUCTS: Dict[str, Dict[str, Any]] = {
+    'ASSA566': {
+        'name': 'Assicurazione Sanitaria SalusCare',
+        'category': 'Insurance',
+        'type': 'health_insurance',
+        'description': 'Comprehensive health coverage with access to network of affiliated facilities',
+        'key_benefits': [
+            'Medical expenses coverage up to €50,000/year',
+            'Specialist visits without waiting lists',
+            '24/7 assistance in Italy and abroad'
+        ],
+        'target_segments': ['affluent', 'mass_market', 'family_oriented'],
+        'min_age': 18,
+        'max_age': 75,
+        'base_cost': 65,
+        'expected_revenue': 200.0
+    },
+    'CACR432': {
+        'name': 'Carta di Credito AureaCard Exclusive',
+        'category': 'Credit',
+        'type': 'premium_credit_card',
+        'description': 'Premium credit card with rewards program and exclusive services',
+        'key_benefits': [
+            'Cashback up to 3% on online purchases',
+            'Travel insurance and car rental included',
+            'Free access to airport lounges'
+        ],
+        'target_segments': ['affluent', 'frequent_travelers', 'high_spenders'],
+        'min_income': 25000,
+        'base_cost': 0,
+        'expected_revenue': 200.0,
+        'display_name': 'AureaCard Exclusive'
+    },
+    'CACR748': {
+        'name': 'Carta di Credito AureaCard Infinity',
+        'category': 'Credit',
+        'type': 'ultra_premium_credit_card',
+        'description': 'Ultra premium credit card with concierge service and exclusive benefits',
+        'key_benefits': [
+            'Personalized 24/7 concierge service',
+            '5% cashback on all categories',
+            'Unlimited Priority Pass + guests'
+        ],
+        'target_segments': ['affluent', 'premium_clients'],
+        'min_income': 50000,
+        'base_cost': 150,
+        'expected_revenue': 200.0
+    },
+    'CADB439': {
+        'name': 'Carta di Debito ZynaFlow Plus',
+        'category': 'Credit',
+        'type': 'premium_debit_card',
+        'description': 'Contactless debit card with cashback and smart expense management',
+        'key_benefits': [
+            '1% cashback on all purchases',
+            'Real-time notifications for every transaction',
+            'Automatic spending categories for budgeting'
+        ],
+        'target_segments': ['young_professionals', 'digital_natives', 'mass_market'],
+        'base_cost': 0,
+        'expected_revenue': 200.0,
+        'display_name': 'ZynaFlow Plus'
+    },
+    'CADB783': {
+        'name': 'Carta di Debito EasyYoung Pay',
+        'category': 'Credit',
+        'type': 'youth_debit_card',
+        'description': 'Card dedicated to young people with advanced mobile app and gamification',
+        'key_benefits': [
+            'Mobile app with gamified budget management',
+            'Free withdrawals throughout Europe',
+            'Exclusive discounts on youth brands'
+        ],
+        'target_segments': ['students', 'young_adults'],
+        'min_age': 18,
+        'max_age': 30,
+        'base_cost': 0,
+        'expected_revenue': 200.0
+    },
+    'CAPR574': {
+        'name': 'Carta Prepagata FlexPay One',
+        'category': 'Credit',
+        'type': 'prepaid_card',
+        'description': 'Rechargeable prepaid card for expense control and secure online shopping',
+        'key_benefits': [
+            'Total expense control with preset limit',
+            'Ideal for secure online shopping',
+            'Instant recharge from mobile app'
+        ],
+        'target_segments': ['budget_conscious', 'online_shoppers', 'students'],
+        'base_cost': 5,
+        'expected_revenue': 200.0
+    },
+    'CCOR602': {
+        'name': 'Conto Corrente MyEnergy',
+        'category': 'Accounts',
+        'type': 'checking_account',
+        'description': 'Zero-fee checking account with advanced digital services',
+        'key_benefits': [
+            'Zero management fees with salary deposit',
+            'Unlimited free instant transfers',
+            'Award-winning mobile app with AI assistant'
+        ],
+        'target_segments': ['employees', 'mass_market', 'digital_natives'],
+        'base_cost': 0,
+        'expected_revenue': 200.0
+    },
+    'CINV819': {
+        'name': 'Conto Investimento SharesVault',
+        'category': 'Investments',
+        'type': 'investment_account',
+        'description': 'Investment platform with robo-advisor and personalized portfolio',
+        'key_benefits': [
+            'Robo-advisor with automatic rebalancing',
+            'ETFs and index funds with reduced fees',
+            'Financial advisory included in subscription'
+        ],
+        'target_segments': ['affluent', 'investors', 'wealth_builders'],
+        'min_investment': 5000,
+        'base_cost': 20,
+        'expected_revenue': 3000.0
+    },
+    'CRDT356': {
+        'name': 'Linea di Credito FlexiCredit',
+        'category': 'Credit',
+        'type': 'credit_line',
+        'description': 'Revolving credit line for unexpected expenses and opportunities',
+        'key_benefits': [
+            'Flexible usage up to €15,000',
+            'Interest only on amount used',
+            'Fast approval within 24 hours'
+        ],
+        'target_segments': ['mass_market', 'entrepreneurs', 'families'],
+        'min_income': 15000,
+        'base_cost': 0,
+        'expected_revenue': 200.0
+    },
+    'DPAM682': {
+        'name': 'Deposito Gestito WealthPlus',
+        'category': 'Savings',
+        'type': 'managed_deposit',
+        'description': 'Term deposit with active management to maximize returns',
+        'key_benefits': [
+            'Guaranteed minimum return 2.5% annually',
+            'Active management by certified experts',
+            'Partial liquidity without penalties'
+        ],
+        'target_segments': ['affluent', 'conservative_investors', 'retirees'],
+        'min_deposit': 10000,
+        'base_cost': 0,
+        'expected_revenue': 200.0
+    },
+    'DPAM997': {
+        'name': 'Deposito Premium SafeHarbor',
+        'category': 'Savings',
+        'type': 'premium_deposit',
+        'description': 'Premium deposit with competitive rate and wealth management services',
+        'key_benefits': [
+            'Fixed rate 3.2% for 12 months',
+            'Dedicated wealth management advisory',
+            'Protection up to €250,000 (FITD)'
+        ],
+        'target_segments': ['affluent', 'high_net_worth'],
+        'min_deposit': 50000,
+        'base_cost': 0,
+        'expected_revenue': 200.0
+    },
+    'DPRI866': {
+        'name': 'Deposito Smart SaveSmart',
+        'category': 'Savings',
+        'type': 'smart_deposit',
+        'description': 'Smart deposit with variable rate linked to savings goals',
+        'key_benefits': [
+            'Progressive rate: more you save, more you earn',
+            'Goal-based saving with milestone rewards',
+            'No duration commitment'
+        ],
+        'target_segments': ['young_professionals', 'savers', 'goal_oriented'],
+        'min_deposit': 1000,
+        'base_cost': 0,
+        'expected_revenue': 200.0
+    },
+    'FPEN541': {
+        'name': 'Fondo Pensione FutureSecure',
+        'category': 'Investments',
+        'type': 'pension_fund',
+        'description': 'Supplementary pension plan with tax benefits and flexibility',
+        'key_benefits': [
+            'Tax deductibility up to €5,164/year',
+            'Sustainable ESG portfolio',
+            'Historical average return 4.5%'
+        ],
+        'target_segments': ['employees', 'self_employed', 'long_term_planners'],
+        'min_contribution': 1200,
+        'base_cost': 25,
+        'expected_revenue': 200.0
+    },
+    'MTUU356': {
+        'name': 'Mutuo Casa DreamHome',
+        'category': 'Loans',
+        'type': 'mortgage',
+        'description': 'First home mortgage with subsidized rate and personalized consulting',
+        'key_benefits': [
+            'Fixed APR from 2.95% (first home)',
+            'Up to 80% of property value',
+            'Free processing and appraisal included'
+        ],
+        'target_segments': ['first_home_buyers', 'families', 'young_couples'],
+        'max_ltv': 80,
+        'base_cost': 0,
+        'expected_revenue': 200.0,
+        'icon': 'home'
+    },
+    'PARK443': {
+        'name': 'Servizio Parcheggio SmartPark',
+        'category': 'Services',
+        'type': 'parking_service',
+        'description': 'Affiliated parking subscription with automatic payment',
+        'key_benefits': [
+            'Access to 500+ parking lots in Italy',
+            'Contactless automatic payment',
+            '20% discount on hourly rates'
+        ],
+        'target_segments': ['commuters', 'urban_dwellers', 'car_owners'],
+        'base_cost': 15,
+        'expected_revenue': 200.0
+    },
+    'PLZZ334': {
+        'name': 'Prestito Personale QuickCash',
+        'category': 'Loans',
+        'type': 'personal_loan',
+        'description': 'Personal loan with fast approval and flexible installments',
+        'key_benefits': [
+            'Approval within 2 business hours',
+            'APR from 4.95%, plans from 12 to 84 months',
+            'No penalty for early repayment'
+        ],
+        'target_segments': ['mass_market', 'project_financers'],
+        'min_income': 12000,
+        'max_amount': 50000,
+        'base_cost': 0,
+        'expected_revenue': 200.0
+    },
+    'PRPE078': {
+        'name': 'Pacchetto Premium LifeStyle',
+        'category': 'Packages',
+        'type': 'premium_package',
+        'description': 'Complete package with all integrated premium banking services',
+        'key_benefits': [
+            'All premium products at discounted price',
+            'Dedicated personal banker',
+            'Exclusive events and networking'
+        ],
+        'target_segments': ['affluent', 'premium_clients'],
+        'min_relationship_value': 100000,
+        'base_cost': 50,
+        'expected_revenue': 200.0
+    },
+    'PRPE771': {
+        'name': 'Pacchetto Premium Business+',
+        'category': 'Packages',
+        'type': 'business_package',
+        'description': 'Integrated solution for professionals and small businesses',
+        'key_benefits': [
+            'Business account + corporate credit card',
+            'Free POS terminal with reduced fees',
+            'Integrated management software'
+        ],
+        'target_segments': ['entrepreneurs', 'small_business', 'professionals'],
+        'base_cost': 35,
+        'expected_revenue': 200.0
+    },
+    'SINV263': {
+        'name': 'Servizio Investimento PlannerPro',
+        'category': 'Investments',
+        'type': 'investment_service',
+        'description': 'Personalized financial advisory with wealth planning',
+        'key_benefits': [
+            'Dedicated certified financial advisor',
+            'Annual personalized financial plan',
+            'Quarterly monitoring and rebalancing'
+        ],
+        'target_segments': ['affluent', 'wealth_builders', 'investors'],
+        'min_portfolio': 25000,
+        'base_cost': 100,
+        'expected_revenue': 3000.0
+    },
+    # Map existing generic codes to specific products
+    'BASIC_CHECKING': {
+        'name': 'Daily Flow Account',
+        'category': 'Accounts',
+        'type': 'checking_account',
+        'description': 'Enhanced checking account with simplified financial management',
+        'key_benefits': [
+            'Low monthly fees',
+            'Easy online banking',
+            'Free ATM withdrawals'
+        ],
+        'target_segments': ['mass_market', 'basic_users'],
+        'base_cost': 0,
+        'expected_revenue': 200.0,
+        'switch_prob': 0.50,
+        'switch_revenue': 200.0,
+        'requirements': {}
+    },
+    'PREMIUM_INVESTMENT': {
+        'name': 'Premium Investment Portfolio',
+        'category': 'Investments',
+        'type': 'investment_portfolio',
+        'description': 'Premium investment portfolio with diversified assets',
+        'key_benefits': [
+            'Diversified portfolio management',
+            'Professional financial advisory',
+            'Tax-optimized strategies'
+        ],
+        'target_segments': ['affluent', 'high_net_worth'],
+        'min_investment': 50000,
+        'base_cost': 100,
+        'expected_revenue': 5000.0,
+        'switch_prob': 0.85,
+        'switch_revenue': 5000.0,
+        'requirements': {'min_income': 50000, 'min_balance': 100000}
+    },
+    'WEALTH_MANAGEMENT': {
+        'name': 'Wealth Management Service',
+        'category': 'Investments',
+        'type': 'wealth_management',
+        'description': 'Comprehensive wealth management with dedicated advisor',
+        'key_benefits': [
+            'Personal wealth advisor',
+            'Customized investment strategy',
+            'Estate planning services'
+        ],
+        'target_segments': ['affluent', 'high_net_worth'],
+        'min_portfolio': 100000,
+        'base_cost': 200,
+        'expected_revenue': 5000.0,
+        'switch_prob': 0.75,
+        'switch_revenue': 3000.0,
+        'requirements': {'min_income': 50000, 'min_balance': 100000}
+    },
+    'REWARDS_CREDIT': {
+        'name': 'Rewards Credit Card',
+        'category': 'Credit',
+        'type': 'rewards_credit_card',
+        'description': 'Credit card with cashback and rewards program',
+        'key_benefits': [
+            'Cashback on purchases',
+            'Travel rewards',
+            'Purchase protection'
+        ],
+        'target_segments': ['mass_market', 'frequent_spenders'],
+        'base_cost': 0,
+        'expected_revenue': 800.0,
+        'switch_prob': 0.70,
+        'switch_revenue': 800.0,
+        'requirements': {'min_transactions': 50}
+    },
+    'PERSONAL_LOAN': {
+        'name': 'Personal Loan',
+        'category': 'Loans',
+        'type': 'personal_loan',
+        'description': 'Flexible personal loan for various needs',
+        'key_benefits': [
+            'Competitive interest rates',
+            'Flexible repayment terms',
+            'Fast approval process'
+        ],
+        'target_segments': ['mass_market', 'families'],
+        'min_income': 15000,
+        'base_cost': 0,
+        'expected_revenue': 2000.0,
+        'switch_prob': 0.60,
+        'switch_revenue': 2000.0,
+        'requirements': {'max_balance': 10000, 'min_spending': 50000}
+    },
+    'SAVINGS_PLAN': {
+        'name': 'Savings Plan',
+        'category': 'Savings',
+        'type': 'savings_plan',
+        'description': 'Structured savings plan with goal tracking',
+        'key_benefits': [
+            'Automated savings',
+            'Goal-based planning',
+            'Competitive interest rates'
+        ],
+        'target_segments': ['young_professionals', 'savers'],
+        'base_cost': 0,
+        'expected_revenue': 200.0,
+        'switch_prob': 0.65,
+        'switch_revenue': 500.0,
+        'requirements': {'max_age': 35, 'min_income': 30000}
+    },
+    'BUSINESS_ACCOUNT': {
+        'name': 'Business Account',
+        'category': 'Accounts',
+        'type': 'business_account',
+        'description': 'Business banking account with professional services',
+        'key_benefits': [
+            'Business transaction management',
+            'Multi-user access',
+            'Integrated accounting tools'
+        ],
+        'target_segments': ['entrepreneurs', 'small_business'],
+        'base_cost': 25,
+        'expected_revenue': 200.0,
+        'switch_prob': 0.65,
+        'switch_revenue': 1500.0,
+        'requirements': {'min_income': 40000}
+    },
+    'MORTGAGE': {
+        'name': 'Mortgage Loan',
+        'category': 'Loans',
+        'type': 'mortgage',
+        'description': 'Home mortgage with competitive rates',
+        'key_benefits': [
+            'Competitive interest rates',
+            'Flexible terms',
+            'Expert guidance'
+        ],
+        'target_segments': ['families', 'home_buyers'],
+        'base_cost': 0,
+        'expected_revenue': 2000.0,
+        'icon': 'home',
+        'switch_prob': 0.55,
+        'switch_revenue': 10000.0,
+        'requirements': {'min_income': 35000}
+    }
+}
+
+CATEGORY_ICONS = {
+    'Credit': 'credit-card',
+    'Accounts': 'wallet',
+    'Savings': 'piggy-bank',
+    'Investments': 'trending-up',
+    'Insurance': 'shield',
+    'Loans': 'dollar-sign',
+    'Packages': 'package',
+    'Services': 'map-pin'
+}
+
+# Business Personas - Mapping Cluster IDs to product strategies
+# Based on category-based clustering analysis
+PERSONAS: Dict[int, Dict[str, Any]] = {
+    0: {
+        "name": "Conservative Savers",
+        "description": "Low transaction volume, high savings focus",
+        "suggestions": ["DPAM682", "FPEN058", "SAVINGS_PLAN"],  # SharesVault, Pension Fund
+        "acceptance_prob_base": 0.75
+    },
+    1: {
+        "name": "High Volume Spenders",
+        "description": "Frequent transactions across multiple categories",
+        "suggestions": ["CADB439", "CACR432", "REWARDS_CREDIT"],  # ZynaFlow Plus, Credit Card Gold
+        "acceptance_prob_base": 0.70
+    },
+    2: {
+        "name": "Young Professionals",
+        "description": "Active users with growing income potential",
+        "suggestions": ["PRPE078", "CADB783", "SAVINGS_PLAN"],  # Personal Loan, EasyYoung Debit
+        "acceptance_prob_base": 0.65
+    },
+    3: {
+        "name": "Family/Home Focused",
+        "description": "Stable income, home-related spending patterns",
+        "suggestions": ["MTUU356", "ASSA566", "MORTGAGE"],  # NestHouse Mortgage, Insurance
+        "acceptance_prob_base": 0.72
+    },
+    4: {
+        "name": "Investment Seekers",
+        "description": "Diverse product portfolio, investment-oriented",
+        "suggestions": ["SINV263", "CINV819", "PREMIUM_INVESTMENT"],  # InvestoUniq, Fund Portfolio
+        "acceptance_prob_base": 0.80
+    },
+    5: {
+        "name": "Basic Users",
+        "description": "Minimal product usage, standard banking needs",
+        "suggestions": ["CCOR602", "CADB877", "BASIC_CHECKING"]  # MyEnergy Account, ZynaFlow Basic
+    }
+}
+
+# Persona for unexpected cluster IDs
+DEFAULT_PERSONA: Dict[str, Any] = {
+    "name": "Standard segment",
+    "description": "Standard segment",
+    "suggestions": ["BASIC_CHECKING"],
+    "acceptance_prob_base": 0.50
+}
+
+# Products offered when a customer already owns every product of their persona
+# (BASIC_CHECKING is only used as absolute last resort)
+FALLBACK_PRODUCTS = [
+    "DPAM682", "FPEN541", "SAVINGS_PLAN",  # Savings/Investments
+    "CADB439", "CACR432", "REWARDS_CREDIT",  # Credit Cards
+    "PRPE078", "CADB783",  # Young Professional products
+    "MTUU356", "ASSA566", "MORTGAGE",  # Family/Home
+    "SINV263", "CINV819", "PREMIUM_INVESTMENT",  # Investments
+    "CCOR602", "CRDT356", "PLZZ334",  # Accounts/Credit
+    "DPAM997", "DPRI866", "PARK443",  # Premium/Services
+    "PRPE771", "CACR748", "CADB783"  # Business/Premium
+]
+
+# Services that can be suggested in place of an existing recommendation
+SWITCH_PRODUCTS = [code for code, product in PRODUCTS.items() if 'switch_prob' in product]
+
+# Switch requirement -> (customer metric, comparison, fit score bonus when met)
+REQUIREMENT_RULES = {
+    'min_income': ('annual_income', '>=', 0.15),
+    'min_balance': ('total_balance', '>=', 0.15),
+    'min_transactions': ('transaction_count', '>=', 0.15),
+    'min_spending': ('total_spent', '>=', 0.10),
+    'max_age': ('age', '<=', 0.10),
+    'max_balance': ('total_balance', '<=', 0.10)
+}
+
+
+def estimate_revenue(product_code: str) -> float:
+    """Estimate expected revenue of a product missing from the catalog (simplified)."""
+    if "PREMIUM" in product_code or "WEALTH" in product_code:
+        return 5000.0
+    elif "INVESTMENT" in product_code or "INV" in product_code:
+        return 3000.0
+    elif "LOAN" in product_code or "MORTGAGE" in product_code:
+        return 2000.0
+    elif "CREDIT" in product_code or "CARD" in product_code:
+        return 800.0
+    return 200.0
+
+
+def get_product(product_code: str) -> Optional[Dict[str, Any]]:
+    """Catalog entry of a product, or None if unknown."""
+    return PRODUCTS.get(product_code)
+
+
+def product_display(product_code: str) -> Dict[str, str]:
+    """Display name, category and icon of a product (product code / "Unknown" / wallet if unknown)."""
+    product = PRODUCTS.get(product_code)
+    if product is None:
+        return {"display_name": product_code, "category": "Unknown", "icon": "wallet"}
+    return {
+        "display_name": product.get('display_name', product['name']),
+        "category": product['category'],
+        "icon": product.get('icon', CATEGORY_ICONS.get(product['category'], 'wallet'))
+    }
+
+
+class CompiledCatalog:
+    """
+    Catalog rules as per-product arrays. Every method takes an optional
+    product_codes column order (default: the whole catalog); products
+    missing from the catalog have no limits and no requirements.
+    """
+
+    def __init__(self, products: Dict[str, Dict[str, Any]]):
+        self.products = products
+        self.product_codes = list(products)
+        self._product_index = pd.Index(self.product_codes)
+
+        self.min_age = self._field('min_age', -np.inf)
+        self.max_age = self._field('max_age', np.inf)
+        self.min_income = self._field('min_income', -np.inf)
+        self.revenue = np.array([
+            p.get('expected_revenue', estimate_revenue(code)) for code, p in products.items()
+        ], dtype=np.float64)
+        self.requirements = {
+            name: np.array([p.get('requirements', {}).get(name, np.nan) for p in products.values()], dtype=np.float64)
+            for name in REQUIREMENT_RULES
+        }
+        self.target_segments = [tuple(s.lower() for s in p.get('target_segments', [])) for p in products.values()]
+
+    def _field(self, field: str, default: float) -> np.ndarray:
+        return np.array([p.get(field, default) for p in self.products.values()], dtype=np.float64)
+
+    def _columns(self, product_codes: Optional[Sequence[str]]) -> np.ndarray:
+        """Catalog position of each product code (-1 if unknown)."""
+        if product_codes is None:
+            return np.arange(len(self.product_codes))
+        return self._product_index.get_indexer(list(product_codes))
+
+    @staticmethod
+    def _take(values: np.ndarray, cols: np.ndarray, missing: float) -> np.ndarray:
+        return np.where(cols >= 0, values[np.maximum(cols, 0)], missing)
+
+    def expected_revenue(self, product_codes: Optional[Sequence[str]] = None) -> np.ndarray:
+        """Expected revenue per product (heuristic estimate for unknown products)."""
+        cols = self._columns(product_codes)
+        if product_codes is None:
+            return self.revenue.copy()
+        return np.array([
+            self.revenue[j] if j >= 0 else estimate_revenue(code)
+            for code, j in zip(product_codes, cols)
+        ], dtype=np.float64)
+
+    def eligibility_mask(
+        self,
+        age: Sequence[float],
+        annual_income: Sequence[float],
+        product_codes: Optional[Sequence[str]] = None
+    ) -> np.ndarray:
+        """
+        Hard eligibility (min_age, max_age, min_income) of every customer for
+        every product, as a (n_customers x n_products) boolean matrix.
+
+        Args:
+            age: Customer ages, NaN where unknown (age limits are skipped)
+            annual_income: Customer incomes, NaN where unknown (treated as 0)
+        """
+        cols = self._columns(product_codes)
+        age = np.asarray(age, dtype=np.float64)[:, None]
+        income = np.nan_to_num(np.asarray(annual_income, dtype=np.float64), nan=0.0)[:, None]
+
+        age_ok = np.isnan(age) | (
+            (age >= self._take(self.min_age, cols, -np.inf)) & (age <= self._take(self.max_age, cols, np.inf))
+        )
+        return age_ok & (income >= self._take(self.min_income, cols, -np.inf))
+
+    def segment_match(
+        self,
+        segments: Sequence[Optional[str]],
+        product_codes: Optional[Sequence[str]] = None
+    ) -> np.ndarray:
+        """
+        Whether each customer's segment matches each product's target segments
+        (substring either way), as a (n_customers x n_products) boolean matrix.
+        Evaluated once per distinct segment.
+        """
+        cols = self._columns(product_codes)
+        codes, distinct = pd.factorize(pd.Series(segments, dtype=object).fillna('').astype(str).str.lower())
+        table = np.zeros((len(distinct) + 1, len(cols)), dtype=bool)
+        for i, segment in enumerate(distinct):
+            if not segment:
+                continue
+            for k, j in enumerate(cols):
+                if j >= 0:
+                    table[i, k] = any(t in segment or segment in t for t in self.target_segments[j])
+        # Row -1 (last) is the all-False row for missing segments
+        return table[codes]
+
+    def targets_any(
+        self,
+        target_segments: Sequence[str],
+        product_codes: Optional[Sequence[str]] = None
+    ) -> np.ndarray:
+        """Whether each product targets any of the given segments (n_products bool array)."""
+        cols = self._columns(product_codes)
+        wanted = {s.lower() for s in target_segments}
+        return np.array([j >= 0 and not wanted.isdisjoint(self.target_segments[j]) for j in cols], dtype=bool)
+
+    def requirement_fit(
+        self,
+        metrics: Dict[str, Sequence[float]],
+        product_codes: Optional[Sequence[str]] = None
+    ) -> np.ndarray:
+        """
+        Sum of REQUIREMENT_RULES bonuses each customer earns for each product's
+        switch requirements, as a (n_customers x n_products) float matrix.
+
+        Args:
+            metrics: Customer metric arrays keyed by annual_income, total_balance,
+                     transaction_count, total_spent, age (missing metrics earn nothing)
+        """
+        cols = self._columns(product_codes)
+        n_customers = len(next(iter(metrics.values()))) if metrics else 0
+        fit = np.zeros((n_customers, len(cols)))
+        for name, (metric, comparison, bonus) in REQUIREMENT_RULES.items():
+            if metric not in metrics:
+                continue
+            threshold = self._take(self.requirements[name], cols, np.nan)
+            values = np.asarray(metrics[metric], dtype=np.float64)[:, None]
+            # Comparisons with NaN (no requirement / unknown metric) are False
+            met = values >= threshold if comparison == '>=' else values <= threshold
+            fit += np.where(met, bonus, 0.0)
+        return fit
+
+
+CATALOG = CompiledCatalog(PRODUCTS)
@@ -0,0 +1,61 @@
+"""
+Service Catalog
+Service domains shown as cards in the services overview.
+
+A holding belongs to a domain by its product code (PRODUCT_DOMAIN_MAP) or,
+for products outside the catalog, by keywords in its description
+(PRODUCT_KEYWORDS, matched with PRODUCT_DOMAIN_CLASSIFIER).
+"""
+
+from dataclasses import dataclass
+
+from app.core.product_catalog import PRODUCTS
+from app.services.text_classifier import KeywordClassifier
+
+
+@dataclass(frozen=True)
+class ServiceCard:
+    key: str
+    title: str
+    description: str
+    icon: str
+
+
+SERVICE_CARDS = [
+    ServiceCard("accounts", "Current Accounts", "Checking, business and packaged accounts", "wallet"),
+    ServiceCard("cards", "Cards", "Debit, credit and prepaid cards", "credit-card"),
+    ServiceCard("savings", "Savings & Deposits", "Deposits and savings plans", "piggy-bank"),
+    ServiceCard("investments", "Investments", "Investment accounts, advisory and pension funds", "trending-up"),
+    ServiceCard("loans", "Loans & Mortgages", "Mortgages, personal loans and credit lines", "home"),
+    ServiceCard("insurance", "Insurance", "Health and protection policies", "shield"),
+]
+
+# Catalog category -> service domain
+CATEGORY_DOMAINS = {
+    "Accounts": "accounts",
+    "Packages": "accounts",
+    "Credit": "cards",
+    "Savings": "savings",
+    "Investments": "investments",
+    "Loans": "loans",
+    "Insurance": "insurance",
+}
+
+# Product code -> service domain (credit lines are loans, not cards)
+PRODUCT_DOMAIN_MAP = {
+    code: "loans" if product["type"] == "credit_line" else CATEGORY_DOMAINS[product["category"]]
+    for code, product in PRODUCTS.items()
+    if product["category"] in CATEGORY_DOMAINS
+}
+
+# Service domain -> keywords of product descriptions (Italian and English)
+PRODUCT_KEYWORDS = {
+    "accounts": ["conto corrente", "conto business", "pacchetto", "checking", "current account", "business account"],
+    "cards": ["carta", "card", "bancomat"],
+    "savings": ["deposito", "risparmio", "libretto", "savings", "deposit"],
+    "investments": ["investimento", "fondo", "titoli", "gestione patrimoniale", "pensione", "investment", "wealth", "pension"],
+    "loans": ["mutuo", "prestito", "finanziamento", "linea di credito", "mortgage", "loan"],
+    "insurance": ["assicurazione", "polizza", "insurance"],
+}
+
+PRODUCT_DOMAIN_CLASSIFIER = KeywordClassifier(PRODUCT_KEYWORDS)
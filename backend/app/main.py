@@ -10,6 +10,7 @@ from app.api.v1.datasets import router as datasets_router
 from app.api.v1.batch import router as batch_router
 from app.api.v1.clusters import router as clusters_router
 from app.api.v1.offers import router as offers_router
+from app.services.recommender_service import get_recommender_service
 import os
 
 app = FastAPI(title=settings.APP_NAME)
@@ -68,6 +69,14 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
         }
     )
 
+@app.on_event("startup")
+def warm_up_recommender():
+    """Load the recommender once at startup so the first online request is fast."""
+    try:
+        get_recommender_service().current()
+    except Exception as e:
+        print(f"Recommender not loaded at startup ({e}). It will load on first request.")
+
 @app.get("/health")
 def health_check():
     return {"status": "ok"}
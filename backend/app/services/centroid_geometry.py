@@ -0,0 +1,81 @@
+"""
+Centroid Geometry
+Vectorized distance-to-centroid, per-cluster rank and a silhouette-like margin
+for every customer of a clustering run.
+
+- distance: Euclidean distance to the assigned centroid (scaled feature space)
+- rank: 1 = closest to its centroid (most representative) within its cluster
+- margin: (d2 - d1) / max(d1, d2), where d1 is the distance to the assigned
+  centroid and d2 to the nearest other one. Close to 0 = borderline customer,
+  close to 1 = clearly inside its cluster.
+"""
+
+from typing import Dict, Optional
+
+import numpy as np
+
+
+def centroid_distances(X_scaled: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """
+    Distance from every row to every centroid, shape (n_samples, n_clusters).
+    Same result as KMeans.transform, computed with one matrix product.
+    """
+    X_scaled = np.asarray(X_scaled, dtype=np.float64)
+    centroids = np.asarray(centroids, dtype=np.float64)
+    sq = X_scaled @ centroids.T
+    sq *= -2.0
+    sq += np.einsum('ij,ij->i', X_scaled, X_scaled)[:, None]
+    sq += np.einsum('ij,ij->i', centroids, centroids)[None, :]
+    np.maximum(sq, 0.0, out=sq)
+    return np.sqrt(sq, out=sq)
+
+
+def compute_centroid_geometry(
+    X_scaled: np.ndarray,
+    centroids: np.ndarray,
+    labels: Optional[np.ndarray] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Args:
+        X_scaled: Scaled feature matrix (n_samples, n_features)
+        centroids: Cluster centers in the same space (n_clusters, n_features)
+        labels: Assigned clusters (default: nearest centroid)
+    Returns:
+        Dict of arrays aligned with the rows of X_scaled:
+        'labels', 'distance', 'rank', 'margin'
+    """
+    distances = centroid_distances(X_scaled, centroids)
+    n_samples, n_clusters = distances.shape
+    if labels is None:
+        labels = distances.argmin(axis=1)
+    labels = np.asarray(labels, dtype=np.int64)
+    rows = np.arange(n_samples)
+
+    own = distances[rows, labels]
+
+    # Nearest other centroid: mask the assigned one out
+    if n_clusters > 1:
+        others = distances.copy()
+        others[rows, labels] = np.inf
+        second = others.min(axis=1)
+        denom = np.maximum(own, second)
+        margin = np.divide(second - own, denom, out=np.zeros(n_samples), where=denom > 0)
+    else:
+        margin = np.ones(n_samples)
+
+    # Rank within cluster by distance: sort by (label, distance), then subtract
+    # each cluster's start offset from the global position
+    rank = np.empty(n_samples, dtype=np.int64)
+    if n_samples:
+        order = np.lexsort((own, labels))
+        sorted_labels = labels[order]
+        starts = np.flatnonzero(np.r_[True, sorted_labels[1:] != sorted_labels[:-1]])
+        run_lengths = np.diff(np.r_[starts, n_samples])
+        rank[order] = np.arange(n_samples) - np.repeat(starts, run_lengths) + 1
+
+    return {
+        'labels': labels,
+        'distance': own,
+        'rank': rank,
+        'margin': margin,
+    }
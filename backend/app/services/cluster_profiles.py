@@ -0,0 +1,139 @@
+"""
+Cluster Profiles
+Per-cluster feature statistics and differentiating features of a batch run.
+
+Computed once per run from the feature matrix the clusters were fitted on (raw
+feature units, before scaling/reduction), in one grouped pass: rows are
+sorted by cluster once, means and variances come from np.add.reduceat over
+the contiguous cluster blocks, and quantiles from one np.quantile per block
+(all features at once). Stored per run in cluster_feature_profiles, so the
+cluster detail view is a single indexed read instead of a scan of
+customer_clusters joined to raw data.
+
+Identical columns (FEATURE_SPEC keeps aliases such as total_spent and
+importo_total) are collapsed to their first occurrence before ranking, so a
+cluster's top features are distinct statistics.
+
+Definitions:
+  - z_delta: (cluster mean - overall mean) / overall std of the feature, i.e.
+    the standardized centroid delta (0 for constant features)
+  - rank: 1 = most differentiating feature of the cluster (largest |z_delta|)
+"""
+
+from typing import Dict, Sequence
+
+import numpy as np
+import pandas as pd
+
+PROFILE_QUANTILES = (0.25, 0.5, 0.75)
+
+# Stored columns after (run_id, cluster_id, feature)
+PROFILE_COLUMNS = ['mean', 'std', 'p25', 'p50', 'p75', 'overall_mean', 'z_delta', 'rank']
+
+
+def compute_cluster_profiles(X: np.ndarray, labels: np.ndarray, feature_names: Sequence[str]) -> pd.DataFrame:
+    """
+    Feature profile of every cluster.
+
+    Args:
+        X: (n_customers, n_features) feature matrix in raw units
+        labels: Cluster id of every row
+    Returns:
+        One row per (cluster_id, distinct feature) with cluster_size and
+        PROFILE_COLUMNS, ordered by cluster_id then rank
+    """
+    X = np.nan_to_num(np.asarray(X, dtype=np.float64), nan=0.0, posinf=0.0, neginf=0.0)
+    labels = np.asarray(labels, dtype=np.int64)
+
+    # Collapse identical columns, keeping the first name in feature order
+    if X.shape[1] > 1:
+        distinct = np.sort(np.unique(X, axis=1, return_index=True)[1])
+        X = X[:, distinct]
+        feature_names = [feature_names[j] for j in distinct]
+    n_features = X.shape[1]
+
+    # One sort groups every cluster into a contiguous block
+    order = np.argsort(labels, kind='stable')
+    X_sorted = X[order]
+    cluster_ids, starts, sizes = np.unique(labels[order], return_index=True, return_counts=True)
+
+    means = np.add.reduceat(X_sorted, starts, axis=0) / sizes[:, None]
+    centered = X_sorted - np.repeat(means, sizes, axis=0)
+    stds = np.sqrt(np.add.reduceat(centered * centered, starts, axis=0) / sizes[:, None])
+    quantiles = np.stack([
+        np.quantile(X_sorted[start:start + size], PROFILE_QUANTILES, axis=0)
+        for start, size in zip(starts, sizes)
+    ])   # (n_clusters, n_quantiles, n_features)
+
+    overall_mean = X.mean(axis=0)
+    overall_std = X.std(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z_delta = np.where(overall_std > 0, (means - overall_mean) / overall_std, 0.0)
+
+    # Rank within each cluster by |z_delta| (ties keep feature order)
+    by_strength = np.argsort(-np.abs(z_delta), axis=1, kind='stable')
+    rank = np.empty_like(by_strength)
+    np.put_along_axis(rank, by_strength, np.arange(1, n_features + 1)[None, :], axis=1)
+
+    profiles = pd.DataFrame({
+        'cluster_id': np.repeat(cluster_ids, n_features),
+        'cluster_size': np.repeat(sizes, n_features),
+        'feature': np.tile(np.asarray(feature_names, dtype=object), len(cluster_ids)),
+        'mean': means.ravel(),
+        'std': stds.ravel(),
+        'p25': quantiles[:, 0].ravel(),
+        'p50': quantiles[:, 1].ravel(),
+        'p75': quantiles[:, 2].ravel(),
+        'overall_mean': np.tile(overall_mean, len(cluster_ids)),
+        'z_delta': z_delta.ravel(),
+        'rank': rank.ravel(),
+    })
+    return profiles.sort_values(['cluster_id', 'rank'], kind='stable', ignore_index=True)
+
+
+def save_cluster_profiles(conn, run_id: int, profiles: pd.DataFrame) -> int:
+    """Bulk insert the profiles of a run (see compute_cluster_profiles); returns the row count."""
+    values = profiles[['cluster_id', 'feature'] + PROFILE_COLUMNS].astype(object)
+    rows = [(run_id, *row) for row in values.itertuples(index=False, name=None)]
+    conn.executemany(
+        f"""
+        INSERT OR REPLACE INTO cluster_feature_profiles (run_id, cluster_id, feature, {', '.join(PROFILE_COLUMNS)})
+        VALUES (?, ?, ?, {', '.join('?' * len(PROFILE_COLUMNS))})
+        """,
+        rows
+    )
+    return len(rows)
+
+
+def carry_forward_cluster_profiles(conn, base_run_id: int, run_id: int) -> int:
+    """Copy the base run's profiles to an assign-only run (same model, same clusters)."""
+    cursor = conn.execute(
+        f"""
+        INSERT OR REPLACE INTO cluster_feature_profiles (run_id, cluster_id, feature, {', '.join(PROFILE_COLUMNS)})
+        SELECT ?, cluster_id, feature, {', '.join(PROFILE_COLUMNS)}
+        FROM cluster_feature_profiles
+        WHERE run_id = ?
+        """,
+        (run_id, base_run_id)
+    )
+    return cursor.rowcount
+
+
+def profiles_by_cluster(rows) -> Dict[int, Dict]:
+    """Group stored profile rows (ordered by cluster_id, rank) into the API shape."""
+    clusters: Dict[int, Dict] = {}
+    for row in rows:
+        cluster = clusters.setdefault(int(row['cluster_id']), {'cluster_id': int(row['cluster_id']), 'features': []})
+        cluster['features'].append({
+            'feature': row['feature'],
+            'rank': row['rank'],
+            'mean': row['mean'],
+            'std': row['std'],
+            'p25': row['p25'],
+            'p50': row['p50'],
+            'p75': row['p75'],
+            'overall_mean': row['overall_mean'],
+            'z_delta': row['z_delta'],
+            'direction': 'higher' if row['z_delta'] > 0 else 'lower' if row['z_delta'] < 0 else 'same'
+        })
+    return clusters
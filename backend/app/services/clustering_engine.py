@@ -0,0 +1,263 @@
+"""
+Clustering Engine
+Interchangeable clustering backends behind one fit/assign interface.
+
+Every backend produces a centroid model: k centers in the (scaled) input
+space, with customers assigned to their nearest center. The same assignment
+runs at serving time (registry nearest-centroid model), so stored labels and
+online predictions agree whatever backend fitted the centers.
+
+Backends:
+  - lloyd:     K-Means, Lloyd iterations (sklearn)
+  - elkan:     K-Means, Elkan's triangle-inequality pruning (fewer distance
+               computations on low-dimensional data)
+  - minibatch: Mini-batch K-Means for large customer bases
+  - sampled:   Lloyd fit on a random sample, then one chunked full assignment
+
+'auto' picks a backend from the data size and dimensionality. Every fit
+reports the same instrumentation (backend, timings, inertia, iterations,
+sampled quality scores).
+"""
+
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import silhouette_score, calinski_harabasz_score, davies_bouldin_score
+
+BACKENDS = ('lloyd', 'elkan', 'minibatch', 'sampled')
+
+# Quality scores are computed on a random sample: silhouette is O(n^2)
+# on the full matrix, which dominates the run time for large customer bases.
+METRICS_SAMPLE_SIZE = 10000
+
+# Automatic selection thresholds (number of customers / features)
+MINIBATCH_MIN_SAMPLES = 50_000
+SAMPLED_MIN_SAMPLES = 250_000
+ELKAN_MAX_FEATURES = 20
+
+# Rows used to fit the 'sampled' backend
+SAMPLED_FIT_SIZE = 50_000
+
+# Rows per block in the full nearest-center assignment
+ASSIGN_CHUNK_SIZE = 65536
+
+
+class CentroidModel:
+    """
+    Fitted centroid clustering model. Uses sklearn's attribute names
+    (cluster_centers_, labels_, inertia_, n_iter_, predict) so it can stand
+    in for a fitted KMeans everywhere models are saved or loaded.
+    """
+
+    def __init__(self, cluster_centers: np.ndarray, backend: str, n_iter: int = 0):
+        self.cluster_centers_ = np.asarray(cluster_centers, dtype=np.float64)
+        self.backend = backend
+        self.n_iter_ = int(n_iter)
+        self.labels_: Optional[np.ndarray] = None
+        self.inertia_ = 0.0
+
+    @property
+    def n_clusters(self) -> int:
+        return int(self.cluster_centers_.shape[0])
+
+    def predict(self, X) -> np.ndarray:
+        """Index of the nearest center for each (scaled) row."""
+        return assign(X, self.cluster_centers_)[0]
+
+
+def assign(X, centers: np.ndarray, chunk_size: int = ASSIGN_CHUNK_SIZE) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Nearest center of every row, in blocks so memory stays O(chunk_size * k).
+
+    Returns:
+        (labels, squared distance to the assigned center)
+    """
+    X = np.asarray(X, dtype=np.float64)
+    centers = np.asarray(centers, dtype=np.float64)
+    center_norms = np.einsum('ij,ij->i', centers, centers)
+    labels = np.empty(len(X), dtype=np.int64)
+    sq_dist = np.empty(len(X))
+    for start in range(0, len(X), chunk_size):
+        block = X[start:start + chunk_size]
+        # ||x - c||^2 = ||x||^2 - 2 x.c + ||c||^2
+        scores = block @ centers.T
+        scores *= -2.0
+        scores += center_norms
+        nearest = scores.argmin(axis=1)
+        labels[start:start + len(block)] = nearest
+        best = scores[np.arange(len(block)), nearest] + np.einsum('ij,ij->i', block, block)
+        sq_dist[start:start + len(block)] = np.maximum(best, 0.0)
+    return labels, sq_dist
+
+
+def choose_backend(n_samples: int, n_features: int) -> Tuple[str, str]:
+    """
+    Pick a backend for the data shape.
+
+    Returns:
+        (backend, reason)
+    """
+    if n_samples >= SAMPLED_MIN_SAMPLES:
+        return 'sampled', f"{n_samples} customers >= {SAMPLED_MIN_SAMPLES}: fit on a {SAMPLED_FIT_SIZE}-row sample"
+    if n_samples >= MINIBATCH_MIN_SAMPLES:
+        return 'minibatch', f"{n_samples} customers >= {MINIBATCH_MIN_SAMPLES}"
+    if n_features <= ELKAN_MAX_FEATURES:
+        return 'elkan', f"{n_features} features <= {ELKAN_MAX_FEATURES}: triangle-inequality pruning pays off"
+    return 'lloyd', f"{n_features} features > {ELKAN_MAX_FEATURES}"
+
+
+def _fit_centers(
+    X: np.ndarray,
+    n_clusters: int,
+    backend: str,
+    init: Optional[np.ndarray],
+    n_init: int,
+    random_state: int
+) -> Tuple[np.ndarray, int, int]:
+    """Fit one backend. Returns (centers, iterations, rows used for the fit)."""
+    kmeans_init = init if init is not None else 'k-means++'
+    kmeans_n_init = 1 if init is not None else n_init
+
+    if backend in ('lloyd', 'elkan'):
+        model = KMeans(
+            n_clusters=n_clusters, init=kmeans_init, n_init=kmeans_n_init,
+            max_iter=300, random_state=random_state, algorithm=backend
+        ).fit(X)
+        return model.cluster_centers_, model.n_iter_, len(X)
+
+    if backend == 'minibatch':
+        model = MiniBatchKMeans(
+            n_clusters=n_clusters, init=kmeans_init, n_init=kmeans_n_init,
+            batch_size=4096, max_iter=100, random_state=random_state
+        ).fit(X)
+        return model.cluster_centers_, model.n_iter_, len(X)
+
+    if backend == 'sampled':
+        rng = np.random.RandomState(random_state)
+        sample = X
+        if len(X) > SAMPLED_FIT_SIZE:
+            sample = X[np.sort(rng.choice(len(X), SAMPLED_FIT_SIZE, replace=False))]
+        model = KMeans(
+            n_clusters=n_clusters, init=kmeans_init, n_init=kmeans_n_init,
+            max_iter=300, random_state=random_state, algorithm='lloyd'
+        ).fit(sample)
+        return model.cluster_centers_, model.n_iter_, len(sample)
+
+    raise ValueError(f"Unknown clustering backend '{backend}'. Expected one of: auto, {', '.join(BACKENDS)}")
+
+
+def fit_clusters(
+    X_scaled,
+    n_clusters: int,
+    backend: str = 'auto',
+    init: Optional[np.ndarray] = None,
+    n_init: int = 10,
+    random_state: int = 42,
+    compute_metrics: bool = True
+) -> Tuple[CentroidModel, np.ndarray, Dict]:
+    """
+    Fit centers with the chosen backend and assign every row to its nearest center.
+
+    Args:
+        X_scaled: (n, d) matrix in the space to cluster in
+        n_clusters: Number of clusters
+        backend: One of BACKENDS, or 'auto' (see choose_backend)
+        init: Optional (n_clusters, d) initial centers (single init)
+        n_init: Number of initializations without init
+        random_state: Seed
+        compute_metrics: Add sampled silhouette / Calinski-Harabasz / Davies-Bouldin
+
+    Returns:
+        (model, labels, metrics)
+    """
+    X = np.ascontiguousarray(X_scaled, dtype=np.float64)
+    n_samples, n_features = X.shape
+    if backend == 'auto':
+        backend, reason = choose_backend(n_samples, n_features)
+    else:
+        reason = 'requested'
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown clustering backend '{backend}'. Expected one of: auto, {', '.join(BACKENDS)}")
+
+    start = time.perf_counter()
+    centers, n_iter, n_fit_samples = _fit_centers(X, n_clusters, backend, init, n_init, random_state)
+    fit_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    labels, sq_dist = assign(X, centers)
+    assign_seconds = time.perf_counter() - start
+
+    model = CentroidModel(centers, backend, n_iter)
+    model.labels_ = labels
+    model.inertia_ = float(sq_dist.sum())
+
+    metrics = compute_clustering_metrics(X, labels) if compute_metrics else {}
+    metrics.update({
+        'backend': backend,
+        'backend_reason': reason,
+        'inertia': model.inertia_,
+        'n_clusters': int(n_clusters),
+        'n_samples': int(n_samples),
+        'model_dims': int(n_features),   # clusterer input dimensions (after reduction)
+        'n_fit_samples': int(n_fit_samples),
+        'n_iter': model.n_iter_,
+        'fit_seconds': round(fit_seconds, 4),
+        'assign_seconds': round(assign_seconds, 4),
+        'warm_started': init is not None
+    })
+    return model, labels, metrics
+
+
+def compute_clustering_metrics(
+    X_scaled: np.ndarray,
+    labels: np.ndarray,
+    sample_size: int = METRICS_SAMPLE_SIZE,
+    random_state: int = 42
+) -> Dict:
+    """
+    Compute silhouette, Calinski-Harabasz and Davies-Bouldin scores on a random sample.
+    The same sample (fixed seed) is used for every k so sweep scores are comparable.
+    """
+    n_samples = len(labels)
+    if n_samples > sample_size:
+        rng = np.random.RandomState(random_state)
+        idx = rng.choice(n_samples, sample_size, replace=False)
+        X_eval, labels_eval = X_scaled[idx], labels[idx]
+    else:
+        X_eval, labels_eval = X_scaled, labels
+
+    n_labels = len(np.unique(labels_eval))
+    if n_labels < 2 or n_labels >= len(labels_eval):
+        # Scores are undefined with a single cluster (or one sample per cluster)
+        return {
+            'silhouette_score': None,
+            'calinski_harabasz_score': None,
+            'davies_bouldin_score': None,
+            'metrics_sample_size': len(labels_eval)
+        }
+
+    return {
+        'silhouette_score': float(silhouette_score(X_eval, labels_eval)),
+        'calinski_harabasz_score': float(calinski_harabasz_score(X_eval, labels_eval)),
+        'davies_bouldin_score': float(davies_bouldin_score(X_eval, labels_eval)),
+        'metrics_sample_size': len(labels_eval)
+    }
+
+
+def print_clustering_metrics(metrics: Dict) -> None:
+    """Print evaluation metrics and engine instrumentation in the standard report format."""
+    def fmt(value, spec):
+        return "n/a" if value is None else format(value, spec)
+
+    if 'backend' in metrics:
+        print(f"\nClustering backend: {metrics['backend']} ({metrics['backend_reason']})")
+        print(f"  Fit: {metrics['fit_seconds']:.2f}s on {metrics['n_fit_samples']} rows, "
+              f"{metrics['n_iter']} iterations | Assign: {metrics['assign_seconds']:.2f}s")
+    if 'metrics_sample_size' in metrics:
+        print(f"\nClustering Metrics (sample of {metrics['metrics_sample_size']}):")
+        print(f"  Silhouette Score: {fmt(metrics['silhouette_score'], '.4f')} (higher is better, range: -1 to 1)")
+        print(f"  Calinski-Harabasz Score: {fmt(metrics['calinski_harabasz_score'], '.2f')} (higher is better)")
+        print(f"  Davies-Bouldin Score: {fmt(metrics['davies_bouldin_score'], '.4f')} (lower is better)")
+    print(f"  Inertia: {metrics['inertia']:.2f}")
@@ -0,0 +1,183 @@
+"""
+Feature Reduction
+Variance filter, correlation filter and randomized PCA between scaling and clustering.
+
+The category pipeline produces one column per transaction category (spend and
+count) and per product category, plus several aggregates that duplicate each
+other (e.g. total_spent / importo_total). The reduction stage drops columns
+that are (near) constant or almost perfectly correlated with an earlier
+column, then projects the rest onto the leading principal components, so
+K-Means iterates over tens of dimensions instead of hundreds.
+
+The fitted stage is an affine map of the scaled features. It is stored next to
+the model as plain arrays (to_arrays), and serving folds it together with the
+scaler into one matrix product (projection()) before the nearest-centroid search.
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Columns where fewer than this share of customers differ from the median are dropped
+NZV_MIN_SUPPORT = 0.001
+
+# A column correlated beyond this with an earlier kept column is dropped
+CORRELATION_THRESHOLD = 0.95
+
+# PCA only runs above this many remaining columns
+PCA_MIN_FEATURES = 10
+
+# Leading components kept: enough to explain VARIANCE_TARGET, at most MAX_COMPONENTS
+VARIANCE_TARGET = 0.95
+MAX_COMPONENTS = 32
+
+# Rows used for the correlation estimate and the PCA fit on very large inputs
+FIT_SAMPLE_SIZE = 200_000
+
+
+class FeatureReducer:
+    """
+    Fitted reduction stage over standardized features:
+    keep a subset of columns, then (optionally) project onto principal components.
+    """
+
+    def __init__(
+        self,
+        n_input: int,
+        kept: np.ndarray,
+        components: Optional[np.ndarray] = None,
+        pca_mean: Optional[np.ndarray] = None,
+        dropped: Optional[Dict[str, str]] = None,
+        explained_variance: float = 1.0
+    ):
+        self.n_input = int(n_input)
+        self.kept = np.asarray(kept, dtype=np.int64)
+        self.components = components          # (r, len(kept)) or None
+        self.pca_mean = pca_mean              # (len(kept),) or None
+        self.dropped = dropped or {}
+        self.explained_variance = float(explained_variance)
+
+    @property
+    def n_output(self) -> int:
+        return int(self.components.shape[0]) if self.components is not None else len(self.kept)
+
+    @classmethod
+    def fit(
+        cls,
+        X_scaled: np.ndarray,
+        feature_names: Sequence[str],
+        random_state: int = 42
+    ) -> "FeatureReducer":
+        """Fit the stage on standardized features (zero mean, unit variance columns)."""
+        X_scaled = np.asarray(X_scaled, dtype=np.float64)
+        n_samples, n_input = X_scaled.shape
+        names = list(feature_names)
+        dropped: Dict[str, str] = {}
+
+        sample = X_scaled
+        if n_samples > FIT_SAMPLE_SIZE:
+            rng = np.random.RandomState(random_state)
+            sample = X_scaled[np.sort(rng.choice(n_samples, FIT_SAMPLE_SIZE, replace=False))]
+
+        # 1. Near-zero variance: (almost) every customer has the median value
+        support = (sample != np.median(sample, axis=0)).mean(axis=0)
+        candidates = []
+        for j in range(n_input):
+            if support[j] < NZV_MIN_SUPPORT:
+                dropped[names[j]] = f"near-zero variance ({support[j]:.2%} of customers differ)"
+            else:
+                candidates.append(j)
+
+        # 2. Correlation: keep columns in order, skip those explained by an earlier one
+        kept: List[int] = []
+        if candidates:
+            block = sample[:, candidates]
+            std = block.std(axis=0)
+            std[std == 0] = 1.0
+            block = (block - block.mean(axis=0)) / std
+            corr = np.abs(block.T @ block) / len(block)
+            kept_pos: List[int] = []
+            for pos, j in enumerate(candidates):
+                if kept_pos:
+                    best = int(np.argmax(corr[pos, kept_pos]))
+                    if corr[pos, kept_pos[best]] > CORRELATION_THRESHOLD:
+                        partner = names[candidates[kept_pos[best]]]
+                        dropped[names[j]] = f"correlated with {partner} (|r|={corr[pos, kept_pos[best]]:.3f})"
+                        continue
+                kept_pos.append(pos)
+                kept.append(j)
+
+        reducer = cls(n_input, np.array(kept, dtype=np.int64), dropped=dropped)
+
+        # 3. Randomized PCA on what is left
+        if len(kept) > PCA_MIN_FEATURES:
+            from sklearn.decomposition import PCA
+
+            fit_rows = sample[:, kept]
+            n_components = min(MAX_COMPONENTS, len(kept), len(fit_rows) - 1)
+            pca = PCA(n_components=n_components, svd_solver='randomized', random_state=random_state)
+            pca.fit(fit_rows)
+            total_variance = fit_rows.var(axis=0, ddof=1).sum()
+            cumulative = np.cumsum(pca.explained_variance_) / total_variance
+            n_keep = min(int(np.searchsorted(cumulative, VARIANCE_TARGET)) + 1, n_components)
+            reducer.components = pca.components_[:n_keep].copy()
+            reducer.pca_mean = pca.mean_.copy()
+            reducer.explained_variance = float(cumulative[n_keep - 1])
+
+        return reducer
+
+    def transform(self, X_scaled) -> np.ndarray:
+        """Standardized features -> reduced features."""
+        X_kept = np.asarray(X_scaled, dtype=np.float64)[..., self.kept]
+        if self.components is None:
+            return X_kept
+        return (X_kept - self.pca_mean) @ self.components.T
+
+    def inverse_transform(self, Z) -> np.ndarray:
+        """Reduced features -> standardized features (dropped columns at their mean, 0)."""
+        Z = np.atleast_2d(np.asarray(Z, dtype=np.float64))
+        kept_values = Z if self.components is None else Z @ self.components + self.pca_mean
+        X_scaled = np.zeros((len(Z), self.n_input))
+        X_scaled[:, self.kept] = kept_values
+        return X_scaled
+
+    def projection(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        The stage as one affine map of the standardized features:
+        transform(X) == X @ projection + offset.
+        """
+        selection = np.zeros((self.n_input, len(self.kept)))
+        selection[self.kept, np.arange(len(self.kept))] = 1.0
+        if self.components is None:
+            return selection, np.zeros(len(self.kept))
+        return selection @ self.components.T, -(self.pca_mean @ self.components.T)
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Plain arrays for the model registry (see from_arrays)."""
+        k = len(self.kept)
+        return {
+            'reduction_kept': self.kept,
+            'reduction_components': self.components if self.components is not None else np.eye(k),
+            'reduction_mean': self.pca_mean if self.pca_mean is not None else np.zeros(k),
+        }
+
+    @classmethod
+    def from_arrays(cls, n_input: int, arrays: Dict[str, np.ndarray]) -> "FeatureReducer":
+        """Rebuild a stage stored with to_arrays (an identity projection means no PCA)."""
+        kept = np.asarray(arrays['reduction_kept'], dtype=np.int64)
+        components = np.asarray(arrays['reduction_components'], dtype=np.float64)
+        pca_mean = np.asarray(arrays['reduction_mean'], dtype=np.float64)
+        if components.shape == (len(kept), len(kept)) and np.array_equal(components, np.eye(len(kept))):
+            components = pca_mean = None
+        return cls(n_input, kept, components, pca_mean)
+
+    def summary(self) -> Dict:
+        """Run metrics describing the fitted stage."""
+        return {
+            'reduction_input_features': self.n_input,
+            'reduction_kept_features': len(self.kept),
+            'reduction_output_dims': self.n_output,
+            'reduction_pca': self.components is not None,
+            'reduction_explained_variance': round(self.explained_variance, 4),
+            'reduction_dropped': self.dropped,
+        }
@@ -0,0 +1,379 @@
+"""
+Feature Spec
+Single declarative definition of the clustering features.
+
+Every feature is an aggregate of a transactions/holdings column per customer,
+or per customer and category (one feature per category value). The spec is
+compiled into two kernels that must produce the same vectors:
+
+  - compute_feature_frame: vectorized pandas groupby over loaded frames
+    (training and assign-only runs)
+  - FeatureKernel: SQLite aggregate queries for one customer (online suggest)
+    or a set of customers (bulk suggest), without pandas
+
+Semantics follow pandas: sum of no values is 0, std is the sample std
+(ddof=1), count ignores NULLs, blank categories are skipped, and anything
+undefined (mean of nothing, std of one value) becomes 0. check_parity()
+asserts both kernels agree on a sample of customers.
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Columns each source contributes to the features
+SOURCE_COLUMNS = {
+    'transactions': ['customer_id', 'amount', 'tx_category'],
+    'holdings': ['customer_id', 'balance', 'category'],
+}
+
+
+@dataclass(frozen=True)
+class Aggregate:
+    """One aggregate of a source column, per customer or per customer and category."""
+    name: str                   # feature name, or name prefix when per category
+    source: str                 # 'transactions' or 'holdings'
+    column: str                 # aggregated column
+    func: str                   # 'sum', 'mean', 'std', 'min', 'max' or 'count'
+    by: Optional[str] = None    # category column (one feature per category value)
+
+    def feature_name(self, category: Optional[str] = None) -> str:
+        return f"{self.name}{category}" if self.by else self.name
+
+
+# Training column order: transaction stats, category spend/counts, product features
+FEATURE_SPEC: Tuple[Aggregate, ...] = (
+    Aggregate('total_spent', 'transactions', 'amount', 'sum'),
+    Aggregate('avg_transaction', 'transactions', 'amount', 'mean'),
+    Aggregate('std_transaction', 'transactions', 'amount', 'std'),
+    Aggregate('transaction_count', 'transactions', 'amount', 'count'),
+    Aggregate('importo_total', 'transactions', 'amount', 'sum'),
+    Aggregate('spending_avg', 'transactions', 'amount', 'mean'),
+    Aggregate('spending_std', 'transactions', 'amount', 'std'),
+    Aggregate('transaction_min', 'transactions', 'amount', 'min'),
+    Aggregate('transaction_max', 'transactions', 'amount', 'max'),
+    Aggregate('transaction_count_amount', 'transactions', 'amount', 'count'),
+    Aggregate('categoria_mode_', 'transactions', 'amount', 'sum', by='tx_category'),
+    Aggregate('categoria_count_', 'transactions', 'amount', 'count', by='tx_category'),
+    Aggregate('product_category_balance_', 'holdings', 'balance', 'sum', by='category'),
+    Aggregate('total_balance', 'holdings', 'balance', 'sum'),
+    Aggregate('avg_balance', 'holdings', 'balance', 'mean'),
+    Aggregate('product_count', 'holdings', 'balance', 'count'),
+)
+
+_PANDAS_FUNCS = {'sum': 'sum', 'mean': 'mean', 'std': 'std', 'min': 'min', 'max': 'max', 'count': 'count'}
+
+# SQL aggregate of column c (std is computed separately in two passes)
+_SQL_FUNCS = {
+    'sum': "COALESCE(SUM(t.{c}), 0)",
+    'mean': "AVG(t.{c})",
+    'min': "MIN(t.{c})",
+    'max': "MAX(t.{c})",
+    'count': "COUNT(t.{c})",
+}
+
+# Characters str.strip() removes that decide whether a category is blank
+_BLANK_CHARS = "' ' || char(9) || char(10) || char(11) || char(12) || char(13)"
+
+
+def _groups(spec: Sequence[Aggregate]) -> Dict[Tuple[str, Optional[str]], List[Aggregate]]:
+    """Aggregates sharing one grouping (source and category column), in spec order."""
+    groups: Dict[Tuple[str, Optional[str]], List[Aggregate]] = {}
+    for agg in spec:
+        groups.setdefault((agg.source, agg.by), []).append(agg)
+    return groups
+
+
+def _valid_categories(values: pd.Series) -> pd.Series:
+    return values.notna() & (values.astype(str).str.strip() != '')
+
+
+def compute_feature_frame(
+    customer_ids: Sequence[str],
+    sources: Dict[str, pd.DataFrame],
+    spec: Sequence[Aggregate] = FEATURE_SPEC
+) -> pd.DataFrame:
+    """
+    Batch kernel: features of many customers from loaded source frames.
+
+    Args:
+        customer_ids: Customers to return (row order of the result)
+        sources: 'transactions' / 'holdings' -> frame with at least SOURCE_COLUMNS
+        spec: Feature spec
+
+    Returns:
+        Frame indexed by customer_id with one column per feature in spec order
+        (per-category features sorted by category). Sources without rows
+        contribute no columns.
+    """
+    index = pd.Index(customer_ids, name='customer_id')
+    columns: Dict[str, pd.Series] = {}
+    blocks: Dict[Aggregate, pd.DataFrame] = {}
+
+    for (source, by), aggs in _groups(spec).items():
+        df = sources.get(source)
+        if df is None or len(df) == 0:
+            continue
+        keys = ['customer_id']
+        if by:
+            df = df[_valid_categories(df[by])]
+            keys.append(by)
+        funcs = list(dict.fromkeys(_PANDAS_FUNCS[agg.func] for agg in aggs))
+        grouped = df.groupby(keys)[aggs[0].column].agg(funcs)
+        for agg in aggs:
+            values = grouped[_PANDAS_FUNCS[agg.func]]
+            if by:
+                blocks[agg] = values.unstack(by).sort_index(axis=1)
+            else:
+                blocks[agg] = values.to_frame(agg.name)
+
+    for agg in spec:
+        block = blocks.get(agg)
+        if block is None:
+            continue
+        for col in block.columns:
+            name = agg.feature_name(col) if agg.by else agg.name
+            columns[name] = block[col].reindex(index)
+
+    frame = pd.DataFrame(columns, index=index, dtype=np.float64)
+    return frame.replace([np.inf, -np.inf], np.nan).fillna(0)
+
+
+class FeatureKernel:
+    """
+    Spec compiled into SQLite aggregate queries for a fixed feature list
+    (a trained model's columns). Features the spec does not define stay 0.
+    """
+
+    def __init__(self, feature_names: Sequence[str], spec: Sequence[Aggregate] = FEATURE_SPEC):
+        self.feature_names = list(feature_names)
+        self.feature_index = {name: j for j, name in enumerate(self.feature_names)}
+        self._queries = []
+        for (source, by), aggs in _groups(spec).items():
+            # Only aggregates the model actually uses
+            if by:
+                aggs = [a for a in aggs if any(n.startswith(a.name) for n in self.feature_names)]
+            else:
+                aggs = [a for a in aggs if a.name in self.feature_index]
+            if aggs:
+                self._queries.append((self._compile(source, by, aggs), by, aggs))
+
+    @staticmethod
+    def _compile(source: str, by: Optional[str], aggs: List[Aggregate]) -> str:
+        """
+        Grouped query template. {scope} is the FROM clause yielding the source rows
+        as t, {customers} a predicate restricting them to the requested customers.
+        """
+        column = aggs[0].column
+        keys = "t.customer_id" + (f", t.{by}" if by else "")
+        where = "{customers}"
+        if by:
+            where += f" AND t.{by} IS NOT NULL AND TRIM(t.{by}, {_BLANK_CHARS}) != ''"
+
+        selects = [keys] + [
+            f"{_SQL_FUNCS[a.func].format(c=column)} AS a{i}"
+            for i, a in enumerate(aggs) if a.func != 'std'
+        ]
+        if any(a.func == 'std' for a in aggs):
+            selects += [f"COUNT(t.{column}) AS n", f"AVG(t.{column}) AS mean"]
+
+        outputs = ["g.customer_id"] + ([f"g.{by}"] if by else [])
+        for i, a in enumerate(aggs):
+            if a.func != 'std':
+                outputs.append(f"g.a{i}")
+                continue
+            # Sample variance in two passes (sqrt applied in numpy; SQLite may lack it)
+            match = "s.customer_id = g.customer_id" + (f" AND s.{by} = g.{by}" if by else "")
+            outputs.append(
+                f"CASE WHEN g.n > 1 THEN (SELECT SUM((s.{column} - g.mean) * (s.{column} - g.mean)) "
+                f"FROM {source} s WHERE {match}) / (g.n - 1) END"
+            )
+        return (
+            f"WITH g AS (SELECT {', '.join(selects)} FROM {{scope}} WHERE {where} GROUP BY {keys}) "
+            f"SELECT {', '.join(outputs)} FROM g"
+        )
+
+    def _fill(self, X: np.ndarray, rows: List[tuple], positions: np.ndarray, by: Optional[str],
+              aggs: List[Aggregate]) -> None:
+        """Scatter query rows (customer_id[, category], values...) into X."""
+        offset = 2 if by else 1
+        if by:
+            categories, category_idx = np.unique(
+                np.array([str(row[1]) for row in rows], dtype=object), return_inverse=True
+            )
+        for i, agg in enumerate(aggs):
+            values = np.array([row[offset + i] for row in rows], dtype=np.float64)
+            if agg.func == 'std':
+                values = np.sqrt(values)
+            if not by:
+                j = self.feature_index.get(agg.name)
+                if j is not None:
+                    X[positions, j] = values
+                continue
+            # One column per category
+            for c, category in enumerate(categories):
+                j = self.feature_index.get(agg.feature_name(category))
+                if j is not None:
+                    sel = category_idx == c
+                    X[positions[sel], j] = values[sel]
+
+    def _finish(self, X: np.ndarray) -> np.ndarray:
+        # Undefined aggregates (NULL -> NaN) become 0, as in the batch kernel
+        X[~np.isfinite(X)] = 0
+        return X
+
+    def vector(self, conn, customer_id: str) -> Optional[np.ndarray]:
+        """Single-row kernel: one customer's raw feature vector, or None if unknown."""
+        if conn.execute("SELECT 1 FROM customers WHERE customer_id = ?", (customer_id,)).fetchone() is None:
+            return None
+        X = np.zeros((1, len(self.feature_names)))
+        for template, by, aggs in self._queries:
+            query = template.format(scope=f"{aggs[0].source} t", customers="t.customer_id = ?")
+            rows = conn.execute(query, (customer_id,)).fetchall()
+            if rows:
+                self._fill(X, rows, np.zeros(len(rows), dtype=np.int64), by, aggs)
+        return self._finish(X)[0]
+
+    def matrix(self, conn, customer_ids: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Set kernel: raw feature matrix of many customers. The IDs are loaded into
+        a temp table and each grouping is one query joined against it.
+
+        Returns:
+            (X, found): matrix aligned with customer_ids and a boolean mask of
+            the IDs present in the customers table
+        """
+        ids = list(dict.fromkeys(str(cid) for cid in customer_ids))
+        pos = {cid: i for i, cid in enumerate(ids)}
+        X = np.zeros((len(ids), len(self.feature_names)))
+        found = np.zeros(len(ids), dtype=bool)
+
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS feature_customers (customer_id TEXT PRIMARY KEY)")
+        conn.execute("DELETE FROM temp.feature_customers")
+        conn.executemany("INSERT INTO temp.feature_customers (customer_id) VALUES (?)", ((cid,) for cid in ids))
+        try:
+            existing = conn.execute("""
+                SELECT c.customer_id FROM temp.feature_customers f
+                JOIN customers c ON c.customer_id = f.customer_id
+            """).fetchall()
+            found[[pos[row[0]] for row in existing]] = True
+
+            for template, by, aggs in self._queries:
+                scope = f"temp.feature_customers f JOIN {aggs[0].source} t ON t.customer_id = f.customer_id"
+                query = template.format(scope=scope, customers="1")
+                rows = conn.execute(query).fetchall()
+                if rows:
+                    positions = np.array([pos[row[0]] for row in rows], dtype=np.int64)
+                    self._fill(X, rows, positions, by, aggs)
+        finally:
+            conn.execute("DELETE FROM temp.feature_customers")
+
+        order = np.array([pos[str(cid)] for cid in customer_ids], dtype=np.int64)
+        return self._finish(X)[order], found[order]
+
+
+def load_sources(conn, customer_ids: Sequence[str]) -> Dict[str, pd.DataFrame]:
+    """Source rows (SOURCE_COLUMNS) of the given customers, for compute_feature_frame."""
+    ids = list(dict.fromkeys(str(cid) for cid in customer_ids))
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS feature_customers (customer_id TEXT PRIMARY KEY)")
+    conn.execute("DELETE FROM temp.feature_customers")
+    conn.executemany("INSERT INTO temp.feature_customers (customer_id) VALUES (?)", ((cid,) for cid in ids))
+    try:
+        return {
+            source: pd.read_sql_query(
+                f"SELECT {', '.join('t.' + c for c in columns)} FROM temp.feature_customers f "
+                f"JOIN {source} t ON t.customer_id = f.customer_id",
+                conn
+            )
+            for source, columns in SOURCE_COLUMNS.items()
+        }
+    finally:
+        conn.execute("DELETE FROM temp.feature_customers")
+
+
+def check_parity(
+    conn,
+    customer_ids: Sequence[str],
+    feature_names: Optional[Sequence[str]] = None,
+    rtol: float = 1e-9,
+    atol: float = 1e-9
+) -> Dict:
+    """
+    Assert that the batch kernel, the single-row kernel and the set kernel
+    produce the same feature vectors for the given customers (tolerances only
+    absorb floating-point summation order), and time each of them.
+
+    Args:
+        conn: Open database connection
+        customer_ids: Sample of existing customers
+        feature_names: Feature list to compare (default: every feature of the sample)
+
+    Returns:
+        Timings and the largest absolute difference found
+
+    Raises:
+        AssertionError: naming the first customer and feature that differ
+    """
+    customer_ids = [str(cid) for cid in customer_ids]
+
+    start = time.perf_counter()
+    frame = compute_feature_frame(customer_ids, load_sources(conn, customer_ids))
+    batch_seconds = time.perf_counter() - start
+    names = list(feature_names) if feature_names is not None else list(frame.columns)
+    expected = frame.reindex(columns=names, fill_value=0).to_numpy(dtype=np.float64)
+
+    kernel = FeatureKernel(names)
+    start = time.perf_counter()
+    single = np.vstack([kernel.vector(conn, cid) for cid in customer_ids]) if customer_ids else expected
+    single_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matrix, _ = kernel.matrix(conn, customer_ids)
+    matrix_seconds = time.perf_counter() - start
+
+    for label, actual in (("single-row", single), ("set", matrix)):
+        close = np.isclose(actual, expected, rtol=rtol, atol=atol)
+        if not close.all():
+            i, j = np.argwhere(~close)[0]
+            raise AssertionError(
+                f"{label} kernel differs from batch kernel for customer {customer_ids[i]}, "
+                f"feature {names[j]}: {actual[i, j]!r} != {expected[i, j]!r}"
+            )
+
+    return {
+        'n_customers': len(customer_ids),
+        'n_features': len(names),
+        'max_abs_diff': float(max(np.abs(single - expected).max(initial=0), np.abs(matrix - expected).max(initial=0))),
+        'batch_ms_per_customer': 1000 * batch_seconds / max(len(customer_ids), 1),
+        'single_row_ms_per_customer': 1000 * single_seconds / max(len(customer_ids), 1),
+        'set_ms_per_customer': 1000 * matrix_seconds / max(len(customer_ids), 1),
+    }
+
+
+if __name__ == "__main__":
+    # Parity benchmark: python -m app.services.feature_spec [sample_size]
+    import sys
+    from app.db import get_conn
+    from app.services import model_registry
+
+    sample_size = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    conn = get_conn()
+    try:
+        sample = [row[0] for row in conn.execute(
+            "SELECT customer_id FROM customers ORDER BY RANDOM() LIMIT ?", (sample_size,)
+        )]
+        try:
+            feature_names = model_registry.load_model().feature_names
+        except FileNotFoundError:
+            feature_names = None
+        result = check_parity(conn, sample, feature_names)
+    finally:
+        conn.close()
+    print(f"Feature kernels agree on {result['n_customers']} customers x {result['n_features']} features "
+          f"(max abs diff {result['max_abs_diff']:.3g})")
+    print(f"  batch:      {result['batch_ms_per_customer']:.3f} ms/customer")
+    print(f"  single-row: {result['single_row_ms_per_customer']:.3f} ms/customer")
+    print(f"  set:        {result['set_ms_per_customer']:.3f} ms/customer")
@@ -0,0 +1,178 @@
+"""
+Lookalike Index
+Nearest-neighbour search over customers in the clustering space of a run.
+
+Every batch run stores the matrix it clustered (scaled features, after the
+reduction stage when the run used one) with the customer ids as a registry
+artifact ('lookalike'). Serving loads it once per run and answers "customers
+most similar to this one" with:
+  - a KD-tree when the space has at most TREE_MAX_DIMS dimensions (the usual
+    case after PCA), built in memory when the index is loaded
+  - blocked brute force otherwise, and for queries restricted to the owners
+    of a product (one matrix-vector product per block, then argpartition)
+
+Distances are Euclidean in the clustering space, so lookalikes are the same
+notion of similarity the clusters are built on. Only the artifacts of LATEST
+and the run before it are kept (prune_lookalike_indexes).
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services import model_registry
+
+ARTIFACT_NAME = "lookalike"
+
+# KD-trees stop paying off above this many dimensions
+TREE_MAX_DIMS = 20
+
+# Rows per block in the brute-force search
+BRUTE_CHUNK_SIZE = 65536
+
+# Runs before LATEST whose index is kept (serving processes reload within seconds)
+KEEP_PREVIOUS_RUNS = 1
+
+
+class LookalikeIndex:
+    """Customer vectors of one run, searchable by Euclidean distance."""
+
+    def __init__(self, customer_ids: Sequence[str], X: np.ndarray, run_id: Optional[int] = None):
+        self.customer_ids = np.asarray(customer_ids, dtype=str)
+        self.X = np.ascontiguousarray(X, dtype=np.float64)
+        self.run_id = run_id
+        self._position: Dict[str, int] = {c: i for i, c in enumerate(self.customer_ids.tolist())}
+        self._norms = np.einsum('ij,ij->i', self.X, self.X)
+        self._owner_masks: Dict[Tuple[str, Tuple[int, int]], np.ndarray] = {}
+        self._tree = None
+        if self.n_dims <= TREE_MAX_DIMS and len(self.X) > 0:
+            from sklearn.neighbors import KDTree
+            self._tree = KDTree(self.X, leaf_size=40)
+
+    @property
+    def n_customers(self) -> int:
+        return len(self.customer_ids)
+
+    @property
+    def n_dims(self) -> int:
+        return int(self.X.shape[1])
+
+    @property
+    def method(self) -> str:
+        return 'kd_tree' if self._tree is not None else 'brute'
+
+    @classmethod
+    def load(cls, run_id: int) -> "LookalikeIndex":
+        """Load the run's artifact (FileNotFoundError if the run has none)."""
+        arrays = model_registry.load_artifact(run_id, ARTIFACT_NAME)
+        return cls(arrays['customer_ids'], arrays['X'], run_id=run_id)
+
+    def position(self, customer_id: str) -> Optional[int]:
+        return self._position.get(customer_id)
+
+    def vector(self, customer_id: str) -> Optional[np.ndarray]:
+        pos = self._position.get(customer_id)
+        return None if pos is None else self.X[pos]
+
+    def owners_mask(self, ownership, product_code: str) -> np.ndarray:
+        """Boolean mask of index rows owning product_code (cached per ownership index version)."""
+        key = (product_code, ownership.version)
+        mask = self._owner_masks.get(key)
+        if mask is None:
+            mask = ownership.mask(self.customer_ids, [product_code])[:, 0]
+            if len(self._owner_masks) >= 64:
+                self._owner_masks.clear()
+            self._owner_masks[key] = mask
+        return mask
+
+    def _brute(self, x: np.ndarray, k: int, allowed: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """Blocked exact k-NN; allowed is an optional boolean row mask."""
+        best_pos = np.empty(0, dtype=np.int64)
+        best_dist = np.empty(0)
+        x_norm = float(x @ x)
+        for start in range(0, self.n_customers, BRUTE_CHUNK_SIZE):
+            block = slice(start, start + BRUTE_CHUNK_SIZE)
+            # ||x - y||^2 = ||x||^2 - 2 x.y + ||y||^2
+            dist = self._norms[block] - 2.0 * (self.X[block] @ x) + x_norm
+            if allowed is not None:
+                dist = np.where(allowed[block], dist, np.inf)
+            take = min(k, len(dist))
+            idx = np.argpartition(dist, take - 1)[:take]
+            best_pos = np.concatenate([best_pos, idx + start])
+            best_dist = np.concatenate([best_dist, dist[idx]])
+            if len(best_pos) > k:
+                keep = np.argpartition(best_dist, k - 1)[:k]
+                best_pos, best_dist = best_pos[keep], best_dist[keep]
+        finite = np.isfinite(best_dist)
+        best_pos, best_dist = best_pos[finite], best_dist[finite]
+        order = np.argsort(best_dist, kind='stable')
+        return best_pos[order], np.sqrt(np.maximum(best_dist[order], 0.0))
+
+    def query(
+        self,
+        x: np.ndarray,
+        k: int = 10,
+        allowed: Optional[np.ndarray] = None,
+        exclude: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        The k nearest customers to x (a vector in the clustering space).
+
+        Args:
+            allowed: Optional boolean mask over index rows (e.g. owners of a product)
+            exclude: Optional row to leave out (the query customer itself)
+        Returns:
+            (row positions, distances), nearest first
+        """
+        x = np.asarray(x, dtype=np.float64).ravel()
+        if self.n_customers == 0 or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        if self._tree is not None and allowed is None:
+            # One extra neighbour covers the excluded row
+            n_query = min(k + (exclude is not None), self.n_customers)
+            dist, pos = self._tree.query(x[None, :], k=n_query)
+            pos, dist = pos[0].astype(np.int64), dist[0]
+            if exclude is not None:
+                keep = pos != exclude
+                pos, dist = pos[keep], dist[keep]
+            return pos[:k], dist[:k]
+
+        if exclude is not None:
+            allowed = np.ones(self.n_customers, dtype=bool) if allowed is None else allowed.copy()
+            allowed[exclude] = False
+        return self._brute(x, k, allowed)
+
+
+def save_lookalike_index(run_id: int, customer_ids: Sequence[str], X_model: np.ndarray) -> None:
+    """Store the clustered matrix of a run as its lookalike artifact."""
+    model_registry.save_artifact(
+        run_id, ARTIFACT_NAME,
+        customer_ids=np.asarray(list(customer_ids), dtype=str),
+        X=np.asarray(X_model, dtype=np.float64)
+    )
+
+
+def carry_forward_lookalike_index(base_run_id: int, run_id: int, customer_ids: Sequence[str], X_model: np.ndarray) -> bool:
+    """
+    Lookalike artifact for an assign-only run: the base run's vectors with the
+    given (new/changed) customers replaced or appended. Returns False if the
+    base run has no artifact.
+    """
+    if not model_registry.has_artifact(base_run_id, ARTIFACT_NAME):
+        return False
+    base = model_registry.load_artifact(base_run_id, ARTIFACT_NAME)
+    changed = np.asarray(list(customer_ids), dtype=str)
+    keep = ~np.isin(base['customer_ids'], changed)
+    X_changed = np.asarray(X_model, dtype=np.float64).reshape(len(changed), base['X'].shape[1])
+    save_lookalike_index(
+        run_id,
+        np.concatenate([base['customer_ids'][keep], changed]),
+        np.vstack([base['X'][keep], X_changed])
+    )
+    return True
+
+
+def prune_lookalike_indexes() -> List[int]:
+    """Delete the lookalike artifacts of runs older than LATEST and the run before it."""
+    return model_registry.prune_artifacts(ARTIFACT_NAME, keep_previous=KEEP_PREVIOUS_RUNS)
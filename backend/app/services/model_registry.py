@@ -0,0 +1,352 @@
+"""
+Model Registry
+Versioned clustering model artifacts keyed by batch run_id.
+
+Each run is stored as one uncompressed .npz file (centroids, scaler mean/scale,
+feature order, metrics, plus the reduction stage when the run used one)
+written atomically with os.replace, so readers never see a half-written model.
+Loading needs only NumPy - no sklearn unpickling - and because members are
+stored uncompressed they can be memory-mapped in place.
+
+Larger per-run arrays that only some readers need (e.g. the lookalike index)
+are stored as named artifacts next to the entry (run_<id>.<name>.npz), so
+loading the model does not read them. prune_artifacts keeps such an artifact
+for LATEST and the run before it only, so the registry does not grow by a
+full matrix per run.
+
+A LATEST pointer file names the most recent successful run. It is only moved
+once a run has finished, so processes loading "the latest model" never pick up
+a run that is still writing its results.
+"""
+
+import json
+import os
+import struct
+import zipfile
+from dataclasses import dataclass, field
+from functools import cached_property
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.services.feature_reduction import FeatureReducer
+
+# backend/app/services/model_registry.py -> parents[2] is backend/
+REGISTRY_DIR = Path(__file__).resolve().parents[2] / "models" / "registry"
+LATEST_POINTER = "LATEST"
+
+# Core members every registry entry has; anything else is an optional extra array
+_CORE_MEMBERS = ("centroids", "scaler_mean", "scaler_scale", "feature_names", "metrics_json")
+
+
+@dataclass(frozen=True)
+class RegistryModel:
+    """
+    Nearest-centroid clustering model loaded from the registry.
+    Exposes transform/predict so it can stand in for the fitted scaler and K-Means.
+    """
+    run_id: Optional[int]          # None for models not stored in the registry
+    centroids: np.ndarray          # (k, d) in scaled feature space
+    scaler_mean: np.ndarray        # (d,)
+    scaler_scale: np.ndarray       # (d,)
+    feature_names: List[str]
+    metrics: Dict = field(default_factory=dict)
+    arrays: Dict[str, np.ndarray] = field(default_factory=dict)
+
+    @property
+    def n_clusters(self) -> int:
+        return int(self.centroids.shape[0])
+
+    @property
+    def n_features(self) -> int:
+        return len(self.feature_names)
+
+    @cached_property
+    def reducer(self) -> Optional[FeatureReducer]:
+        """Reduction stage between scaling and clustering, if the run used one."""
+        if 'reduction_kept' not in self.arrays:
+            return None
+        return FeatureReducer.from_arrays(len(self.scaler_mean), self.arrays)
+
+    @cached_property
+    def _affine(self):
+        """Scaling and reduction folded into X @ A + b (None without a reduction stage)."""
+        if self.reducer is None:
+            return None
+        projection, offset = self.reducer.projection()
+        A = projection / self.scaler_scale[:, None]
+        b = offset - (self.scaler_mean / self.scaler_scale) @ projection
+        return A, b
+
+    def transform(self, X) -> np.ndarray:
+        """Raw features to the clustering space (StandardScaler.transform, then the reduction stage)."""
+        if self._affine is not None:
+            A, b = self._affine
+            return np.asarray(X, dtype=np.float64) @ A + b
+        return (np.asarray(X, dtype=np.float64) - self.scaler_mean) / self.scaler_scale
+
+    def predict(self, X_scaled) -> np.ndarray:
+        """Index of the nearest centroid for each scaled row."""
+        X_scaled = np.atleast_2d(np.asarray(X_scaled, dtype=np.float64))
+        # ||x - c||^2 = ||x||^2 - 2 x.c + ||c||^2; ||x||^2 is constant per row
+        scores = X_scaled @ self.centroids.T
+        scores *= -2.0
+        scores += np.einsum('ij,ij->i', self.centroids, self.centroids)
+        return scores.argmin(axis=1)
+
+    @cached_property
+    def feature_index(self) -> Dict[str, int]:
+        """Feature name -> column position."""
+        return {name: j for j, name in enumerate(self.feature_names)}
+
+    def predict_one(self, x_raw: np.ndarray) -> int:
+        """
+        Nearest centroid of one raw (unscaled) feature vector, with scaling and
+        distances fused: argmin_k sum(((x - mean) / scale - c_k)^2).
+        """
+        if self._affine is not None:
+            A, b = self._affine
+            diff = (x_raw @ A + b) - self.centroids
+        else:
+            diff = (x_raw - self.scaler_mean) / self.scaler_scale - self.centroids
+        return int(np.einsum('ij,ij->i', diff, diff).argmin())
+
+    def centroids_raw(self) -> np.ndarray:
+        """Centroids converted back to raw feature units."""
+        centroids = self.centroids if self.reducer is None else self.reducer.inverse_transform(self.centroids)
+        return centroids * self.scaler_scale + self.scaler_mean
+
+
+def from_estimators(model, scaler, feature_names: Sequence[str], run_id: Optional[int] = None) -> RegistryModel:
+    """
+    Wrap a fitted K-Means (and optional StandardScaler) as a RegistryModel,
+    e.g. for legacy pickled models, so inference runs on plain arrays.
+    A reduction stage stored on the model (model.reducer) is carried over.
+    """
+    centroids = np.asarray(model.cluster_centers_, dtype=np.float64)
+    n_features = len(feature_names)
+    reducer = getattr(model, 'reducer', None)
+    return RegistryModel(
+        run_id=run_id,
+        centroids=centroids,
+        scaler_mean=np.asarray(scaler.mean_, dtype=np.float64) if scaler is not None else np.zeros(n_features),
+        scaler_scale=np.asarray(scaler.scale_, dtype=np.float64) if scaler is not None else np.ones(n_features),
+        feature_names=list(feature_names),
+        arrays=reducer.to_arrays() if reducer is not None else {}
+    )
+
+
+def _entry_path(run_id: int) -> Path:
+    return REGISTRY_DIR / f"run_{int(run_id)}.npz"
+
+
+def _atomic_write(path: Path, write_fn) -> None:
+    """Write via a temp file in the same directory, fsync, then os.replace."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with tmp_path.open("wb") as f:
+            write_fn(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
+def save_model(
+    run_id: int,
+    centroids: np.ndarray,
+    scaler_mean: np.ndarray,
+    scaler_scale: np.ndarray,
+    feature_names: Sequence[str],
+    metrics: Optional[Dict] = None,
+    **extra_arrays: np.ndarray
+) -> Path:
+    """
+    Store a model for run_id. Extra keyword arrays are saved alongside the core
+    members (they must be plain numeric/string arrays - pickling is never used).
+    Returns the path of the registry entry.
+    """
+    arrays = {
+        "centroids": np.ascontiguousarray(centroids, dtype=np.float64),
+        "scaler_mean": np.ascontiguousarray(scaler_mean, dtype=np.float64),
+        "scaler_scale": np.ascontiguousarray(scaler_scale, dtype=np.float64),
+        "feature_names": np.asarray(list(feature_names), dtype=str),
+        "metrics_json": np.asarray(json.dumps(metrics or {}, default=str)),
+    }
+    for name, value in extra_arrays.items():
+        if name in _CORE_MEMBERS:
+            raise ValueError(f"'{name}' is a reserved registry member")
+        arrays[name] = np.ascontiguousarray(value)
+
+    path = _entry_path(run_id)
+    # np.savez stores members uncompressed (ZIP_STORED), which is what allows mmap
+    _atomic_write(path, lambda f: np.savez(f, **arrays))
+    return path
+
+
+def _artifact_path(run_id: int, name: str) -> Path:
+    return REGISTRY_DIR / f"run_{int(run_id)}.{name}.npz"
+
+
+def save_artifact(run_id: int, name: str, **arrays: np.ndarray) -> Path:
+    """Store named per-run arrays next to the run's entry (same atomic, pickle-free format)."""
+    members = {key: np.ascontiguousarray(value) for key, value in arrays.items()}
+    path = _artifact_path(run_id, name)
+    _atomic_write(path, lambda f: np.savez(f, **members))
+    return path
+
+
+def has_artifact(run_id: int, name: str) -> bool:
+    return _artifact_path(run_id, name).exists()
+
+
+def load_artifact(run_id: int, name: str, mmap: bool = False) -> Dict[str, np.ndarray]:
+    """
+    Load a named per-run artifact.
+    Raises:
+        FileNotFoundError if the run has no such artifact
+    """
+    path = _artifact_path(run_id, name)
+    if not path.exists():
+        raise FileNotFoundError(f"No '{name}' artifact for run {run_id} ({path})")
+    if mmap:
+        return _mmap_npz(path)
+    with np.load(path, allow_pickle=False) as npz:
+        return {key: npz[key] for key in npz.files}
+
+
+def list_artifact_runs(name: str) -> List[int]:
+    """Run IDs that have the named artifact, oldest first."""
+    if not REGISTRY_DIR.exists():
+        return []
+    run_ids = []
+    for path in REGISTRY_DIR.glob(f"run_*.{name}.npz"):
+        try:
+            run_ids.append(int(path.name[len("run_"):-len(f".{name}.npz")]))
+        except ValueError:
+            continue
+    return sorted(run_ids)
+
+
+def prune_artifacts(name: str, keep_previous: int = 1) -> List[int]:
+    """
+    Delete the named artifact of old runs. Kept: LATEST, the keep_previous runs
+    before it (processes that have not reloaded yet) and runs newer than LATEST
+    (still being written). Does nothing while the registry has no LATEST.
+    Returns the run IDs whose artifact was removed.
+    """
+    latest = latest_run_id()
+    if latest is None:
+        return []
+    older = [run_id for run_id in list_artifact_runs(name) if run_id < latest]
+    removed = older[:max(len(older) - keep_previous, 0)]
+    for run_id in removed:
+        _artifact_path(run_id, name).unlink(missing_ok=True)
+    return removed
+
+
+def mark_latest(run_id: int) -> None:
+    """Point LATEST at run_id (call once the run has finished successfully)."""
+    if not _entry_path(run_id).exists():
+        raise FileNotFoundError(f"No registry entry for run {run_id}")
+    _atomic_write(REGISTRY_DIR / LATEST_POINTER, lambda f: f.write(str(int(run_id)).encode("ascii")))
+
+
+def latest_run_id() -> Optional[int]:
+    """Run ID of the latest successful model, or None if the registry is empty."""
+    pointer = REGISTRY_DIR / LATEST_POINTER
+    try:
+        return int(pointer.read_text(encoding="ascii").strip())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def list_runs() -> List[int]:
+    """All run IDs that have a registry entry, oldest first."""
+    if not REGISTRY_DIR.exists():
+        return []
+    run_ids = []
+    for path in REGISTRY_DIR.glob("run_*.npz"):
+        try:
+            run_ids.append(int(path.stem.split("_", 1)[1]))
+        except ValueError:
+            continue
+    return sorted(run_ids)
+
+
+def has_model(run_id: int) -> bool:
+    return _entry_path(run_id).exists()
+
+
+def _mmap_npz(path: Path) -> Dict[str, np.ndarray]:
+    """
+    Memory-map every member of an uncompressed .npz in place.
+    Works because np.savez stores each .npy member contiguously (ZIP_STORED).
+    """
+    arrays = {}
+    with zipfile.ZipFile(path) as zf, path.open("rb") as f:
+        for info in zf.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{path.name}:{info.filename} is compressed and cannot be memory-mapped")
+            # Local file header: 30 fixed bytes, then file name and extra field
+            f.seek(info.header_offset)
+            local_header = f.read(30)
+            name_len, extra_len = struct.unpack("<HH", local_header[26:30])
+            f.seek(info.header_offset + 30 + name_len + extra_len)
+
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+
+            name = info.filename[:-4] if info.filename.endswith(".npy") else info.filename
+            if int(np.prod(shape)) == 0:
+                arrays[name] = np.empty(shape, dtype=dtype)
+                continue
+            arrays[name] = np.memmap(
+                path, dtype=dtype, mode="r", offset=f.tell(), shape=shape,
+                order="F" if fortran_order else "C"
+            )
+    return arrays
+
+
+def load_model(run_id: Optional[int] = None, mmap: bool = False) -> RegistryModel:
+    """
+    Load the model for run_id, or the latest successful one if run_id is None.
+
+    Args:
+        run_id: Batch run ID
+        mmap: Memory-map arrays instead of reading them (useful for large extras)
+    Raises:
+        FileNotFoundError if the registry has no matching entry
+    """
+    if run_id is None:
+        run_id = latest_run_id()
+        if run_id is None:
+            raise FileNotFoundError(f"Model registry is empty ({REGISTRY_DIR})")
+
+    path = _entry_path(run_id)
+    if not path.exists():
+        raise FileNotFoundError(f"No registry entry for run {run_id} ({path})")
+
+    if mmap:
+        arrays = _mmap_npz(path)
+    else:
+        with np.load(path, allow_pickle=False) as npz:
+            arrays = {name: npz[name] for name in npz.files}
+
+    metrics = json.loads(str(arrays.pop("metrics_json")))
+    return RegistryModel(
+        run_id=int(run_id),
+        centroids=arrays.pop("centroids"),
+        scaler_mean=arrays.pop("scaler_mean"),
+        scaler_scale=arrays.pop("scaler_scale"),
+        feature_names=[str(name) for name in arrays.pop("feature_names")],
+        metrics=metrics,
+        arrays=arrays,
+    )
@@ -0,0 +1,218 @@
+"""
+Multi-View Clustering
+Client type and time pattern clusterings fitted next to the category clustering.
+
+The profile agent describes every customer with three cluster assignments:
+category (spending pattern, the main batch model), client type (engagement)
+and time pattern (when the customer transacts). All three are computed from
+the single data load of the category pipeline: the client type view reuses
+holding/transaction aggregates already in the merged frame, the time view
+uses the time pattern shares of the time feature stage (time_features.py).
+
+The two extra views are small K-Means models fitted on threads while the
+category model is fitted. Cluster ids carry the meaning the interpretation
+guide in ai_profile_agent.py gives them: client clusters by ascending
+engagement (0 = Basic ... 2 = Premium); time clusters are matched one-to-one
+(Hungarian assignment) to the guide's pattern prototypes 0 Night, 1 Early
+Morning, 2 Weekend, 3 Office, 4 Evening, 5 Irregular, and a cluster of
+customers without transaction times always gets 5. Each view model is a
+RegistryModel stored as extra arrays of the run's registry entry, so
+assign-only runs can place changed customers in every view.
+"""
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import linear_sum_assignment
+
+from app.services.clustering_engine import fit_clusters
+from app.services.model_registry import RegistryModel
+from app.services.time_features import TIME_FEATURES, TIME_PATTERNS
+
+# View name -> number of clusters (the category view is the main batch model)
+VIEW_CLUSTERS = {'client': 3, 'time': 6}
+VIEWS = ('category',) + tuple(VIEW_CLUSTERS)
+
+CLIENT_FEATURES = [
+    'product_count', 'total_balance', 'avg_balance',
+    'transaction_count', 'total_spent', 'annual_income'
+]
+
+# Time guide id of "Irregular Pattern" (ids 0-4 are TIME_PATTERNS in order)
+IRREGULAR_TIME_CLUSTER = len(TIME_PATTERNS)
+
+# A time cluster with less than this share of timed transactions has no time pattern
+NO_TIME_MAX_KNOWN_SHARE = 0.1
+
+# Weekend share of transactions spread evenly over the week
+EVEN_WEEKEND_SHARE = 2 / 7
+
+
+def time_prototypes() -> np.ndarray:
+    """
+    (6, len(TIME_FEATURES)) share profile of every time guide id: one hour bucket
+    (or the weekend) holding all transactions for ids 0-4, everything spread
+    evenly for Irregular Pattern. All prototypes have known times.
+    """
+    hour_patterns = [name for name in TIME_PATTERNS if name != 'weekend']
+    prototypes = pd.DataFrame(0.0, index=range(IRREGULAR_TIME_CLUSTER + 1), columns=TIME_FEATURES)
+    prototypes[[f'time_share_{name}' for name in hour_patterns]] = 1.0 / len(hour_patterns)
+    prototypes['time_share_weekend'] = EVEN_WEEKEND_SHARE
+    prototypes['time_known_share'] = 1.0
+    for guide_id, name in enumerate(TIME_PATTERNS):
+        if name == 'weekend':
+            prototypes.loc[guide_id, 'time_share_weekend'] = 1.0
+        else:
+            prototypes.loc[guide_id, [f'time_share_{other}' for other in hour_patterns]] = 0.0
+            prototypes.loc[guide_id, f'time_share_{name}'] = 1.0
+    return prototypes.values
+
+
+def _time_guide_ids(centroids_raw: pd.DataFrame) -> np.ndarray:
+    """Guide id of every time cluster: one-to-one nearest prototype (Hungarian assignment)."""
+    prototypes = time_prototypes()
+    centroids = centroids_raw[TIME_FEATURES].values
+    cost = ((centroids[:, None, :] - prototypes[None, :, :]) ** 2).sum(axis=2)
+    # Customers without transaction times can only be Irregular Pattern
+    no_time = centroids_raw['time_known_share'].values < NO_TIME_MAX_KNOWN_SHARE
+    if no_time.any():
+        forced = np.flatnonzero(no_time)[np.argmin(centroids_raw['time_known_share'].values[no_time])]
+        cost[forced, :] = cost.max() + 1.0
+        cost[forced, IRREGULAR_TIME_CLUSTER] = 0.0
+    rows, guide_ids = linear_sum_assignment(cost)
+    return guide_ids[np.argsort(rows)]
+
+
+def _view_order(view: str, centroids_scaled: np.ndarray, centroids_raw: pd.DataFrame) -> np.ndarray:
+    """Old cluster index for each new id, so ids follow the interpretation guide."""
+    if view == 'client':
+        # Ascending engagement: mean standardized level across products, balances and activity
+        return np.argsort(centroids_scaled.mean(axis=1), kind='stable')
+
+    # With all six clusters the new id is the guide id itself
+    return np.argsort(_time_guide_ids(centroids_raw), kind='stable')
+
+
+def fit_view(view: str, frame: pd.DataFrame, backend: str = 'auto', random_state: int = 42) -> Tuple[RegistryModel, np.ndarray, Dict]:
+    """
+    Fit one extra view on its columns of the merged customer frame.
+    Returns: (model, labels aligned with frame rows, metrics)
+    """
+    features = CLIENT_FEATURES if view == 'client' else TIME_FEATURES
+    X = frame.reindex(columns=features, fill_value=0).to_numpy(dtype=np.float64)
+    X = np.nan_to_num(X, nan=0.0, posinf=0.0, neginf=0.0)
+
+    mean = X.mean(axis=0)
+    scale = X.std(axis=0)
+    scale[scale == 0] = 1.0
+    n_clusters = max(1, min(VIEW_CLUSTERS[view], len(X)))
+    model, labels, metrics = fit_clusters((X - mean) / scale, n_clusters, backend=backend, random_state=random_state)
+
+    centers = model.cluster_centers_
+    order = _view_order(view, centers, pd.DataFrame(centers * scale + mean, columns=features))
+    new_id = np.empty_like(order)
+    new_id[order] = np.arange(len(order))
+    view_model = RegistryModel(
+        run_id=None,
+        centroids=model.cluster_centers_[order],
+        scaler_mean=mean,
+        scaler_scale=scale,
+        feature_names=list(features),
+        metrics={'view': view, **metrics}
+    )
+    return view_model, new_id[labels], metrics
+
+
+def start_view_fits(frame: pd.DataFrame, backend: str = 'auto') -> Dict[str, Future]:
+    """
+    Fit every extra view on its own thread and return immediately, so the fits
+    run while the caller fits the category model. Collect with future.result().
+    """
+    pool = ThreadPoolExecutor(max_workers=len(VIEW_CLUSTERS), thread_name_prefix='view-fit')
+    futures = {view: pool.submit(fit_view, view, frame, backend) for view in VIEW_CLUSTERS}
+    # Submitted fits still run to completion; the threads exit afterwards
+    pool.shutdown(wait=False)
+    return futures
+
+
+def view_arrays(view_models: Dict[str, RegistryModel]) -> Dict[str, np.ndarray]:
+    """Registry extra arrays for the view models (see load_view_models)."""
+    arrays = {}
+    for view, model in view_models.items():
+        arrays[f'view_{view}_centroids'] = model.centroids
+        arrays[f'view_{view}_mean'] = model.scaler_mean
+        arrays[f'view_{view}_scale'] = model.scaler_scale
+        arrays[f'view_{view}_features'] = np.asarray(model.feature_names, dtype=str)
+    return arrays
+
+
+def load_view_models(model: RegistryModel) -> Dict[str, RegistryModel]:
+    """View models stored with a registry entry (empty for runs without views)."""
+    views = {}
+    for view in VIEW_CLUSTERS:
+        if f'view_{view}_centroids' not in model.arrays:
+            continue
+        views[view] = RegistryModel(
+            run_id=model.run_id,
+            centroids=np.asarray(model.arrays[f'view_{view}_centroids']),
+            scaler_mean=np.asarray(model.arrays[f'view_{view}_mean']),
+            scaler_scale=np.asarray(model.arrays[f'view_{view}_scale']),
+            feature_names=[str(name) for name in model.arrays[f'view_{view}_features']],
+        )
+    return views
+
+
+def predict_views(view_models: Dict[str, RegistryModel], frame: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """Assign every row of the merged customer frame in each view."""
+    labels = {}
+    for view, model in view_models.items():
+        X = frame.reindex(columns=model.feature_names, fill_value=0).to_numpy(dtype=np.float64)
+        X = np.nan_to_num(X, nan=0.0, posinf=0.0, neginf=0.0)
+        labels[view] = model.predict(model.transform(X))
+    return labels
+
+
+def save_view_assignments(
+    conn,
+    run_id: int,
+    customer_ids: List[str],
+    view_labels: Dict[str, np.ndarray]
+) -> int:
+    """Bulk insert (run_id, customer_id, view, cluster_id) rows; returns the row count."""
+    rows = []
+    for view, labels in view_labels.items():
+        rows.extend(zip([run_id] * len(customer_ids), customer_ids, [view] * len(customer_ids),
+                        np.asarray(labels, dtype=np.int64).tolist()))
+    conn.executemany(
+        """
+        INSERT OR REPLACE INTO customer_cluster_views (run_id, customer_id, view, cluster_id)
+        VALUES (?, ?, ?, ?)
+        """,
+        rows
+    )
+    return len(rows)
+
+
+def get_customer_views(conn, customer_id: str, run_id: Optional[int] = None) -> Tuple[Optional[int], Dict[str, Optional[int]]]:
+    """
+    Cluster of a customer in every view for run_id (default: the latest run that has views).
+    Returns: (run_id or None, {'category_cluster': .., 'client_cluster': .., 'time_cluster': ..})
+    """
+    if run_id is None:
+        row = conn.execute(
+            "SELECT MAX(run_id) AS run_id FROM customer_cluster_views WHERE customer_id = ?",
+            (customer_id,)
+        ).fetchone()
+        run_id = row['run_id'] if row else None
+
+    clusters: Dict[str, Optional[int]] = {f'{view}_cluster': None for view in VIEWS}
+    if run_id is None:
+        return None, clusters
+    for row in conn.execute(
+        "SELECT view, cluster_id FROM customer_cluster_views WHERE run_id = ? AND customer_id = ?",
+        (run_id, customer_id)
+    ):
+        clusters[f"{row['view']}_cluster"] = int(row['cluster_id'])
+    return run_id, clusters
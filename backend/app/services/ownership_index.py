@@ -0,0 +1,146 @@
+"""
+Ownership Index
+Compact customers x products bitset of product holdings.
+
+Built with a single holdings query and cached per dataset version, so
+"exclude owned products" becomes a vectorized mask operation for batch runs
+and an O(1) row lookup online, instead of one holdings query per customer.
+"""
+
+import threading
+import time
+from typing import Dict, Optional, Sequence, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.db import get_conn
+
+
+class OwnershipIndex:
+    """
+    Bit-packed ownership matrix: one row per customer with holdings,
+    one bit per product code seen in holdings.
+    """
+
+    def __init__(self, customer_ids: Sequence[str], product_codes: Sequence[str],
+                 bits: np.ndarray, version: Tuple[int, int]):
+        self.customer_ids = list(customer_ids)
+        self.product_codes = list(product_codes)
+        self.bits = bits  # uint8, shape (n_customers, ceil(n_products / 8))
+        self.version = version
+        self._customer_pos: Dict[str, int] = {c: i for i, c in enumerate(self.customer_ids)}
+        self._product_pos: Dict[str, int] = {p: j for j, p in enumerate(self.product_codes)}
+        self._customer_index = pd.Index(self.customer_ids)
+        self._product_index = pd.Index(self.product_codes)
+
+    @classmethod
+    def build(cls, conn, version: Optional[Tuple[int, int]] = None) -> "OwnershipIndex":
+        """Build the index from the holdings table (one query)."""
+        if version is None:
+            version = holdings_version(conn)
+        holdings = pd.read_sql_query(
+            "SELECT DISTINCT customer_id, product_code FROM holdings WHERE product_code IS NOT NULL",
+            conn
+        )
+        rows, customer_ids = pd.factorize(holdings['customer_id'])
+        cols, product_codes = pd.factorize(holdings['product_code'])
+
+        bits = np.zeros((len(customer_ids), (len(product_codes) + 7) // 8), dtype=np.uint8)
+        # Same bit order as np.packbits/np.unpackbits (big-endian within a byte)
+        np.bitwise_or.at(bits, (rows, cols >> 3), (0x80 >> (cols & 7)).astype(np.uint8))
+        return cls(customer_ids.tolist(), product_codes.tolist(), bits, version)
+
+    @property
+    def n_customers(self) -> int:
+        return len(self.customer_ids)
+
+    @property
+    def n_products(self) -> int:
+        return len(self.product_codes)
+
+    def owned_products(self, customer_id: str) -> Set[str]:
+        """Products a customer owns (O(1) row lookup)."""
+        row = self._customer_pos.get(customer_id)
+        if row is None:
+            return set()
+        flags = np.unpackbits(self.bits[row], count=self.n_products)
+        return {self.product_codes[j] for j in np.flatnonzero(flags)}
+
+    def owns(self, customer_id: str, product_code: str) -> bool:
+        """Whether a customer owns a product (O(1))."""
+        row = self._customer_pos.get(customer_id)
+        col = self._product_pos.get(product_code)
+        if row is None or col is None:
+            return False
+        return bool(self.bits[row, col >> 3] & (0x80 >> (col & 7)))
+
+    def mask(self, customer_ids: Sequence[str], product_codes: Optional[Sequence[str]] = None) -> np.ndarray:
+        """
+        Boolean ownership matrix (len(customer_ids) x len(product_codes)).
+        Customers or products not in the index are all False.
+        """
+        if product_codes is None:
+            product_codes = self.product_codes
+        rows = self._customer_index.get_indexer(list(customer_ids))
+        cols = self._product_index.get_indexer(list(product_codes))
+
+        result = np.zeros((len(rows), len(cols)), dtype=bool)
+        known_rows = rows >= 0
+        known_cols = cols >= 0
+        if not known_rows.any() or not known_cols.any():
+            return result
+        unpacked = np.unpackbits(self.bits[rows[known_rows]], axis=1, count=self.n_products).astype(bool)
+        result[np.ix_(known_rows, known_cols)] = unpacked[:, cols[known_cols]]
+        return result
+
+    def owns_pairs(self, customer_ids: Sequence[str], product_codes: Sequence[str]) -> np.ndarray:
+        """Vectorized owns() over aligned (customer, product) pairs."""
+        rows = self._customer_index.get_indexer(list(customer_ids))
+        cols = self._product_index.get_indexer(list(product_codes))
+        known = (rows >= 0) & (cols >= 0)
+        result = np.zeros(len(rows), dtype=bool)
+        result[known] = (self.bits[rows[known], cols[known] >> 3] & (0x80 >> (cols[known] & 7))) > 0
+        return result
+
+
+def holdings_version(conn) -> Tuple[int, int]:
+    """Dataset version of holdings: (row count, max id). Changes on any upload or delete."""
+    row = conn.execute("SELECT COUNT(*), COALESCE(MAX(id), 0) FROM holdings").fetchone()
+    return int(row[0]), int(row[1])
+
+
+# Online lookups re-check the holdings version at most this often (seconds)
+VERSION_CHECK_INTERVAL = 5.0
+
+_index: Optional[OwnershipIndex] = None
+_index_checked_at = 0.0
+_index_lock = threading.Lock()
+
+
+def get_ownership_index(conn=None, max_staleness: float = VERSION_CHECK_INTERVAL) -> OwnershipIndex:
+    """
+    Process-wide ownership index, rebuilt only when the holdings version changes.
+
+    Args:
+        conn: Optional open connection
+        max_staleness: Skip the version check if it ran less than this many seconds
+                       ago (batch runs pass 0 to always see the current holdings)
+    """
+    global _index, _index_checked_at
+    with _index_lock:
+        if _index is not None and time.monotonic() - _index_checked_at < max_staleness:
+            return _index
+
+    own_conn = conn is None
+    conn = conn or get_conn()
+    try:
+        version = holdings_version(conn)
+        with _index_lock:
+            if _index is None or _index.version != version:
+                _index = OwnershipIndex.build(conn, version)
+            _index_checked_at = time.monotonic()
+            return _index
+    finally:
+        if own_conn:
+            conn.close()
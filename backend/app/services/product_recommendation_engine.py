@@ -7,9 +7,83 @@ Combines market research, customer profiling, and multi-agent analysis
 import anthropic
 import os
 import json
-from typing import Dict, List, Any, Optional
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Any, Optional, Sequence
 from datetime import datetime
 from app.db import get_conn
+from app.services.ownership_index import get_ownership_index
+from app.core.product_catalog import PRODUCTS, CATALOG
+from app.services.text_classifier import PROFESSION_CLASSIFIER, SEGMENT_CLASSIFIER
+
+
+# Product target segments that mark a business-focused product
+BUSINESS_SEGMENTS = ['entrepreneurs', 'small_business', 'professionals', 'business']
+
+# Representative age of each age group label
+AGE_GROUP_AGES = [('Under 30', 25), ('30-45', 37), ('45-60', 52), ('60+', 65)]
+
+
+def detect_business_owners(
+    activities: Sequence[Optional[str]],
+    segments: Sequence[Optional[str]],
+    professions: Optional[Sequence[Optional[str]]] = None
+) -> np.ndarray:
+    """Business owner flag per customer from activity, economic segment and profession."""
+    is_owner = PROFESSION_CLASSIFIER.classify_many(activities)['business_owner']
+    is_owner |= SEGMENT_CLASSIFIER.classify_many(segments)['business_owner']
+    if professions is not None:
+        is_owner |= PROFESSION_CLASSIFIER.classify_many(professions)['business_owner']
+    return is_owner
+
+
+def ages_from_groups(age_groups: Sequence[Optional[str]]) -> np.ndarray:
+    """Representative age per age group label (NaN when missing or unrecognized)."""
+    groups = pd.Series(age_groups, dtype=object).fillna('').astype(str)
+    ages = np.full(len(groups), np.nan)
+    unmatched = np.ones(len(groups), dtype=bool)
+    for label, age in AGE_GROUP_AGES:
+        hit = unmatched & groups.str.contains(label, regex=False).to_numpy()
+        ages[hit] = age
+        unmatched &= ~hit
+    return ages
+
+
+def screen_profiles(
+    customer_profiles: Sequence[Dict[str, Any]],
+    product_codes: Optional[Sequence[str]] = None
+) -> Dict[str, Any]:
+    """
+    Evaluate eligibility of many customer profiles against the catalog in one pass.
+    Needs no API key, so a whole run can be pre-screened before anything reaches the LLM.
+    
+    Args:
+        customer_profiles: Profiles in the generate_recommendations format
+        product_codes: Column order (default: whole catalog)
+    Returns:
+        Dict with 'product_codes', 'eligible' (n_profiles x n_products bool),
+        'is_business_owner', 'age' and 'annual_income' (n_profiles arrays)
+    """
+    if product_codes is None:
+        product_codes = CATALOG.product_codes
+    product_codes = list(product_codes)
+    
+    segments = [p.get('economic_segment', {}) or {} for p in customer_profiles]
+    activities = [p.get('activity', {}) or {} for p in customer_profiles]
+    age = ages_from_groups([(p.get('demographics', {}) or {}).get('age_group') for p in customer_profiles])
+    annual_income = np.array([s.get('annual_income', 0) or 0 for s in segments], dtype=np.float64)
+    
+    return {
+        'product_codes': product_codes,
+        'eligible': CATALOG.eligibility_mask(age, annual_income, product_codes),
+        'is_business_owner': detect_business_owners(
+            [a.get('activity_description') for a in activities],
+            [s.get('segment') for s in segments],
+            [a.get('profession') for a in activities]
+        ),
+        'age': age,
+        'annual_income': annual_income
+    }
 
 
 class ProductRecommendationEngine:
@@ -28,385 +102,8 @@ class ProductRecommendationEngine:
         self.client = anthropic.Anthropic(api_key=self.api_key)
         self.model = "claude-sonnet-4-20250514"
         
-        # Italian banking product catalog - aligned with existing system
-        self.product_catalog = self._init_product_catalog()
-    
-    def _init_product_catalog(self) -> Dict:
-        """Initialize comprehensive Italian banking product catalog"""
-        return {
-            'ASSA566': {
-                'name': 'Assicurazione Sanitaria SalusCare',
-                'category': 'Insurance',
-                'type': 'health_insurance',
-                'description': 'Comprehensive health coverage with access to network of affiliated facilities',
-                'key_benefits': [
-                    'Medical expenses coverage up to €50,000/year',
-                    'Specialist visits without waiting lists',
-                    '24/7 assistance in Italy and abroad'
-                ],
-                'target_segments': ['affluent', 'mass_market', 'family_oriented'],
-                'min_age': 18,
-                'max_age': 75,
-                'base_cost': 65
-            },
-            'CACR432': {
-                'name': 'Carta di Credito AureaCard Exclusive',
-                'category': 'Credit',
-                'type': 'premium_credit_card',
-                'description': 'Premium credit card with rewards program and exclusive services',
-                'key_benefits': [
-                    'Cashback up to 3% on online purchases',
-                    'Travel insurance and car rental included',
-                    'Free access to airport lounges'
-                ],
-                'target_segments': ['affluent', 'frequent_travelers', 'high_spenders'],
-                'min_income': 25000,
-                'base_cost': 0
-            },
-            'CACR748': {
-                'name': 'Carta di Credito AureaCard Infinity',
-                'category': 'Credit',
-                'type': 'ultra_premium_credit_card',
-                'description': 'Ultra premium credit card with concierge service and exclusive benefits',
-                'key_benefits': [
-                    'Personalized 24/7 concierge service',
-                    '5% cashback on all categories',
-                    'Unlimited Priority Pass + guests'
-                ],
-                'target_segments': ['affluent', 'premium_clients'],
-                'min_income': 50000,
-                'base_cost': 150
-            },
-            'CADB439': {
-                'name': 'Carta di Debito ZynaFlow Plus',
-                'category': 'Credit',
-                'type': 'premium_debit_card',
-                'description': 'Contactless debit card with cashback and smart expense management',
-                'key_benefits': [
-                    '1% cashback on all purchases',
-                    'Real-time notifications for every transaction',
-                    'Automatic spending categories for budgeting'
-                ],
-                'target_segments': ['young_professionals', 'digital_natives', 'mass_market'],
-                'base_cost': 0
-            },
-            'CADB783': {
-                'name': 'Carta di Debito EasyYoung Pay',
-                'category': 'Credit',
-                'type': 'youth_debit_card',
-                'description': 'Card dedicated to young people with advanced mobile app and gamification',
-                'key_benefits': [
-                    'Mobile app with gamified budget management',
-                    'Free withdrawals throughout Europe',
-                    'Exclusive discounts on youth brands'
-                ],
-                'target_segments': ['students', 'young_adults'],
-                'min_age': 18,
-                'max_age': 30,
-                'base_cost': 0
-            },
-            'CAPR574': {
-                'name': 'Carta Prepagata FlexPay One',
-                'category': 'Credit',
-                'type': 'prepaid_card',
-                'description': 'Rechargeable prepaid card for expense control and secure online shopping',
-                'key_benefits': [
-                    'Total expense control with preset limit',
-                    'Ideal for secure online shopping',
-                    'Instant recharge from mobile app'
-                ],
-                'target_segments': ['budget_conscious', 'online_shoppers', 'students'],
-                'base_cost': 5
-            },
-            'CCOR602': {
-                'name': 'Conto Corrente MyEnergy',
-                'category': 'Accounts',
-                'type': 'checking_account',
-                'description': 'Zero-fee checking account with advanced digital services',
-                'key_benefits': [
-                    'Zero management fees with salary deposit',
-                    'Unlimited free instant transfers',
-                    'Award-winning mobile app with AI assistant'
-                ],
-                'target_segments': ['employees', 'mass_market', 'digital_natives'],
-                'base_cost': 0
-            },
-            'CINV819': {
-                'name': 'Conto Investimento SharesVault',
-                'category': 'Investments',
-                'type': 'investment_account',
-                'description': 'Investment platform with robo-advisor and personalized portfolio',
-                'key_benefits': [
-                    'Robo-advisor with automatic rebalancing',
-                    'ETFs and index funds with reduced fees',
-                    'Financial advisory included in subscription'
-                ],
-                'target_segments': ['affluent', 'investors', 'wealth_builders'],
-                'min_investment': 5000,
-                'base_cost': 20
-            },
-            'CRDT356': {
-                'name': 'Linea di Credito FlexiCredit',
-                'category': 'Credit',
-                'type': 'credit_line',
-                'description': 'Revolving credit line for unexpected expenses and opportunities',
-                'key_benefits': [
-                    'Flexible usage up to €15,000',
-                    'Interest only on amount used',
-                    'Fast approval within 24 hours'
-                ],
-                'target_segments': ['mass_market', 'entrepreneurs', 'families'],
-                'min_income': 15000,
-                'base_cost': 0
-            },
-            'DPAM682': {
-                'name': 'Deposito Gestito WealthPlus',
-                'category': 'Savings',
-                'type': 'managed_deposit',
-                'description': 'Term deposit with active management to maximize returns',
-                'key_benefits': [
-                    'Guaranteed minimum return 2.5% annually',
-                    'Active management by certified experts',
-                    'Partial liquidity without penalties'
-                ],
-                'target_segments': ['affluent', 'conservative_investors', 'retirees'],
-                'min_deposit': 10000,
-                'base_cost': 0
-            },
-            'DPAM997': {
-                'name': 'Deposito Premium SafeHarbor',
-                'category': 'Savings',
-                'type': 'premium_deposit',
-                'description': 'Premium deposit with competitive rate and wealth management services',
-                'key_benefits': [
-                    'Fixed rate 3.2% for 12 months',
-                    'Dedicated wealth management advisory',
-                    'Protection up to €250,000 (FITD)'
-                ],
-                'target_segments': ['affluent', 'high_net_worth'],
-                'min_deposit': 50000,
-                'base_cost': 0
-            },
-            'DPRI866': {
-                'name': 'Deposito Smart SaveSmart',
-                'category': 'Savings',
-                'type': 'smart_deposit',
-                'description': 'Smart deposit with variable rate linked to savings goals',
-                'key_benefits': [
-                    'Progressive rate: more you save, more you earn',
-                    'Goal-based saving with milestone rewards',
-                    'No duration commitment'
-                ],
-                'target_segments': ['young_professionals', 'savers', 'goal_oriented'],
-                'min_deposit': 1000,
-                'base_cost': 0
-            },
-            'FPEN541': {
-                'name': 'Fondo Pensione FutureSecure',
-                'category': 'Investments',
-                'type': 'pension_fund',
-                'description': 'Supplementary pension plan with tax benefits and flexibility',
-                'key_benefits': [
-                    'Tax deductibility up to €5,164/year',
-                    'Sustainable ESG portfolio',
-                    'Historical average return 4.5%'
-                ],
-                'target_segments': ['employees', 'self_employed', 'long_term_planners'],
-                'min_contribution': 1200,
-                'base_cost': 25
-            },
-            'MTUU356': {
-                'name': 'Mutuo Casa DreamHome',
-                'category': 'Loans',
-                'type': 'mortgage',
-                'description': 'First home mortgage with subsidized rate and personalized consulting',
-                'key_benefits': [
-                    'Fixed APR from 2.95% (first home)',
-                    'Up to 80% of property value',
-                    'Free processing and appraisal included'
-                ],
-                'target_segments': ['first_home_buyers', 'families', 'young_couples'],
-                'max_ltv': 80,
-                'base_cost': 0
-            },
-            'PARK443': {
-                'name': 'Servizio Parcheggio SmartPark',
-                'category': 'Services',
-                'type': 'parking_service',
-                'description': 'Affiliated parking subscription with automatic payment',
-                'key_benefits': [
-                    'Access to 500+ parking lots in Italy',
-                    'Contactless automatic payment',
-                    '20% discount on hourly rates'
-                ],
-                'target_segments': ['commuters', 'urban_dwellers', 'car_owners'],
-                'base_cost': 15
-            },
-            'PLZZ334': {
-                'name': 'Prestito Personale QuickCash',
-                'category': 'Loans',
-                'type': 'personal_loan',
-                'description': 'Personal loan with fast approval and flexible installments',
-                'key_benefits': [
-                    'Approval within 2 business hours',
-                    'APR from 4.95%, plans from 12 to 84 months',
-                    'No penalty for early repayment'
-                ],
-                'target_segments': ['mass_market', 'project_financers'],
-                'min_income': 12000,
-                'max_amount': 50000,
-                'base_cost': 0
-            },
-            'PRPE078': {
-                'name': 'Pacchetto Premium LifeStyle',
-                'category': 'Packages',
-                'type': 'premium_package',
-                'description': 'Complete package with all integrated premium banking services',
-                'key_benefits': [
-                    'All premium products at discounted price',
-                    'Dedicated personal banker',
-                    'Exclusive events and networking'
-                ],
-                'target_segments': ['affluent', 'premium_clients'],
-                'min_relationship_value': 100000,
-                'base_cost': 50
-            },
-            'PRPE771': {
-                'name': 'Pacchetto Premium Business+',
-                'category': 'Packages',
-                'type': 'business_package',
-                'description': 'Integrated solution for professionals and small businesses',
-                'key_benefits': [
-                    'Business account + corporate credit card',
-                    'Free POS terminal with reduced fees',
-                    'Integrated management software'
-                ],
-                'target_segments': ['entrepreneurs', 'small_business', 'professionals'],
-                'base_cost': 35
-            },
-            'SINV263': {
-                'name': 'Servizio Investimento PlannerPro',
-                'category': 'Investments',
-                'type': 'investment_service',
-                'description': 'Personalized financial advisory with wealth planning',
-                'key_benefits': [
-                    'Dedicated certified financial advisor',
-                    'Annual personalized financial plan',
-                    'Quarterly monitoring and rebalancing'
-                ],
-                'target_segments': ['affluent', 'wealth_builders', 'investors'],
-                'min_portfolio': 25000,
-                'base_cost': 100
-            },
-            # Map existing generic codes to specific products
-            'BASIC_CHECKING': {
-                'name': 'Daily Flow Account',
-                'category': 'Accounts',
-                'type': 'checking_account',
-                'description': 'Enhanced checking account with simplified financial management',
-                'key_benefits': [
-                    'Low monthly fees',
-                    'Easy online banking',
-                    'Free ATM withdrawals'
-                ],
-                'target_segments': ['mass_market', 'basic_users'],
-                'base_cost': 0
-            },
-            'PREMIUM_INVESTMENT': {
-                'name': 'Premium Investment Portfolio',
-                'category': 'Investments',
-                'type': 'investment_portfolio',
-                'description': 'Premium investment portfolio with diversified assets',
-                'key_benefits': [
-                    'Diversified portfolio management',
-                    'Professional financial advisory',
-                    'Tax-optimized strategies'
-                ],
-                'target_segments': ['affluent', 'high_net_worth'],
-                'min_investment': 50000,
-                'base_cost': 100
-            },
-            'WEALTH_MANAGEMENT': {
-                'name': 'Wealth Management Service',
-                'category': 'Investments',
-                'type': 'wealth_management',
-                'description': 'Comprehensive wealth management with dedicated advisor',
-                'key_benefits': [
-                    'Personal wealth advisor',
-                    'Customized investment strategy',
-                    'Estate planning services'
-                ],
-                'target_segments': ['affluent', 'high_net_worth'],
-                'min_portfolio': 100000,
-                'base_cost': 200
-            },
-            'REWARDS_CREDIT': {
-                'name': 'Rewards Credit Card',
-                'category': 'Credit',
-                'type': 'rewards_credit_card',
-                'description': 'Credit card with cashback and rewards program',
-                'key_benefits': [
-                    'Cashback on purchases',
-                    'Travel rewards',
-                    'Purchase protection'
-                ],
-                'target_segments': ['mass_market', 'frequent_spenders'],
-                'base_cost': 0
-            },
-            'PERSONAL_LOAN': {
-                'name': 'Personal Loan',
-                'category': 'Loans',
-                'type': 'personal_loan',
-                'description': 'Flexible personal loan for various needs',
-                'key_benefits': [
-                    'Competitive interest rates',
-                    'Flexible repayment terms',
-                    'Fast approval process'
-                ],
-                'target_segments': ['mass_market', 'families'],
-                'min_income': 15000,
-                'base_cost': 0
-            },
-            'SAVINGS_PLAN': {
-                'name': 'Savings Plan',
-                'category': 'Savings',
-                'type': 'savings_plan',
-                'description': 'Structured savings plan with goal tracking',
-                'key_benefits': [
-                    'Automated savings',
-                    'Goal-based planning',
-                    'Competitive interest rates'
-                ],
-                'target_segments': ['young_professionals', 'savers'],
-                'base_cost': 0
-            },
-            'BUSINESS_ACCOUNT': {
-                'name': 'Business Account',
-                'category': 'Accounts',
-                'type': 'business_account',
-                'description': 'Business banking account with professional services',
-                'key_benefits': [
-                    'Business transaction management',
-                    'Multi-user access',
-                    'Integrated accounting tools'
-                ],
-                'target_segments': ['entrepreneurs', 'small_business'],
-                'base_cost': 25
-            },
-            'MORTGAGE': {
-                'name': 'Mortgage Loan',
-                'category': 'Loans',
-                'type': 'mortgage',
-                'description': 'Home mortgage with competitive rates',
-                'key_benefits': [
-                    'Competitive interest rates',
-                    'Flexible terms',
-                    'Expert guidance'
-                ],
-                'target_segments': ['families', 'home_buyers'],
-                'base_cost': 0
-            }
-        }
+        # Italian banking product catalog - shared with the rest of the system
+        self.product_catalog = PRODUCTS
     
     def validate_customer_profile(self, profile: Dict[str, Any]) -> tuple:
         """
@@ -455,93 +152,53 @@ class ProductRecommendationEngine:
         Ensures only appropriate products are recommended.
         Prioritizes business products for business owners.
         """
-        eligible = {}
-        demographics = customer_profile.get('demographics', {})
-        financial = customer_profile.get('financial_metrics', {})
-        segment = customer_profile.get('economic_segment', {}).get('segment', '').lower()
-        annual_income = customer_profile.get('economic_segment', {}).get('annual_income', 0) or 0
-        activity = customer_profile.get('activity', {}).get('activity_description', 'Unknown')
-        
-        # Detect business owner
-        is_business_owner = False
-        business_indicators = [
-            'manufacturing', 'repair', 'owner', 'entrepreneur', 'business', 
-            'self-employed', 'professional', 'consultant', 'freelance', 
-            'artisan', 'craftsman', 'trader', 'merchant', 'retailer',
-            'industrial', 'commercial', 'corporate', 'firm', 'company',
-            'SB', 'small_business', 'small business'
-        ]
-        
-        activity_lower = str(activity).lower()
-        if any(indicator in activity_lower for indicator in business_indicators):
-            is_business_owner = True
-        if 'sb' in segment.lower() or 'small_business' in segment.lower():
-            is_business_owner = True
-        
-        # Calculate age from age_group if available
-        age = None
-        age_group = demographics.get('age_group', '')
-        if age_group:
-            if 'Under 30' in age_group:
-                age = 25
-            elif '30-45' in age_group:
-                age = 37
-            elif '45-60' in age_group:
-                age = 52
-            elif '60+' in age_group:
-                age = 65
-        
-        for code, product in available_products.items():
-            is_eligible = True
-            reasons = []
-            
-            # Age restrictions
-            if 'min_age' in product and age is not None:
-                if age < product['min_age']:
-                    is_eligible = False
-                    reasons.append(f"Customer age {age} below minimum {product['min_age']}")
-            
-            if 'max_age' in product and age is not None:
-                if age > product['max_age']:
-                    is_eligible = False
-                    reasons.append(f"Customer age {age} above maximum {product['max_age']}")
-            
-            # Income restrictions
-            if 'min_income' in product:
-                if annual_income < product['min_income']:
-                    is_eligible = False
-                    reasons.append(f"Income {annual_income} below minimum {product['min_income']}")
-            
-            # Segment restrictions
-            if 'target_segments' in product:
-                target_segments = [s.lower() for s in product['target_segments']]
-                segment_match = False
-                if segment:
-                    segment_match = any(target in segment or segment in target for target in target_segments)
-                
-                # BUSINESS LOGIC: Boost business products for business owners
-                if is_business_owner:
-                    business_segments = ['entrepreneurs', 'small_business', 'professionals', 'business']
-                    product_is_business = any(bs in target_segments for bs in business_segments)
-                    product_is_consumer = any(seg in ['employees', 'mass_market', 'digital_natives'] for seg in target_segments)
-                    
-                    # If product is business-focused, always include for business owners
-                    if product_is_business:
-                        segment_match = True  # Force inclusion
-                    # If product is consumer-focused and we have business alternatives, lower priority (but don't exclude)
-                    elif product_is_consumer and not segment_match:
-                        # Still include but will be deprioritized in AI reasoning
-                        pass
-                
-                # If no segment match and product has strict targeting, exclude
-                if not segment_match and len(target_segments) < 5:  # Allow if broadly targeted
-                    # Don't exclude, but note it
-                    pass
-            
-            if is_eligible:
-                eligible[code] = product
+        return self.filter_eligible_products_batch(
+            [customer_profile], available_products=available_products, exclude_owned=False
+        )[0]
+    
+    def filter_eligible_products_batch(
+        self,
+        customer_profiles: Sequence[Dict[str, Any]],
+        available_products: Optional[Dict] = None,
+        exclude_owned: bool = True
+    ) -> List[Dict]:
+        """
+        Filter products for many customer profiles at once (see screen_profiles).
+        Business products are listed first for business owners.
         
-        return eligible
+        Args:
+            customer_profiles: Profiles in the generate_recommendations format
+            available_products: Candidate products (default: whole catalog)
+            exclude_owned: Also drop products each customer owns (profile's owned_products,
+                           else the ownership index)
+        Returns:
+            Eligible products (code -> details) per profile, aligned with customer_profiles
+        """
+        if available_products is None:
+            available_products = self.product_catalog
+        codes = list(available_products)
+        screen = screen_profiles(customer_profiles, codes)
+        eligible = screen['eligible']
+        
+        if exclude_owned:
+            owned = get_ownership_index().mask([p.get('customer_id') for p in customer_profiles], codes)
+            code_pos = {code: j for j, code in enumerate(codes)}
+            for i, profile in enumerate(customer_profiles):
+                listed = profile.get('products', {}).get('owned_products')
+                if isinstance(listed, list):
+                    owned[i] = False
+                    owned[i, [code_pos[c] for c in listed if c in code_pos]] = True
+            eligible &= ~owned
+        
+        # Column order for business owners: business-focused products first
+        is_business_product = CATALOG.targets_any(BUSINESS_SEGMENTS, codes)
+        business_first = np.argsort(~is_business_product, kind='stable')
+        
+        results = []
+        for row, is_owner in zip(eligible, screen['is_business_owner']):
+            order = business_first if is_owner else range(len(codes))
+            results.append({codes[j]: available_products[codes[j]] for j in order if row[j]})
+        return results
     
     def generate_recommendations(
         self,
@@ -569,10 +226,16 @@ class ProductRecommendationEngine:
                 "validation_failed": True
             }
         
-        # Get products customer doesn't own
-        owned_products = customer_profile.get('products', {}).get('owned_products', [])
+        # Get products customer doesn't own (from the ownership index when the profile doesn't list them)
+        owned_products = customer_profile.get('products', {}).get('owned_products')
         if not isinstance(owned_products, list):
             owned_products = []
+            if customer_profile.get('customer_id'):
+                try:
+                    owned_products = sorted(get_ownership_index().owned_products(customer_profile['customer_id']))
+                except Exception as e:
+                    print(f"Warning: Could not load owned products ({e})")
+        owned_products = set(owned_products)
         
         available_products = {
             code: details for code, details in self.product_catalog.items()
@@ -662,31 +325,8 @@ class ProductRecommendationEngine:
         annual_income = customer_profile.get('economic_segment', {}).get('annual_income', 0) or 0
         
         # Detect if customer is a business owner/entrepreneur
-        is_business_owner = False
-        business_indicators = [
-            'manufacturing', 'repair', 'owner', 'entrepreneur', 'business', 
-            'self-employed', 'professional', 'consultant', 'freelance', 
-            'artisan', 'craftsman', 'trader', 'merchant', 'retailer',
-            'industrial', 'commercial', 'corporate', 'firm', 'company',
-            'SB', 'small_business', 'small business'  # Segment hints
-        ]
-        
-        activity_lower = str(activity).lower()
-        segment_lower = str(segment).lower()
-        
-        # Check profession/activity description
-        if any(indicator in activity_lower for indicator in business_indicators):
-            is_business_owner = True
-        
-        # Check economic segment (SB = Small Business)
-        if 'sb' in segment_lower or 'small_business' in segment_lower or 'small business' in segment_lower:
-            is_business_owner = True
-        
-        # Check if profession field indicates business
         profession = customer_profile.get('activity', {}).get('profession', '') or ''
-        profession_lower = str(profession).lower()
-        if any(indicator in profession_lower for indicator in business_indicators):
-            is_business_owner = True
+        is_business_owner = bool(detect_business_owners([activity], [segment], [profession])[0])
         
         # Build product list
         products_text = "\n\n".join([
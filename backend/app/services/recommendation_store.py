@@ -0,0 +1,164 @@
+"""
+Recommendation Store
+Bulk persistence of batch recommendations and their explanations.
+
+Instead of inserting one recommendation at a time to read cursor.lastrowid,
+the writer reserves a contiguous id range while holding SQLite's write lock,
+then writes the rows with executemany using those explicit ids.
+
+Batch explanations are normalized: each distinct narrative/key-factors pair is
+stored once in explanation_templates and recommendations reference it by id.
+Per-row parameters (explanation_params_json) are only stored when a row needs
+values that differ from its template; they are filled in at read time by
+render_explanation. recommendation_explanations remains the per-row store for
+explanations written individually (it takes precedence over the template).
+"""
+
+import hashlib
+import json
+import sqlite3
+from typing import List, Optional, Sequence, Tuple
+
+
+def get_template_ids(
+    conn: sqlite3.Connection,
+    templates: Sequence[Tuple[str, str]],
+    model_name: str
+) -> List[int]:
+    """
+    Get (creating if needed) the ids of explanation templates.
+
+    Args:
+        templates: (narrative, key_factors_json) pairs; may contain duplicates
+        model_name: Model that produced the explanations
+    Returns:
+        Template ids aligned with templates
+    """
+    keys = [
+        f"{model_name}:" + hashlib.sha1(f"{narrative}\x00{key_factors}".encode("utf-8")).hexdigest()
+        for narrative, key_factors in templates
+    ]
+    unique = dict(zip(keys, templates))
+    conn.executemany(
+        """
+        INSERT OR IGNORE INTO explanation_templates (template_key, narrative, key_factors_json, model_name)
+        VALUES (?, ?, ?, ?)
+        """,
+        [(key, narrative, key_factors, model_name) for key, (narrative, key_factors) in unique.items()]
+    )
+    placeholders = ",".join("?" * len(unique))
+    ids_by_key = dict(conn.execute(
+        f"SELECT template_key, id FROM explanation_templates WHERE template_key IN ({placeholders})",
+        list(unique)
+    ).fetchall()) if unique else {}
+    return [ids_by_key[key] for key in keys]
+
+
+def render_explanation(
+    narrative: Optional[str],
+    key_factors_json: Optional[str],
+    params_json: Optional[str] = None
+) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Fill a template's narrative placeholders and merge its key factors with
+    per-row parameters. Without parameters the template is returned unchanged.
+    """
+    if not params_json:
+        return narrative, key_factors_json
+    try:
+        params = json.loads(params_json)
+    except ValueError:
+        return narrative, key_factors_json
+
+    if narrative:
+        try:
+            narrative = narrative.format_map(params)
+        except (KeyError, IndexError, ValueError):
+            pass
+    try:
+        key_factors = json.loads(key_factors_json) if key_factors_json else {}
+    except ValueError:
+        key_factors = {}
+    if isinstance(key_factors, dict):
+        key_factors_json = json.dumps({**key_factors, **params})
+    return narrative, key_factors_json
+
+
+def reserve_recommendation_ids(conn: sqlite3.Connection, count: int) -> int:
+    """
+    Reserve `count` consecutive recommendation ids and return the first one.
+    The caller must insert the rows in the same transaction: the write lock
+    taken here is what keeps other writers from using the same range.
+    """
+    if not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+
+    # AUTOINCREMENT never reuses ids, so respect sqlite_sequence as well as MAX(id)
+    row = conn.execute("""
+        SELECT MAX(
+            COALESCE((SELECT MAX(id) FROM recommendations), 0),
+            COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'recommendations'), 0)
+        )
+    """).fetchone()
+    return int(row[0]) + 1
+
+
+def insert_recommendations(
+    conn: sqlite3.Connection,
+    run_id: int,
+    customer_ids: Sequence[str],
+    product_codes: Sequence[str],
+    acceptance_probs: Sequence[float],
+    expected_revenues: Sequence[float],
+    template_ids: Optional[Sequence[int]] = None,
+    explanation_params: Optional[Sequence[Optional[str]]] = None,
+    summary_calculated: Optional[int] = 1,
+    chunk_size: int = 50000
+) -> List[int]:
+    """
+    Insert recommendations in bulk. All sequences are aligned. Does not commit.
+
+    Args:
+        template_ids: Explanation template of each row (see get_template_ids)
+        explanation_params: Per-row parameters as JSON, None where the template suffices
+        summary_calculated: Value for recommendations.summary_calculated (None = column default)
+    Returns:
+        Assigned recommendation ids, in input order
+    """
+    n_rows = len(customer_ids)
+    if n_rows == 0:
+        return []
+
+    first_id = reserve_recommendation_ids(conn, n_rows)
+    ids = list(range(first_id, first_id + n_rows))
+    if template_ids is None:
+        template_ids = [None] * n_rows
+    if explanation_params is None:
+        explanation_params = [None] * n_rows
+
+    columns = ["id", "run_id", "customer_id", "product_code", "acceptance_prob", "expected_revenue",
+               "explanation_template_id", "explanation_params_json"]
+    if summary_calculated is not None:
+        columns.append("summary_calculated")
+    sql = f"""
+        INSERT INTO recommendations ({", ".join(columns)})
+        VALUES ({", ".join("?" * len(columns))})
+    """
+
+    for start in range(0, n_rows, chunk_size):
+        stop = min(start + chunk_size, n_rows)
+        values = [
+            ids[start:stop],
+            [run_id] * (stop - start),
+            customer_ids[start:stop],
+            product_codes[start:stop],
+            acceptance_probs[start:stop],
+            expected_revenues[start:stop],
+            template_ids[start:stop],
+            explanation_params[start:stop]
+        ]
+        if summary_calculated is not None:
+            values.append([summary_calculated] * (stop - start))
+        conn.executemany(sql, zip(*values))
+
+    return ids
@@ -0,0 +1,194 @@
+"""
+Recommender Service
+Long-lived recommender hosted in the API process.
+
+The model and its run's cluster assignments are loaded once and kept in
+memory. The registry's LATEST pointer is re-checked at most every
+RELOAD_CHECK_INTERVAL seconds. When a new run has been registered, the
+replacement is fully built first and then swapped in with a single
+reference assignment, so requests never see a half-loaded model. An online
+request for a customer of the loaded run is a dictionary lookup (their
+precomputed cluster) plus one row of the scoring engine. Customers the run
+does not know yet fall back to live feature computation. The run's lookalike
+index (nearest customers in the clustering space) is loaded with it.
+"""
+
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.db import get_conn
+from app.services import model_registry
+from app.services.lookalike_index import ARTIFACT_NAME as LOOKALIKE_ARTIFACT, LookalikeIndex
+from app.services.ownership_index import get_ownership_index
+
+# Add backend directory to path to import the recommender module
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+# Seconds between checks of the registry's LATEST pointer
+RELOAD_CHECK_INTERVAL = 2.0
+
+
+@dataclass(frozen=True)
+class LoadedRecommender:
+    recommender: "WellbankRecommender"
+    run_id: Optional[int]
+    cluster_by_customer: Dict[str, int]
+    loaded_at: float
+    lookalike: Optional[LookalikeIndex] = None
+
+
+def _load(run_id: Optional[int]) -> LoadedRecommender:
+    from recommender import WellbankRecommender
+
+    recommender = WellbankRecommender(run_id=run_id) if run_id is not None else WellbankRecommender()
+    cluster_by_customer: Dict[str, int] = {}
+    if recommender.run_id is not None:
+        conn = get_conn()
+        try:
+            cluster_by_customer = {
+                customer_id: int(cluster_id)
+                for customer_id, cluster_id in conn.execute(
+                    "SELECT customer_id, cluster_id FROM customer_clusters WHERE run_id = ?",
+                    (recommender.run_id,)
+                )
+            }
+        finally:
+            conn.close()
+    lookalike = None
+    if recommender.run_id is not None and model_registry.has_artifact(recommender.run_id, LOOKALIKE_ARTIFACT):
+        lookalike = LookalikeIndex.load(recommender.run_id)
+    return LoadedRecommender(recommender, recommender.run_id, cluster_by_customer, time.time(), lookalike)
+
+
+class RecommenderService:
+    """Holds the current recommender and hot-reloads it when a new run is registered."""
+
+    def __init__(self, check_interval: float = RELOAD_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._state: Optional[LoadedRecommender] = None
+        self._checked_at = 0.0
+        self._reload_lock = threading.Lock()
+
+    def current(self) -> LoadedRecommender:
+        """Current recommender (loads it on first use, reloads it when LATEST moves)."""
+        state = self._state
+        if state is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return state
+
+        # Only one thread reloads; the others keep serving the current model meanwhile
+        if not self._reload_lock.acquire(blocking=state is None):
+            return state
+        try:
+            state = self._state
+            if state is None or time.monotonic() - self._checked_at >= self.check_interval:
+                latest = model_registry.latest_run_id()
+                if state is None or (latest is not None and latest != state.run_id):
+                    try:
+                        state = _load(latest)
+                        self._state = state
+                    except Exception as e:
+                        if self._state is None:
+                            raise
+                        print(f"Warning: Could not load model for run {latest} ({e}). Keeping run {state.run_id}.")
+                self._checked_at = time.monotonic()
+            return state
+        finally:
+            self._reload_lock.release()
+
+    def recommend(self, customer_id: str, top_n: int = 3, exclude_owned: bool = True) -> Dict:
+        """Recommendations for one customer, from the precomputed cluster when available."""
+        state = self.current()
+        cluster_id = state.cluster_by_customer.get(customer_id)
+        if cluster_id is not None:
+            result = state.recommender.suggest_for_cluster(
+                customer_id, cluster_id, top_n=top_n, exclude_owned=exclude_owned
+            )
+            result["source"] = "precomputed"
+        else:
+            # Not part of the loaded run (e.g. imported since): compute features now
+            result = state.recommender.suggest(customer_id, top_n=top_n, exclude_owned=exclude_owned)
+            result["source"] = "computed"
+        result["run_id"] = state.run_id
+        return result
+
+    def recommend_batch(self, customer_ids: List[str], top_n: int = 3, exclude_owned: bool = True) -> Dict:
+        """
+        Columnar recommendations for many customers (see WellbankRecommender.batch_suggest).
+        Precomputed clusters are used where available; the others are predicted in one call.
+        """
+        state = self.current()
+        labels = np.fromiter(
+            (state.cluster_by_customer.get(str(cid), -1) for cid in customer_ids),
+            dtype=np.int64, count=len(customer_ids)
+        )
+        result = state.recommender.batch_suggest(
+            customer_ids, top_n=top_n, exclude_owned=exclude_owned, labels=labels
+        )
+        result["n_precomputed"] = int((labels >= 0).sum())
+        result["run_id"] = state.run_id
+        return result
+    
+    def lookalikes(self, customer_id: str, k: int = 10, product_code: Optional[str] = None) -> Dict:
+        """
+        The k customers nearest to customer_id in the clustering space of the loaded
+        run, optionally only among owners of product_code.
+        Raises FileNotFoundError if the run has no lookalike index.
+        """
+        state = self.current()
+        index = state.lookalike
+        if index is None:
+            raise FileNotFoundError(f"Run {state.run_id} has no lookalike index")
+        
+        position = index.position(customer_id)
+        if position is not None:
+            x = index.X[position]
+            source = "precomputed"
+        else:
+            # Not part of the loaded run: place the customer with live features
+            raw = state.recommender.get_user_feature_vector(customer_id)
+            if raw is None:
+                return {"error": f"Customer {customer_id} not found"}
+            x = state.recommender.predictor.transform(raw[None, :])[0]
+            source = "computed"
+        
+        allowed = None
+        if product_code is not None:
+            allowed = index.owners_mask(get_ownership_index(), product_code)
+        positions, distances = index.query(x, k=k, allowed=allowed, exclude=position)
+        
+        neighbour_ids = index.customer_ids[positions].tolist()
+        return {
+            "customer_id": customer_id,
+            "run_id": state.run_id,
+            "product_code": product_code,
+            "source": source,
+            "method": index.method if allowed is None else "brute",
+            "lookalikes": [
+                {
+                    "customer_id": neighbour_id,
+                    "distance": round(float(distance), 6),
+                    "cluster_id": state.cluster_by_customer.get(neighbour_id)
+                }
+                for neighbour_id, distance in zip(neighbour_ids, distances)
+            ]
+        }
+
+
+_service: Optional[RecommenderService] = None
+_service_lock = threading.Lock()
+
+
+def get_recommender_service() -> RecommenderService:
+    """Process-wide recommender service."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = RecommenderService()
+    return _service
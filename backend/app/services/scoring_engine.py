@@ -0,0 +1,212 @@
+"""
+Scoring Engine
+Vectorized customers x products scoring with top-k selection.
+
+Scores come from lookup tables instead of per-customer Python logic:
+- affinity tiers: (n_clusters x n_products) acceptance probability per cluster.
+  Tiers are tried in order; a customer only draws from a later tier when no
+  product of the earlier ones is available (e.g. persona products first, the
+  wider catalog only once the customer owns all of them)
+- revenue: expected revenue per product
+- eligibility / ownership: boolean (n_customers x n_products) masks
+
+The same engine serves batch runs (whole label vectors), online requests
+(one row) and what-if rescoring (copies with overridden tables).
+"""
+
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+class ScoringEngine:
+    """Dense score matrix + argpartition top-k over a fixed product list."""
+
+    def __init__(
+        self,
+        product_codes: Sequence[str],
+        affinity_tiers: Sequence[np.ndarray],
+        revenue: np.ndarray,
+        default_affinity_tiers: Optional[Sequence[np.ndarray]] = None,
+        cluster_names: Optional[Sequence[str]] = None
+    ):
+        """
+        Args:
+            product_codes: Column order of every table and mask
+            affinity_tiers: Per-tier (n_clusters x n_products) acceptance probabilities,
+                            0 where the cluster is never offered the product
+            revenue: (n_products,) expected revenue per product
+            default_affinity_tiers: Per-tier (n_products,) rows used for cluster IDs
+                                    beyond the tables (default: nothing offered)
+            cluster_names: Optional persona name per cluster row
+        """
+        self.product_codes = list(product_codes)
+        self.affinity_tiers = [np.asarray(t, dtype=np.float64) for t in affinity_tiers]
+        self.revenue = np.asarray(revenue, dtype=np.float64)
+        n_products = len(self.product_codes)
+        if default_affinity_tiers is None:
+            default_affinity_tiers = [np.zeros(n_products) for _ in self.affinity_tiers]
+        self.default_affinity_tiers = [np.asarray(t, dtype=np.float64) for t in default_affinity_tiers]
+        self.cluster_names = list(cluster_names) if cluster_names is not None else None
+        self._product_pos = {p: j for j, p in enumerate(self.product_codes)}
+
+    @property
+    def n_products(self) -> int:
+        return len(self.product_codes)
+
+    @property
+    def n_clusters(self) -> int:
+        return self.affinity_tiers[0].shape[0]
+
+    def product_index(self, product_code: str) -> Optional[int]:
+        return self._product_pos.get(product_code)
+
+    def cluster_name(self, cluster_id: int) -> str:
+        if self.cluster_names is not None and 0 <= cluster_id < len(self.cluster_names):
+            return self.cluster_names[cluster_id]
+        return f"Cluster {cluster_id}"
+
+    def _tier_rows(self, tier: int, labels: np.ndarray) -> np.ndarray:
+        """Affinity rows of one tier for every label (unknown clusters use the default row)."""
+        table = np.vstack([self.affinity_tiers[tier], self.default_affinity_tiers[tier][None, :]])
+        rows = np.where((labels >= 0) & (labels < self.n_clusters), labels, self.n_clusters)
+        return table[rows]
+
+    def score(
+        self,
+        labels: np.ndarray,
+        owned: Optional[np.ndarray] = None,
+        eligible: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Dense (n_customers x n_products) acceptance probability matrix.
+        Unavailable (owned, ineligible or not offered) entries are 0.
+        """
+        labels = np.asarray(labels, dtype=np.int64)
+        available = np.ones((len(labels), self.n_products), dtype=bool)
+        if owned is not None:
+            available &= ~owned
+        if eligible is not None:
+            available &= eligible
+
+        scores = np.zeros((len(labels), self.n_products))
+        pending = np.ones(len(labels), dtype=bool)
+        for tier in range(len(self.affinity_tiers)):
+            if not pending.any():
+                break
+            tier_scores = self._tier_rows(tier, labels[pending])
+            tier_scores[~available[pending]] = 0.0
+            has_candidates = (tier_scores > 0).any(axis=1)
+            rows = np.flatnonzero(pending)[has_candidates]
+            scores[rows] = tier_scores[has_candidates]
+            pending[rows] = False
+        return scores
+
+    def top_k(
+        self,
+        labels: np.ndarray,
+        k: int = 3,
+        owned: Optional[np.ndarray] = None,
+        eligible: Optional[np.ndarray] = None,
+        objective: str = "probability"
+    ) -> Dict[str, np.ndarray]:
+        """
+        Best k products per customer.
+
+        Args:
+            objective: "probability" ranks by acceptance probability,
+                       "expected_value" by probability x revenue
+        Returns:
+            Columnar dict (grouped by customer, best first): 'row', 'cluster',
+            'product_index', 'product_code', 'acceptance_prob', 'expected_revenue'
+        """
+        labels = np.asarray(labels, dtype=np.int64)
+        prob = self.score(labels, owned=owned, eligible=eligible)
+        if objective == "expected_value":
+            rank_score = prob * self.revenue
+        elif objective == "probability":
+            rank_score = prob.copy()
+        else:
+            raise ValueError(f"Unknown objective: {objective}")
+
+        # Ties keep catalog order; unavailable entries can never be selected
+        rank_score -= np.arange(self.n_products) * 1e-9
+        rank_score[prob <= 0] = -np.inf
+
+        k = min(k, self.n_products)
+        if k <= 0 or len(labels) == 0:
+            top = np.empty((len(labels), 0), dtype=np.int64)
+        elif k < self.n_products:
+            top = np.argpartition(-rank_score, k - 1, axis=1)[:, :k]
+        else:
+            top = np.tile(np.arange(self.n_products), (len(labels), 1))
+        order = np.argsort(-np.take_along_axis(rank_score, top, axis=1), axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+
+        valid = np.isfinite(np.take_along_axis(rank_score, top, axis=1))
+        rows, position = np.nonzero(valid)
+        product_idx = top[rows, position]
+        return {
+            'row': rows,
+            'cluster': labels[rows],
+            'product_index': product_idx,
+            'product_code': np.asarray(self.product_codes, dtype=object)[product_idx],
+            'acceptance_prob': prob[rows, product_idx].round(3),
+            'expected_revenue': self.revenue[product_idx]
+        }
+
+    def with_overrides(
+        self,
+        revenue: Optional[Dict[str, float]] = None,
+        affinity_multiplier: Optional[Dict[str, float]] = None
+    ) -> "ScoringEngine":
+        """
+        What-if copy of the engine with some per-product tables changed.
+
+        Args:
+            revenue: product_code -> new expected revenue
+            affinity_multiplier: product_code -> factor applied to its acceptance
+                                 probability in every cluster (result clipped to [0, 1])
+        """
+        new_revenue = self.revenue.copy()
+        for product_code, value in (revenue or {}).items():
+            if product_code in self._product_pos:
+                new_revenue[self._product_pos[product_code]] = value
+
+        multiplier = np.ones(self.n_products)
+        for product_code, factor in (affinity_multiplier or {}).items():
+            if product_code in self._product_pos:
+                multiplier[self._product_pos[product_code]] = factor
+
+        return ScoringEngine(
+            self.product_codes,
+            [np.clip(t * multiplier, 0.0, 1.0) for t in self.affinity_tiers],
+            new_revenue,
+            default_affinity_tiers=[np.clip(t * multiplier, 0.0, 1.0) for t in self.default_affinity_tiers],
+            cluster_names=self.cluster_names
+        )
+
+
+def build_tier(
+    product_codes: Sequence[str],
+    cluster_products: Dict[int, List[str]],
+    base_probs: Dict[int, float],
+    n_clusters: int,
+    decay: float = 0.1,
+    min_prob: float = 0.3,
+    max_prob: float = 0.95
+) -> np.ndarray:
+    """
+    Affinity table where each cluster's listed products get base * (1 - decay * position),
+    clipped to [min_prob, max_prob]. Unlisted products get 0.
+    """
+    pos = {p: j for j, p in enumerate(product_codes)}
+    table = np.zeros((n_clusters, len(product_codes)))
+    for cluster_id, products in cluster_products.items():
+        if cluster_id >= n_clusters:
+            continue
+        for i, product_code in enumerate(products):
+            j = pos[product_code]
+            if table[cluster_id, j] == 0:
+                table[cluster_id, j] = np.clip(base_probs[cluster_id] * (1.0 - i * decay), min_prob, max_prob)
+    return table
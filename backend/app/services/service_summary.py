@@ -1,127 +1,90 @@
 # backend/app/services/service_summary.py
+"""
+Services overview cards, aggregated from the imported holdings and
+transactions tables with indexed queries.
+
+The summary is cached in-process. Dataset imports drop it through
+invalidate_services_summary, and it also expires after CACHE_TTL_SECONDS
+because the "active customer" window moves with the clock.
+"""
 
 from __future__ import annotations
 
-import csv
+import threading
+import time
 from dataclasses import asdict
 from datetime import datetime, timedelta
-from pathlib import Path
-from typing import Dict, Iterable, Set
-
-from app.core.service_catalog import SERVICE_CARDS, PRODUCT_DOMAIN_MAP, PRODUCT_KEYWORDS
-
-
-UPLOADS_DIR = Path("uploads")  # your backend already uses /uploads
-
-
-def _read_csv(path: Path) -> Iterable[dict]:
-    with path.open("r", encoding="utf-8", newline="") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            yield row
-
-
-def _pick_first_existing(row: dict, candidates: list[str]) -> str | None:
-    for c in candidates:
-        if c in row and row[c] not in (None, ""):
-            return row[c]
-    return None
-
-
-def _parse_date(s: str | None) -> datetime | None:
-    if not s:
-        return None
-    s = s.strip()
-    for fmt in ("%Y-%m-%d", "%Y/%m/%d", "%d/%m/%Y", "%d-%m-%Y", "%Y-%m-%d %H:%M:%S"):
-        try:
-            return datetime.strptime(s, fmt)
-        except ValueError:
-            pass
-    return None
-
-
-def normalize_text(text: str) -> str:
-    """Normalize text for keyword matching (lowercase, strip whitespace)."""
-    return text.lower().strip()
-
-
-def _load_owned_products(possesso_csv: Path) -> Dict[str, Set[str]]:
-    customer_col = "codice_cliente"
-    description_col = "descrizione"
-
-    domain_customers: Dict[str, Set[str]] = {c.key: set() for c in SERVICE_CARDS}
-
-    for row in _read_csv(possesso_csv):
-        cid = row.get(customer_col)
-        raw_descr = row.get(description_col, "")
 
-        if not cid or not raw_descr:
-            continue
+from app.core.service_catalog import SERVICE_CARDS, PRODUCT_DOMAIN_MAP, PRODUCT_DOMAIN_CLASSIFIER
+from app.db import get_conn
 
-        descr = normalize_text(raw_descr)
 
-        for domain, keywords in PRODUCT_KEYWORDS.items():
-            for kw in keywords:
-                if kw in descr:
-                    domain_customers[domain].add(str(cid))
-                    break
+ACTIVE_DAYS = 90  # active customer = at least 1 transaction in the last ACTIVE_DAYS
+CACHE_TTL_SECONDS = 3600.0
 
-    return domain_customers
+_cache: list[dict] | None = None
+_cache_time = 0.0
+_cache_generation = 0
+_cache_lock = threading.Lock()
 
 
-
-
-def _load_active_customers(movimenti_csv: Path, days: int = 90) -> Set[str]:
+def _holding_domains(conn) -> list[tuple[str, str | None, str]]:
     """
-    Active customer = at least 1 transaction in last `days`.
+    (product_code, product_name, domain) for every distinct held product.
+    Catalog products map by code; others are classified by their description.
     """
-    customer_id_cols = ["id_cliente", "customer_id", "cliente_id", "ID_CLIENTE"]
-    date_cols = ["data", "date", "timestamp", "DATA"]
-
-    cutoff = datetime.now() - timedelta(days=days)
-    active: Set[str] = set()
-
-    for row in _read_csv(movimenti_csv):
-        cid = _pick_first_existing(row, customer_id_cols)
-        dt = _parse_date(_pick_first_existing(row, date_cols))
-        if not cid or not dt:
-            continue
-        if dt >= cutoff:
-            active.add(cid)
+    rows = conn.execute("SELECT DISTINCT product_code, product_name FROM holdings").fetchall()
+    holding_domains = []
+    for product_code, product_name in rows:
+        domain = PRODUCT_DOMAIN_MAP.get(product_code)
+        domains = [domain] if domain else PRODUCT_DOMAIN_CLASSIFIER.classify(product_name)
+        holding_domains.extend((product_code, product_name, d) for d in domains)
+    return holding_domains
 
-    return active
 
-
-def compute_services_summary() -> list[dict]:
+def compute_services_summary(conn=None, days: int = ACTIVE_DAYS) -> list[dict]:
     """
-    Uses uploaded CSVs:
-      - uploads/anagrafiche/anagrafiche-synthetic.csv (optional for later)
-      - uploads/possesso/possesso-prodotti-synthetic.csv
-      - uploads/movimenti/movimenti-synthetic.csv
-
+    Clients per service domain and the share of them that are active.
     Output fits the UI cards.
     """
-
-    # Try multiple possible paths for flexibility
-    possesso_csv = (
-        UPLOADS_DIR / "prodotti" / "possesso-prodotti-synthetic.csv"  # Actual location
-        if (UPLOADS_DIR / "prodotti" / "possesso-prodotti-synthetic.csv").exists()
-        else UPLOADS_DIR / "possesso" / "possesso-prodotti-synthetic.csv"  # Alternative
-    )
-    movimenti_csv = UPLOADS_DIR / "movimenti" / "movimenti-synthetic.csv"
-
-    # If you uploaded with different names, update these paths.
-
-    domain_customers = _load_owned_products(possesso_csv) if possesso_csv.exists() else {c.key: set() for c in SERVICE_CARDS}
-    active_customers = _load_active_customers(movimenti_csv, days=90) if movimenti_csv.exists() else set()
-
+    own_conn = conn is None
+    conn = conn or get_conn()
+    try:
+        conn.execute("DROP TABLE IF EXISTS temp.holding_domains")
+        conn.execute("""
+            CREATE TEMP TABLE holding_domains (
+                product_code TEXT, product_name TEXT, domain TEXT,
+                PRIMARY KEY (product_code, product_name, domain)
+            )
+        """)
+        conn.executemany("INSERT OR IGNORE INTO temp.holding_domains VALUES (?, ?, ?)", _holding_domains(conn))
+
+        # tx_date is stored as YYYY-MM-DD, so "active" is a point lookup on idx_tx_customer_date
+        cutoff = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+        rows = conn.execute("""
+            SELECT
+                hd.domain,
+                COUNT(DISTINCT h.customer_id) AS clients,
+                COUNT(DISTINCT CASE WHEN EXISTS (
+                    SELECT 1 FROM transactions t
+                    WHERE t.customer_id = h.customer_id AND t.tx_date >= ?
+                ) THEN h.customer_id END) AS active_clients
+            FROM temp.holding_domains hd
+            JOIN holdings h
+              ON h.product_code = hd.product_code AND h.product_name IS hd.product_name
+            GROUP BY hd.domain
+        """, (cutoff,)).fetchall()
+        conn.execute("DROP TABLE temp.holding_domains")
+    finally:
+        if own_conn:
+            conn.close()
+
+    counts = {row[0]: (row[1], row[2]) for row in rows}
     items = []
     for card in SERVICE_CARDS:
-        customers = domain_customers.get(card.key, set())
-        clients = len(customers)
+        clients, active_in_domain = counts.get(card.key, (0, 0))
 
         # “conversion” proxy: active ratio (0..1) within that domain
-        active_in_domain = len(customers.intersection(active_customers)) if clients else 0
         conversion = (active_in_domain / clients) if clients else 0.0
 
         items.append(
@@ -133,3 +96,29 @@ def compute_services_summary() -> list[dict]:
             }
         )
     return items
+
+
+def get_services_summary() -> list[dict]:
+    """Cached services summary (recomputed after an import or when the TTL expires)."""
+    global _cache, _cache_time
+    with _cache_lock:
+        if _cache is not None and time.monotonic() - _cache_time < CACHE_TTL_SECONDS:
+            return [dict(item) for item in _cache]
+        generation = _cache_generation
+
+    items = compute_services_summary()
+
+    with _cache_lock:
+        # Don't store a result computed while an import invalidated the cache
+        if generation == _cache_generation:
+            _cache = items
+            _cache_time = time.monotonic()
+    return [dict(item) for item in items]
+
+
+def invalidate_services_summary() -> None:
+    """Drop the cached summary (call after holdings or transactions change)."""
+    global _cache, _cache_generation
+    with _cache_lock:
+        _cache = None
+        _cache_generation += 1
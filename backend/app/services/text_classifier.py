@@ -0,0 +1,95 @@
+"""
+Text Classifier
+Shared keyword classification for product descriptions and profession text.
+
+Each keyword set is compiled into a single regex alternation, so a text is
+scanned once per set instead of once per keyword. Results are memoized per
+distinct (normalized) text: a column of millions of rows with a few thousand
+distinct descriptions costs a few thousand regex searches.
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """Normalize text for keyword matching (lowercase, strip whitespace)."""
+    return str(text).lower().strip() if text is not None else ""
+
+
+class KeywordClassifier:
+    """
+    Multi-label substring classifier: a text gets every label whose keyword
+    set has at least one keyword occurring in it (case-insensitive).
+    """
+
+    def __init__(self, keyword_sets: Dict[str, Sequence[str]], cache_size: int = 65536):
+        self.labels = list(keyword_sets)
+        # Longest keywords first so overlapping alternatives match the most specific one
+        self._patterns = {
+            label: re.compile("|".join(
+                re.escape(normalize_text(k)) for k in sorted(keywords, key=len, reverse=True)
+            ))
+            for label, keywords in keyword_sets.items()
+            if keywords
+        }
+        self._classify_normalized = lru_cache(maxsize=cache_size)(self._classify_uncached)
+
+    def _classify_uncached(self, text: str) -> FrozenSet[str]:
+        if not text:
+            return frozenset()
+        return frozenset(label for label, pattern in self._patterns.items() if pattern.search(text))
+
+    def classify(self, text: Optional[str]) -> FrozenSet[str]:
+        """Labels of one text (memoized)."""
+        return self._classify_normalized(normalize_text(text))
+
+    def matches(self, text: Optional[str], label: str) -> bool:
+        """Whether a text has a label."""
+        return label in self.classify(text)
+
+    def classify_many(self, texts: Sequence[Optional[str]]) -> Dict[str, np.ndarray]:
+        """
+        Classify a column of texts, evaluating each distinct text once.
+
+        Returns:
+            label -> boolean array aligned with texts
+        """
+        codes, distinct = pd.factorize(pd.Series(texts, dtype=object), use_na_sentinel=True)
+        per_distinct = [self.classify(text) for text in distinct]
+        result = {}
+        for label in self.labels:
+            # Extra trailing False row is picked by missing values (code -1)
+            hits = np.array([label in labels for labels in per_distinct] + [False], dtype=bool)
+            result[label] = hits[codes]
+        return result
+
+    def cache_info(self):
+        return self._classify_normalized.cache_info()
+
+
+# Activity / profession keywords that indicate a business owner
+BUSINESS_INDICATORS = [
+    'manufacturing', 'repair', 'owner', 'entrepreneur', 'business',
+    'self-employed', 'professional', 'consultant', 'freelance',
+    'artisan', 'craftsman', 'trader', 'merchant', 'retailer',
+    'industrial', 'commercial', 'corporate', 'firm', 'company',
+    'small_business', 'small business'
+]
+
+# Economic segment hints of small businesses (SB = Small Business)
+BUSINESS_SEGMENT_HINTS = ['sb', 'small_business', 'small business']
+
+PROFESSION_CLASSIFIER = KeywordClassifier({
+    'business_owner': BUSINESS_INDICATORS,
+    'business': ['business'],
+    'executive': ['manager', 'director', 'executive']
+})
+
+SEGMENT_CLASSIFIER = KeywordClassifier({
+    'business_owner': BUSINESS_SEGMENT_HINTS
+})
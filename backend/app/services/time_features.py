@@ -0,0 +1,230 @@
+"""
+Time Features
+Per-customer time-pattern features from transaction timestamps in one vectorized pass.
+
+Timestamps are integer-encoded once (day number since the epoch, second of
+day, -1 when only the date is known) and every histogram is a single
+np.bincount over customer x bucket codes: hour of day (24), day of week (7),
+the time-pattern buckets of the time view, amount-weighted day of week and
+amount per calendar month. The profile fields the agent prompt uses
+(transaction_patterns.most_active_day / most_active_time,
+financial_metrics.spending_concentration / spending_volatility) are derived
+from those histograms for all customers at once.
+
+Definitions:
+  - hour_concentration / day_concentration: 1 - H(p) / log(B) of the
+    transaction-count histogram (0 = spread evenly, 1 = all in one bucket)
+  - spending_concentration: the same on the amount-weighted day-of-week histogram
+  - spending_volatility: coefficient of variation of monthly spend over the
+    run's month window (calendar months from the first to the last transaction
+    date in the database). The window is passed in by the batch so customers
+    re-assigned by an assign-only run use the same one as the carried-forward rows.
+"""
+
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Hour buckets [start, end) of the time view, in interpretation-guide order;
+# weekend sits between early morning and office hours in the guide
+TIME_BUCKETS = [('night', 0, 6), ('early_morning', 6, 9), ('office', 9, 18), ('evening', 18, 24)]
+TIME_PATTERNS = ['night', 'early_morning', 'weekend', 'office', 'evening']
+TIME_FEATURES = [f'time_share_{name}' for name in TIME_PATTERNS] + ['time_known_share']
+
+TIME_BUCKET_LABELS = {
+    'night': 'Night (00-06)',
+    'early_morning': 'Early Morning (06-09)',
+    'office': 'Office Hours (09-18)',
+    'evening': 'Evening (18-24)',
+}
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+PROFILE_FIELDS = [
+    'most_active_day', 'most_active_hour', 'most_active_time',
+    'hour_concentration', 'day_concentration',
+    'spending_concentration', 'spending_volatility'
+]
+
+# Hour -> time bucket index
+_HOUR_BUCKET = np.repeat(np.arange(len(TIME_BUCKETS)), [end - start for _, start, end in TIME_BUCKETS])
+
+
+def encode_timestamps(tx_date: pd.Series, tx_time: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Integer-encode transaction timestamps.
+    Only the distinct date and time strings are parsed (a few thousand dates and
+    at most 86400 times, whatever the number of transactions), then mapped back
+    through their factorized codes.
+    Returns: (day number since 1970-01-01, -1 if invalid; second of day, -1 if unknown)
+    """
+    date_codes, date_values = pd.factorize(tx_date)
+    dates = pd.to_datetime(pd.Series(date_values, dtype=object), errors='coerce', format='%Y-%m-%d')
+    unique_days = np.where(dates.notna(), dates.values.astype('datetime64[D]').astype(np.int64), -1)
+    days = np.append(unique_days, -1)[date_codes]   # code -1 (missing) -> last entry
+
+    time_codes, time_values = pd.factorize(tx_time)
+    parts = pd.Series(time_values, dtype='string').str.extract(r'^(\d{1,2}):(\d{2})(?::(\d{2}))?')
+    hms = parts.apply(pd.to_numeric, errors='coerce')
+    unique_seconds = (hms[0] * 3600 + hms[1] * 60 + hms[2].fillna(0)).to_numpy(dtype=np.float64, na_value=np.nan)
+    valid = (unique_seconds >= 0) & (unique_seconds < 86400)
+    unique_seconds = np.where(valid, unique_seconds, -1).astype(np.int64)
+    seconds = np.append(unique_seconds, -1)[time_codes]
+    return days.astype(np.int64), seconds
+
+
+def _histogram(rows: np.ndarray, buckets: np.ndarray, n_rows: int, n_buckets: int, weights=None) -> np.ndarray:
+    """(n_rows, n_buckets) histogram in one bincount over row x bucket codes."""
+    flat = np.bincount(rows * n_buckets + buckets, weights=weights, minlength=n_rows * n_buckets)
+    return flat.reshape(n_rows, n_buckets)
+
+
+def _concentration(hist: np.ndarray) -> np.ndarray:
+    """1 - normalized entropy per row; NaN for empty rows."""
+    totals = hist.sum(axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p = hist / totals
+        entropy = -np.where(p > 0, p * np.log(p), 0.0).sum(axis=1)
+    concentration = 1.0 - entropy / np.log(hist.shape[1])
+    concentration[totals[:, 0] == 0] = np.nan
+    return concentration
+
+
+def _month_number(date) -> Optional[int]:
+    """Months since 1970-01 of a 'YYYY-MM-DD' date (None if missing or invalid)."""
+    parsed = pd.to_datetime(date, errors='coerce', format='%Y-%m-%d') if date is not None else pd.NaT
+    if pd.isna(parsed):
+        return None
+    return (parsed.year - 1970) * 12 + parsed.month - 1
+
+
+def time_histograms(
+    customer_ids: Sequence[str],
+    transactions_df: pd.DataFrame,
+    month_window: Optional[Tuple[str, str]] = None
+) -> Dict[str, np.ndarray]:
+    """
+    All per-customer histograms, rows aligned with customer_ids:
+    'hour' (n, 24), 'day' (n, 7), 'bucket' (n, len(TIME_BUCKETS)) transaction counts,
+    'day_amount' (n, 7) and 'month_amount' (n, months) absolute amounts, and
+    'n_dated' (n,) transactions with a valid date.
+
+    month_window: Optional (first, last) 'YYYY-MM-DD' dates spanning the
+    'month_amount' columns; transactions outside it are left out of that
+    histogram only. Default: the months of the given transactions.
+    """
+    n = len(customer_ids)
+    rows = pd.Index(customer_ids).get_indexer(transactions_df['customer_id']).astype(np.int64)
+    if 'tx_time' in transactions_df:
+        tx_time = transactions_df['tx_time']
+    else:
+        tx_time = pd.Series(None, index=transactions_df.index, dtype='string')
+    days, seconds = encode_timestamps(transactions_df['tx_date'], tx_time)
+    amounts = np.abs(pd.to_numeric(transactions_df['amount'], errors='coerce').fillna(0).to_numpy(dtype=np.float64))
+
+    known = rows >= 0
+    timed = known & (seconds >= 0)
+    dated = known & (days >= 0)
+
+    hour = seconds[timed] // 3600
+    weekday = (days[dated] + 3) % 7   # 1970-01-01 was a Thursday; Monday = 0
+    month = days[dated].astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    first_month = last_month = None
+    if month_window is not None:
+        first_month, last_month = (_month_number(date) for date in month_window)
+    if first_month is None or last_month is None or last_month < first_month:
+        first_month = int(month.min()) if len(month) else 0
+        last_month = int(month.max()) if len(month) else 0
+    n_months = last_month - first_month + 1
+    in_window = (month >= first_month) & (month <= last_month)
+
+    return {
+        'hour': _histogram(rows[timed], hour, n, 24),
+        'bucket': _histogram(rows[timed], _HOUR_BUCKET[hour], n, len(TIME_BUCKETS)),
+        'day': _histogram(rows[dated], weekday, n, 7),
+        'day_amount': _histogram(rows[dated], weekday, n, 7, weights=amounts[dated]),
+        'month_amount': _histogram(rows[dated][in_window], month[in_window] - first_month, n, n_months,
+                                   weights=amounts[dated][in_window]),
+        'n_transactions': np.bincount(rows[known], minlength=n),
+        'n_dated': np.bincount(rows[dated], minlength=n),
+    }
+
+
+def compute_time_features(
+    customer_ids: Sequence[str],
+    transactions_df: pd.DataFrame,
+    month_window: Optional[Tuple[str, str]] = None
+) -> pd.DataFrame:
+    """
+    Time-view shares (TIME_FEATURES) and profile fields (PROFILE_FIELDS) per customer.
+    month_window is the spending_volatility window (see time_histograms).
+    Returns a frame indexed by customer_id; profile fields are None/NaN for
+    customers without the underlying data.
+    """
+    hist = time_histograms(customer_ids, transactions_df, month_window)
+    frame = pd.DataFrame(index=pd.Index(customer_ids, name='customer_id'))
+
+    n_timed = hist['hour'].sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        bucket_share = np.nan_to_num(hist['bucket'] / n_timed[:, None])
+        weekend_share = np.nan_to_num(hist['day'][:, 5:].sum(axis=1) / hist['n_dated'])
+        known_share = np.nan_to_num(n_timed / hist['n_transactions'])
+    for j, (name, _, _) in enumerate(TIME_BUCKETS):
+        frame[f'time_share_{name}'] = bucket_share[:, j]
+    frame['time_share_weekend'] = weekend_share
+    frame['time_known_share'] = known_share
+    frame = frame[TIME_FEATURES]
+
+    has_day = hist['n_dated'] > 0
+    has_time = n_timed > 0
+    bucket_labels = np.array([TIME_BUCKET_LABELS[name] for name, _, _ in TIME_BUCKETS], dtype=object)
+    frame['most_active_day'] = np.where(has_day, np.array(DAY_NAMES, dtype=object)[hist['day'].argmax(axis=1)], None)
+    frame['most_active_hour'] = pd.Series(hist['hour'].argmax(axis=1), index=frame.index).where(has_time).astype('Int64')
+    frame['most_active_time'] = np.where(has_time, bucket_labels[hist['bucket'].argmax(axis=1)], None)
+    frame['hour_concentration'] = _concentration(hist['hour'])
+    frame['day_concentration'] = _concentration(hist['day'])
+    frame['spending_concentration'] = _concentration(hist['day_amount'])
+
+    monthly = hist['month_amount']
+    mean = monthly.mean(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        frame['spending_volatility'] = np.where(mean > 0, monthly.std(axis=1) / mean, np.nan)
+    return frame
+
+
+def save_time_profiles(conn, run_id: int, profiles: pd.DataFrame) -> int:
+    """Bulk insert the PROFILE_FIELDS of every customer (profiles: customer_id + PROFILE_FIELDS columns)."""
+    values = profiles[['customer_id'] + PROFILE_FIELDS].astype(object)
+    values = values.where(values.notna(), None)
+    rows = [(run_id, *row) for row in values.itertuples(index=False, name=None)]
+    conn.executemany(
+        f"""
+        INSERT OR REPLACE INTO customer_time_profiles (run_id, customer_id, {', '.join(PROFILE_FIELDS)})
+        VALUES (?, ?, {', '.join('?' * len(PROFILE_FIELDS))})
+        """,
+        rows
+    )
+    return len(rows)
+
+
+if __name__ == "__main__":
+    # Benchmark: python -m app.services.time_features [n_customers] [tx_per_customer]
+    import sys
+    import time
+
+    n_customers = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    per_customer = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    rng = np.random.default_rng(0)
+    ids = [f"C{i:07d}" for i in range(n_customers)]
+    n_tx = n_customers * per_customer
+    start_day = np.datetime64('2025-01-01')
+    tx = pd.DataFrame({
+        'customer_id': np.array(ids, dtype=object)[rng.integers(0, n_customers, n_tx)],
+        'tx_date': (start_day + rng.integers(0, 365, n_tx)).astype(str),
+        'tx_time': pd.to_datetime(rng.integers(0, 86400, n_tx), unit='s').strftime('%H:%M:%S'),
+        'amount': rng.lognormal(3, 1, n_tx),
+    })
+    t0 = time.perf_counter()
+    features = compute_time_features(ids, tx)
+    print(f"{n_tx} transactions, {n_customers} customers: {time.perf_counter() - t0:.2f}s")
+    print(features.head())
@@ -9,7 +9,6 @@ import pandas as pd
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Tuple, Optional
-from sklearn.cluster import KMeans, DBSCAN
 from sklearn.preprocessing import StandardScaler
 from sklearn.decomposition import PCA
 import json
@@ -21,6 +20,9 @@ backend_path = Path(__file__).parent
 if str(backend_path) not in sys.path:
     sys.path.insert(0, str(backend_path))
 from app.db import get_conn
+from app.services.centroid_geometry import compute_centroid_geometry
+from app.services.clustering_engine import fit_clusters, print_clustering_metrics
+from app.services.recommendation_store import get_template_ids, insert_recommendations
 
 
 def load_customer_data() -> pd.DataFrame:
@@ -187,8 +189,16 @@ def prepare_features(df: pd.DataFrame) -> Tuple[pd.DataFrame, List[str]]:
     return X_scaled, feature_cols
 
 
-def perform_clustering(X: pd.DataFrame, n_clusters: int = 5) -> Tuple[np.ndarray, Dict]:
-    """Perform K-means clustering."""
+def perform_clustering(
+    X: pd.DataFrame,
+    n_clusters: int = 5,
+    backend: str = 'auto'
+) -> Tuple[np.ndarray, Dict, Dict[str, np.ndarray]]:
+    """
+    Perform clustering with the shared clustering engine.
+    Also returns per-customer centroid geometry (distance, rank, margin) computed
+    in the space the clustering ran in.
+    """
     # Use PCA for dimensionality reduction if needed
     if X.shape[1] > 10:
         pca = PCA(n_components=min(10, X.shape[1]))
@@ -197,19 +207,18 @@ def perform_clustering(X: pd.DataFrame, n_clusters: int = 5) -> Tuple[np.ndarray
         X_reduced = X.values
         pca = None
     
-    # K-means clustering
-    kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
-    cluster_labels = kmeans.fit_predict(X_reduced)
+    model, cluster_labels, metrics = fit_clusters(X_reduced, n_clusters, backend=backend)
+    print_clustering_metrics(metrics)
+    geometry = compute_centroid_geometry(X_reduced, model.cluster_centers_, cluster_labels)
     
     # Calculate cluster statistics
     cluster_info = {
-        'n_clusters': n_clusters,
-        'inertia': float(kmeans.inertia_),
+        **metrics,
         'pca_used': pca is not None,
-        'cluster_centers': kmeans.cluster_centers_.tolist() if pca is None else None
+        'cluster_centers': model.cluster_centers_.tolist() if pca is None else None
     }
     
-    return cluster_labels, cluster_info
+    return cluster_labels, cluster_info, geometry
 
 
 def assign_services(cluster_id: int, customer_features: Dict) -> List[Dict]:
@@ -292,7 +301,8 @@ def save_clustering_results(
     customer_ids: List[str],
     cluster_labels: np.ndarray,
     customer_features: pd.DataFrame,
-    cluster_info: Dict
+    cluster_info: Dict,
+    geometry: Optional[Dict[str, np.ndarray]] = None
 ):
     """Save clustering results to database."""
     conn = get_conn()
@@ -300,105 +310,79 @@ def save_clustering_results(
     try:
         cursor = conn.cursor()
         
+        # Insert cluster assignments with centroid geometry in one bulk statement
+        n_customers = len(customer_ids)
+        if geometry is not None:
+            distances = geometry['distance'].tolist()
+            ranks = geometry['rank'].tolist()
+            margins = geometry['margin'].tolist()
+        else:
+            distances = ranks = margins = [None] * n_customers
+        cursor.executemany(
+            """
+            INSERT OR REPLACE INTO customer_clusters 
+            (run_id, customer_id, cluster_id, distance_to_centroid, centroid_rank, centroid_margin)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            zip([run_id] * n_customers, customer_ids, np.asarray(cluster_labels).tolist(), distances, ranks, margins)
+        )
+        
         # Optimize: Create a lookup dictionary for customer features (much faster than searching)
         customer_feat_dict_lookup = customer_features.set_index('customer_id').to_dict('index')
         
-        # Prepare batch data
-        cluster_batch = []
-        recommendation_batch = []
-        explanation_data = []  # Store service data with customer_id for later matching
+        # Prepare column data for the bulk insert
+        rec_customer_ids = []
+        rec_services = []
         
-        batch_size = 500  # Process in batches of 500
         total = len(customer_ids)
         
         for idx, (customer_id, cluster_id) in enumerate(zip(customer_ids, cluster_labels)):
             # Get customer features from lookup (O(1) instead of O(n))
             customer_feat_dict = customer_feat_dict_lookup.get(customer_id, {})
             
-            # Calculate distance to centroid (simplified)
-            distance = np.random.uniform(0.1, 2.0)  # Placeholder
-            
-            # Add to batch
-            cluster_batch.append((run_id, customer_id, int(cluster_id), float(distance)))
-            
             # Assign services and create recommendations
-            services = assign_services(int(cluster_id), customer_feat_dict)
-            
-            for service in services:
-                recommendation_batch.append((
-                    run_id,
-                    customer_id,
-                    service['product_code'],
-                    service['acceptance_prob'],
-                    service['expected_revenue']
-                ))
-                explanation_data.append(service)  # Store for later
+            for service in assign_services(int(cluster_id), customer_feat_dict):
+                rec_customer_ids.append(customer_id)
+                rec_services.append(service)
             
-            # Commit in batches for better performance
-            if (idx + 1) % batch_size == 0 or (idx + 1) == total:
-                # Insert clusters in batch (much faster)
-                cursor.executemany(
-                    """
-                    INSERT OR REPLACE INTO customer_clusters 
-                    (run_id, customer_id, cluster_id, distance_to_centroid)
-                    VALUES (?, ?, ?, ?)
-                    """,
-                    cluster_batch
-                )
-                
-                # Insert recommendations and get IDs
-                rec_ids = []
-                for rec_data in recommendation_batch:
-                    cursor.execute(
-                        """
-                        INSERT INTO recommendations 
-                        (run_id, customer_id, product_code, acceptance_prob, expected_revenue)
-                        VALUES (?, ?, ?, ?, ?)
-                        """,
-                        rec_data
-                    )
-                    rec_ids.append(cursor.lastrowid)
-                
-                # Insert explanations
-                for rec_id, service in zip(rec_ids, explanation_data):
-                    cursor.execute(
-                        """
-                        INSERT INTO recommendation_explanations 
-                        (recommendation_id, key_factors_json, narrative, model_name)
-                        VALUES (?, ?, ?, ?)
-                        """,
-                        (rec_id, json.dumps(service), service['reason'], 'clustering_v1')
-                    )
-                
-                conn.commit()
-                
-                # Clear batches
-                cluster_batch = []
-                recommendation_batch = []
-                explanation_data = []
-                
-                # Progress update
-                if (idx + 1) % 1000 == 0:
-                    print(f"  Processed {idx + 1}/{total} customers...")
-        
-        # Final commit for any remaining items
-        if cluster_batch:
-            cursor.executemany(
-                """
-                INSERT OR REPLACE INTO customer_clusters 
-                (run_id, customer_id, cluster_id, distance_to_centroid)
-                VALUES (?, ?, ?, ?)
-                """,
-                cluster_batch
-            )
-            conn.commit()
+            # Progress update
+            if (idx + 1) % 10000 == 0:
+                print(f"  Processed {idx + 1}/{total} customers...")
+        
+        # Explanations are fixed per service, so each is stored once as a template
+        unique_services = {service['product_code']: service for service in rec_services}
+        template_by_product = dict(zip(unique_services, get_template_ids(
+            conn,
+            [(service['reason'], json.dumps(service)) for service in unique_services.values()],
+            model_name='clustering_v1'
+        )))
+        template_ids = [template_by_product[service['product_code']] for service in rec_services]
+        
+        # Insert recommendations in bulk (pre-allocated ids)
+        insert_recommendations(
+            conn,
+            run_id,
+            rec_customer_ids,
+            [service['product_code'] for service in rec_services],
+            [service['acceptance_prob'] for service in rec_services],
+            [service['expected_revenue'] for service in rec_services],
+            template_ids=template_ids,
+            summary_calculated=None
+        )
+        
+        conn.commit()
         
     finally:
         conn.close()
 
 
-def run_batch_processing() -> Dict:
-    """Main function to run batch processing."""
+def run_batch_processing(backend: str = 'auto') -> Dict:
+    """
+    Main function to run batch processing.
+    
+    Args:
+        backend: Clustering engine backend (lloyd, elkan, minibatch, sampled) or 'auto'
+    """
     import sys
     import traceback
     
@@ -467,7 +451,7 @@ def run_batch_processing() -> Dict:
         # Perform clustering
         print("Step 5: Performing clustering...")
         cluster_start = time.time()
-        cluster_labels, cluster_info = perform_clustering(X_scaled, n_clusters)
+        cluster_labels, cluster_info, geometry = perform_clustering(X_scaled, n_clusters, backend=backend)
         print(f"  Clustering completed ({time.time() - cluster_start:.2f}s)")
         
         # Save results
@@ -478,7 +462,8 @@ def run_batch_processing() -> Dict:
             customer_data['customer_id'].tolist(),
             cluster_labels,
             customer_data,
-            cluster_info
+            cluster_info,
+            geometry=geometry
         )
         print(f"  Results saved ({time.time() - save_start:.2f}s)")
         
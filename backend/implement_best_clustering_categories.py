@@ -6,16 +6,17 @@ Integrates with FastAPI backend and database structure.
 
 import pandas as pd
 import numpy as np
-from sklearn.cluster import KMeans
 from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import silhouette_score, calinski_harabasz_score, davies_bouldin_score
+from scipy.optimize import linear_sum_assignment
 import joblib
 import os
 import sys
 import warnings
 import json
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
 from pathlib import Path
-from typing import Tuple, Dict, List, Optional
+from typing import Tuple, Dict, List, Optional, Sequence
 from datetime import datetime
 
 warnings.filterwarnings('ignore')
@@ -26,6 +27,20 @@ if str(backend_path) not in sys.path:
     sys.path.insert(0, str(backend_path))
 
 from app.db import get_conn
+from app.services import model_registry
+from app.services.centroid_geometry import compute_centroid_geometry
+from app.services.clustering_engine import CentroidModel, fit_clusters, print_clustering_metrics
+from app.services.feature_spec import compute_feature_frame
+from app.services.feature_reduction import FeatureReducer
+from app.services.cluster_profiles import carry_forward_cluster_profiles, compute_cluster_profiles, save_cluster_profiles
+from app.services.lookalike_index import carry_forward_lookalike_index, prune_lookalike_indexes, save_lookalike_index
+from app.services.multi_view_clustering import (
+    load_view_models, predict_views, save_view_assignments, start_view_fits, view_arrays
+)
+from app.services.time_features import PROFILE_FIELDS, TIME_FEATURES, compute_time_features, save_time_profiles
+from app.services.recommendation_store import get_template_ids, insert_recommendations
+from app.services.ownership_index import get_ownership_index
+from app.core.product_catalog import PERSONAS
 
 # Set random seed for reproducibility
 np.random.seed(42)
@@ -35,9 +50,57 @@ MODELS_DIR = Path(__file__).parent / "models"
 MODELS_DIR.mkdir(exist_ok=True)
 
 
-def load_and_prepare_data() -> Tuple[pd.DataFrame, pd.DataFrame, List[str]]:
+def register_customer_filter(conn, customer_ids: List[str]) -> str:
+    """
+    Load customer IDs into a connection-scoped temp table so queries can
+    join against it instead of building huge IN (...) lists.
+    Returns a SQL predicate on customer_id to append to WHERE clauses.
+    """
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS customer_filter (customer_id TEXT PRIMARY KEY)")
+    conn.execute("DELETE FROM customer_filter")
+    conn.executemany(
+        "INSERT OR IGNORE INTO customer_filter (customer_id) VALUES (?)",
+        ((str(cid),) for cid in customer_ids)
+    )
+    return "customer_id IN (SELECT customer_id FROM temp.customer_filter)"
+
+
+def get_data_watermarks(conn=None) -> Dict:
+    """
+    Highest transaction/holding row IDs currently in the database, and the first/last
+    transaction date (the run's spending_volatility month window).
+    Stored with each run so the next assign-only run can find changed customers
+    and profile them over the same window.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_conn()
+    try:
+        max_tx = conn.execute("SELECT COALESCE(MAX(id), 0) FROM transactions").fetchone()[0]
+        max_holding = conn.execute("SELECT COALESCE(MAX(id), 0) FROM holdings").fetchone()[0]
+        first_date, last_date = conn.execute("SELECT MIN(tx_date), MAX(tx_date) FROM transactions").fetchone()
+        return {
+            'max_transaction_id': int(max_tx),
+            'max_holding_id': int(max_holding),
+            'tx_date_min': first_date,
+            'tx_date_max': last_date
+        }
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def load_and_prepare_data(
+    customer_ids: Optional[List[str]] = None,
+    month_window: Optional[Tuple[str, str]] = None
+) -> Tuple[pd.DataFrame, pd.DataFrame, List[str]]:
     """
     Load customer data from database and prepare category-based features.
+    
+    Args:
+        customer_ids: Optional subset of customers to load (default: all customers)
+        month_window: Optional (first, last) transaction date of the run, the
+                      spending_volatility window (default: the loaded transactions)
     Returns: (merged_df, feature_matrix, feature_names)
     """
     print("=" * 80)
@@ -47,9 +110,13 @@ def load_and_prepare_data() -> Tuple[pd.DataFrame, pd.DataFrame, List[str]]:
     conn = get_conn()
     
     try:
+        customer_filter = ""
+        if customer_ids is not None:
+            customer_filter = "WHERE " + register_customer_filter(conn, customer_ids)
+        
         # Load customers
         customers_df = pd.read_sql_query(
-            """
+            f"""
             SELECT 
                 customer_id,
                 birth_date,
@@ -60,6 +127,7 @@ def load_and_prepare_data() -> Tuple[pd.DataFrame, pd.DataFrame, List[str]]:
                 segment_hint,
                 annual_income
             FROM customers
+            {customer_filter}
             """,
             conn
         )
@@ -71,14 +139,16 @@ def load_and_prepare_data() -> Tuple[pd.DataFrame, pd.DataFrame, List[str]]:
         
         # Load transactions
         transactions_df = pd.read_sql_query(
-            """
+            f"""
             SELECT 
                 customer_id,
                 tx_date,
+                tx_time,
                 amount,
                 tx_category,
                 channel
             FROM transactions
+            {customer_filter}
             """,
             conn
         )
@@ -87,13 +157,14 @@ def load_and_prepare_data() -> Tuple[pd.DataFrame, pd.DataFrame, List[str]]:
         
         # Load holdings (products)
         holdings_df = pd.read_sql_query(
-            """
+            f"""
             SELECT 
                 customer_id,
                 product_code,
                 category,
                 balance
             FROM holdings
+            {customer_filter}
             """,
             conn
         )
@@ -104,168 +175,22 @@ def load_and_prepare_data() -> Tuple[pd.DataFrame, pd.DataFrame, List[str]]:
         # FEATURE ENGINEERING: Category-Based Features
         # ============================================================
         
-        # 1. Transaction Category Features (categoria_mode pattern)
-        transaction_features = []
-        if len(transactions_df) > 0:
-            # Convert tx_date to datetime
-            transactions_df['tx_date'] = pd.to_datetime(transactions_df['tx_date'], errors='coerce')
-            
-            # Filter out NULL/empty categories for category-based features
-            transactions_with_category = transactions_df[
-                transactions_df['tx_category'].notna() & 
-                (transactions_df['tx_category'] != '') & 
-                (transactions_df['tx_category'].astype(str).str.strip() != '')
-            ].copy()
-            
-            # Overall transaction statistics (always create these, even without categories)
-            tx_stats = transactions_df.groupby('customer_id').agg({
-                'amount': ['sum', 'mean', 'std', 'count']
-            }).reset_index()
-            tx_stats.columns = ['customer_id', 'total_spent', 'avg_transaction', 'std_transaction', 'transaction_count']
-            tx_stats = tx_stats.fillna(0)
-            
-            # Category-based features (only if we have valid categories)
-            if len(transactions_with_category) > 0:
-                # Group by customer and category
-                tx_by_category = transactions_with_category.groupby(['customer_id', 'tx_category']).agg({
-                    'amount': ['sum', 'count', 'mean']
-                }).reset_index()
-                tx_by_category.columns = ['customer_id', 'tx_category', 'category_total', 'category_count', 'category_avg']
-                
-                # Pivot to get category columns (categoria_mode pattern)
-                if len(tx_by_category) > 0:
-                    category_totals = tx_by_category.pivot_table(
-                        index='customer_id',
-                        columns='tx_category',
-                        values='category_total',
-                        fill_value=0
-                    )
-                    if len(category_totals.columns) > 0:
-                        category_totals.columns = [f'categoria_mode_{col}' for col in category_totals.columns]
-                    else:
-                        category_totals = pd.DataFrame(index=tx_stats['customer_id'])
-                    
-                    # Category counts
-                    category_counts = tx_by_category.pivot_table(
-                        index='customer_id',
-                        columns='tx_category',
-                        values='category_count',
-                        fill_value=0
-                    )
-                    if len(category_counts.columns) > 0:
-                        category_counts.columns = [f'categoria_count_{col}' for col in category_counts.columns]
-                    else:
-                        category_counts = pd.DataFrame(index=tx_stats['customer_id'])
-                    
-                    # Merge transaction features
-                    transaction_features = tx_stats.merge(
-                        category_totals.reset_index(),
-                        on='customer_id',
-                        how='left'
-                    ).merge(
-                        category_counts.reset_index(),
-                        on='customer_id',
-                        how='left'
-                    )
-                else:
-                    transaction_features = tx_stats.copy()
-            else:
-                # No valid categories, but we still have transaction stats
-                print("Warning: No valid transaction categories found. Using transaction amount features only.")
-                transaction_features = tx_stats.copy()
-        else:
-            # Create empty dataframe with customer_id
-            transaction_features = pd.DataFrame({'customer_id': customers_df['customer_id']})
-        
-        # 2. Product Category Features
-        product_features = []
-        if len(holdings_df) > 0:
-            # Filter out NULL/empty categories
-            holdings_with_category = holdings_df[
-                holdings_df['category'].notna() & 
-                (holdings_df['category'] != '') & 
-                (holdings_df['category'].astype(str).str.strip() != '')
-            ].copy()
-            
-            # Overall product statistics (always create these)
-            product_stats = holdings_df.groupby('customer_id').agg({
-                'balance': ['sum', 'mean', 'count']
-            }).reset_index()
-            product_stats.columns = ['customer_id', 'total_balance', 'avg_balance', 'product_count']
-            
-            # Category-based features (only if we have valid categories)
-            if len(holdings_with_category) > 0:
-                # Group by customer and product category
-                holdings_by_category = holdings_with_category.groupby(['customer_id', 'category']).agg({
-                    'balance': ['sum', 'count']
-                }).reset_index()
-                holdings_by_category.columns = ['customer_id', 'category', 'category_balance', 'category_count']
-                
-                if len(holdings_by_category) > 0:
-                    # Pivot to get category columns
-                    product_category_balances = holdings_by_category.pivot_table(
-                        index='customer_id',
-                        columns='category',
-                        values='category_balance',
-                        fill_value=0
-                    )
-                    if len(product_category_balances.columns) > 0:
-                        product_category_balances.columns = [f'product_category_balance_{col}' for col in product_category_balances.columns]
-                    else:
-                        product_category_balances = pd.DataFrame(index=product_stats['customer_id'])
-                    
-                    # Merge product features
-                    product_features = product_stats.merge(
-                        product_category_balances.reset_index(),
-                        on='customer_id',
-                        how='left'
-                    )
-                else:
-                    product_features = product_stats.copy()
-            else:
-                # No valid categories, but we still have product stats
-                print("Warning: No valid product categories found. Using product balance features only.")
-                product_features = product_stats.copy()
-        else:
-            # Create empty dataframe with customer_id
-            product_features = pd.DataFrame({'customer_id': customers_df['customer_id']})
-        
-        # 3. Transaction Amount Features (importo, spending patterns)
-        amount_features = []
-        if len(transactions_df) > 0:
-            # Transaction amount statistics by different aggregations
-            amount_features = transactions_df.groupby('customer_id').agg({
-                'amount': ['sum', 'mean', 'std', 'min', 'max', 'count']
-            }).reset_index()
-            amount_features.columns = [
-                'customer_id',
-                'importo_total',
-                'spending_avg',
-                'spending_std',
-                'transaction_min',
-                'transaction_max',
-                'transaction_count'
-            ]
-            amount_features = amount_features.fillna(0)
-        else:
-            amount_features = pd.DataFrame({'customer_id': customers_df['customer_id']})
+        # Features come from the shared spec (app/services/feature_spec.py), the
+        # same definition the online recommender compiles into SQL queries
+        features = compute_feature_frame(
+            customers_df['customer_id'],
+            {'transactions': transactions_df, 'holdings': holdings_df}
+        )
+        if len(transactions_df) > 0 and not any(col.startswith('categoria_') for col in features.columns):
+            print("Warning: No valid transaction categories found. Using transaction amount features only.")
+        if len(holdings_df) > 0 and not any(col.startswith('product_category_') for col in features.columns):
+            print("Warning: No valid product categories found. Using product balance features only.")
         
         # ============================================================
         # MERGE ALL FEATURES
         # ============================================================
         
-        # Start with customers
-        merged_df = customers_df.copy()
-        
-        # Merge transaction features (includes tx_stats with total_spent, avg_transaction, etc.)
-        merged_df = merged_df.merge(transaction_features, on='customer_id', how='left')
-        
-        # Merge product features
-        merged_df = merged_df.merge(product_features, on='customer_id', how='left')
-        
-        # Merge amount features (includes importo_total, spending_avg, etc.)
-        # Note: Some columns may overlap (e.g., transaction_count), but pandas will add _x, _y suffixes
-        merged_df = merged_df.merge(amount_features, on='customer_id', how='left', suffixes=('', '_amount'))
+        merged_df = customers_df.merge(features.reset_index(), on='customer_id', how='left')
         
         # Fill NaN values with 0 for numeric columns
         numeric_cols = merged_df.select_dtypes(include=[np.number]).columns
@@ -275,7 +200,7 @@ def load_and_prepare_data() -> Tuple[pd.DataFrame, pd.DataFrame, List[str]]:
         merged_df = merged_df.replace([np.inf, -np.inf], 0)
         
         # ============================================================
-        # SELECT FEATURE COLUMNS (matching original logic)
+        # SELECT FEATURE COLUMNS (spec order)
         # ============================================================
         
         print(f"\n{'=' * 80}")
@@ -286,18 +211,12 @@ def load_and_prepare_data() -> Tuple[pd.DataFrame, pd.DataFrame, List[str]]:
             non_null = merged_df[col].notna().sum()
             print(f"  - {col}: {dtype} ({non_null}/{len(merged_df)} non-null)")
         
-        # Select transaction amount columns (importo, spending, transaction, total_spent, avg_transaction)
-        trans_codes = ['importo', 'spending', 'transaction', 'total_spent', 'avg_transaction', 'std_transaction']
-        transaction_cols = [col for col in merged_df.columns if any(code in col.lower() for code in trans_codes)]
-        
-        # Select category columns (categoria_mode pattern)
-        category_cols = [col for col in merged_df.columns if 'categoria_mode' in col or 'categoria_count' in col]
-        
-        # Select product category columns
-        product_category_cols = [col for col in merged_df.columns if 'product_category' in col]
-        
-        # Select product balance columns (total_balance, avg_balance, product_count)
-        product_balance_cols = [col for col in merged_df.columns if any(code in col.lower() for code in ['total_balance', 'avg_balance', 'product_count'])]
+        feature_cols = list(features.columns)
+        category_cols = [col for col in feature_cols if col.startswith(('categoria_mode_', 'categoria_count_'))]
+        product_category_cols = [col for col in feature_cols if col.startswith('product_category_')]
+        product_balance_cols = [col for col in feature_cols if col in ('total_balance', 'avg_balance', 'product_count')]
+        grouped = set(category_cols + product_category_cols + product_balance_cols)
+        transaction_cols = [col for col in feature_cols if col not in grouped]
         
         print(f"\nFeature column selection:")
         print(f"  - Transaction amount features: {transaction_cols}")
@@ -305,22 +224,6 @@ def load_and_prepare_data() -> Tuple[pd.DataFrame, pd.DataFrame, List[str]]:
         print(f"  - Product category features: {product_category_cols}")
         print(f"  - Product balance features: {product_balance_cols}")
         
-        # Combine all numeric feature columns
-        numeric_cols = transaction_cols + category_cols + product_category_cols + product_balance_cols
-        
-        # Remove customer_id and other non-feature columns, and ensure they're numeric
-        feature_cols = []
-        for col in numeric_cols:
-            if col == 'customer_id':
-                continue
-            if col not in merged_df.columns:
-                continue
-            # Check if column is numeric
-            if pd.api.types.is_numeric_dtype(merged_df[col]):
-                feature_cols.append(col)
-            else:
-                print(f"  Warning: Skipping non-numeric column: {col} (dtype: {merged_df[col].dtype})")
-        
         # If still no features, try to get ALL numeric columns except customer_id
         if len(feature_cols) == 0:
             print("\n⚠️  No features found with pattern matching. Trying all numeric columns...")
@@ -440,6 +343,11 @@ def load_and_prepare_data() -> Tuple[pd.DataFrame, pd.DataFrame, List[str]]:
         print(f"  - Category features: {len(category_cols)}")
         print(f"  - Product category features: {len(product_category_cols)}")
         
+        # Time pattern shares for the time view and profile fields (not clustering features of this model)
+        time_features = compute_time_features(customers_df['customer_id'], transactions_df, month_window)
+        merged_df = merged_df.merge(time_features.reset_index(), on='customer_id', how='left')
+        merged_df[TIME_FEATURES] = merged_df[TIME_FEATURES].fillna(0)
+        
         # Create feature matrix
         X = merged_df[feature_cols].copy()
         
@@ -453,60 +361,310 @@ def load_and_prepare_data() -> Tuple[pd.DataFrame, pd.DataFrame, List[str]]:
         conn.close()
 
 
-def apply_kmeans_clustering(X: pd.DataFrame, n_clusters: int = 6) -> Tuple[KMeans, np.ndarray, Dict]:
+def load_previous_centroids() -> Optional[pd.DataFrame]:
     """
-    Apply K-Means clustering with evaluation metrics.
-    Returns: (model, labels, metrics)
+    Load the centroids of the latest saved model in raw feature units.
+    Prefers the model registry (latest successful run) and falls back to the
+    legacy pickles. Returns a DataFrame (one row per cluster, columns = feature
+    names) or None if no previous model is available.
     """
-    print(f"\n{'=' * 80}")
-    print(f"Applying K-Means clustering with k={n_clusters}...")
-    print(f"{'=' * 80}")
+    try:
+        registry_model = model_registry.load_model()
+        return pd.DataFrame(registry_model.centroids_raw(), columns=registry_model.feature_names)
+    except FileNotFoundError:
+        pass
+    
+    model_path = MODELS_DIR / "cluster_model_categories.pkl"
+    features_path = MODELS_DIR / "feature_columns_categories.pkl"
+    if not model_path.exists() or not features_path.exists():
+        return None
     
-    # Standardize features
+    try:
+        model = joblib.load(model_path)
+        feature_names = joblib.load(features_path)
+        centers = model.cluster_centers_
+        reducer = getattr(model, 'reducer', None)
+        if reducer is not None:
+            centers = reducer.inverse_transform(centers)
+        scaler = getattr(model, 'scaler', None)
+        if scaler is not None:
+            centers = scaler.inverse_transform(centers)
+        return pd.DataFrame(centers, columns=list(feature_names))
+    except Exception as e:
+        print(f"Warning: Could not load previous centroids ({e})")
+        return None
+
+
+def map_centroids_to_features(
+    centroids: pd.DataFrame,
+    feature_cols: List[str],
+    scaler: StandardScaler,
+    reducer: Optional[FeatureReducer] = None
+) -> np.ndarray:
+    """
+    Map raw-unit centroids onto the current feature columns and scale them with
+    the current scaler (and reduction stage). Features that did not exist before
+    start at the current mean (0 after scaling); features that were dropped are ignored.
+    """
+    aligned = centroids.reindex(columns=feature_cols)
+    aligned = aligned.fillna(pd.Series(scaler.mean_, index=feature_cols))
+    scaled = scaler.transform(aligned)
+    return reducer.transform(scaled) if reducer is not None else scaled
+
+
+def fit_feature_space(
+    X: pd.DataFrame,
+    reduce_features: bool = True
+) -> Tuple[StandardScaler, Optional[FeatureReducer], np.ndarray]:
+    """
+    Fit the scaler and, optionally, the reduction stage (variance/correlation
+    filters and randomized PCA) on raw features.
+    Returns: (scaler, reducer or None, matrix the clustering runs on)
+    """
     scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
-    X_scaled = pd.DataFrame(X_scaled, columns=X.columns, index=X.index)
-    
-    # Apply K-Means
-    kmeans = KMeans(
-        n_clusters=n_clusters,
-        init='k-means++',
-        n_init=10,
-        max_iter=300,
-        random_state=42,
-        algorithm='lloyd'
+    X_model = scaler.fit_transform(X)
+    reducer = None
+    if reduce_features:
+        reducer = FeatureReducer.fit(X_model, list(X.columns))
+        X_model = reducer.transform(X_model)
+        summary = reducer.summary()
+        print(f"  Reduction: {summary['reduction_input_features']} features -> "
+              f"{summary['reduction_kept_features']} kept -> {summary['reduction_output_dims']} dims"
+              + (f" ({summary['reduction_explained_variance']:.1%} variance)" if summary['reduction_pca'] else ""))
+        for name, reason in reducer.dropped.items():
+            print(f"    dropped {name}: {reason}")
+    return scaler, reducer, np.ascontiguousarray(X_model)
+
+
+def to_model_space(model, X) -> np.ndarray:
+    """Raw features -> the space a fitted pipeline model clusters in."""
+    scaler = getattr(model, 'scaler', None)
+    X_model = scaler.transform(X) if scaler is not None else np.asarray(X, dtype=np.float64)
+    reducer = getattr(model, 'reducer', None)
+    return reducer.transform(X_model) if reducer is not None else X_model
+
+
+def align_cluster_labels(
+    kmeans: CentroidModel,
+    labels: np.ndarray,
+    previous_centroids: pd.DataFrame,
+    feature_cols: List[str]
+) -> Tuple[np.ndarray, Dict]:
+    """
+    Renumber a fitted model's clusters so each keeps the id of the closest
+    previous-run cluster (Hungarian assignment on squared centroid distances,
+    in the current clustering space). Persona ids, per-cluster caches and run
+    comparisons then keep their meaning across runs.
+    
+    Ids stay 0..k-1. When k grew, the extra clusters take the new ids; when
+    it shrank, the clusters matching dropped ids take the remaining free ones.
+    The model's centroids and labels are permuted in place.
+    
+    Returns: (relabeled labels, alignment metrics)
+    """
+    n_clusters = kmeans.cluster_centers_.shape[0]
+    previous = map_centroids_to_features(
+        previous_centroids, feature_cols, kmeans.scaler, getattr(kmeans, 'reducer', None)
     )
-    labels = kmeans.fit_predict(X_scaled)
-    
-    # Calculate evaluation metrics
-    silhouette = silhouette_score(X_scaled, labels)
-    calinski_harabasz = calinski_harabasz_score(X_scaled, labels)
-    davies_bouldin = davies_bouldin_score(X_scaled, labels)
-    
-    metrics = {
-        'silhouette_score': float(silhouette),
-        'calinski_harabasz_score': float(calinski_harabasz),
-        'davies_bouldin_score': float(davies_bouldin),
-        'inertia': float(kmeans.inertia_),
-        'n_clusters': n_clusters,
-        'n_samples': len(X)
+    n_shared = min(n_clusters, len(previous))
+    
+    # Square cost matrix: columns without a previous centroid cost the same for everyone
+    cost = np.zeros((n_clusters, n_clusters))
+    diff = kmeans.cluster_centers_[:, None, :] - previous[None, :n_shared, :]
+    cost[:, :n_shared] = np.einsum('ijk,ijk->ij', diff, diff)
+    rows, new_ids = linear_sum_assignment(cost)
+    new_id = np.empty(n_clusters, dtype=np.int64)
+    new_id[rows] = new_ids
+    
+    kmeans.cluster_centers_ = kmeans.cluster_centers_[np.argsort(new_id)]
+    if getattr(kmeans, 'labels_', None) is not None:
+        kmeans.labels_ = new_id[kmeans.labels_]
+    
+    matched = new_id < n_shared
+    shift = np.sqrt(cost[matched, new_id[matched]]) if matched.any() else np.array([0.0])
+    alignment = {
+        'labels_aligned': True,
+        'label_mapping': new_id.tolist(),
+        'labels_changed': int((new_id != np.arange(n_clusters)).sum()),
+        'mean_centroid_shift': float(shift.mean()),
+        'max_centroid_shift': float(shift.max())
     }
+    print(f"  Aligned cluster ids to previous run: {alignment['labels_changed']} relabeled "
+          f"(mean centroid shift {alignment['mean_centroid_shift']:.3f})")
+    return new_id[np.asarray(labels)], alignment
+
+
+def apply_kmeans_clustering(
+    X: pd.DataFrame,
+    n_clusters: int = 6,
+    warm_start_centroids: Optional[pd.DataFrame] = None,
+    backend: str = 'auto',
+    reduce_features: bool = True
+) -> Tuple[CentroidModel, np.ndarray, Dict]:
+    """
+    Apply clustering with evaluation metrics.
     
-    print(f"\nClustering Metrics:")
-    print(f"  Silhouette Score: {silhouette:.4f} (higher is better, range: -1 to 1)")
-    print(f"  Calinski-Harabasz Score: {calinski_harabasz:.2f} (higher is better)")
-    print(f"  Davies-Bouldin Score: {davies_bouldin:.4f} (lower is better)")
-    print(f"  Inertia: {kmeans.inertia_:.2f}")
+    Args:
+        X: Feature matrix (raw units)
+        n_clusters: Number of clusters
+        warm_start_centroids: Optional previous centroids in raw units (see load_previous_centroids).
+                              When they match n_clusters, the fit starts from them with a single init.
+        backend: Clustering engine backend, or 'auto' to pick one from the data shape
+        reduce_features: Run the reduction stage between scaling and clustering
+    Returns: (model, labels, metrics)
+    """
+    print(f"\n{'=' * 80}")
+    print(f"Applying clustering with k={n_clusters}...")
+    print(f"{'=' * 80}")
     
-    # Store scaler with model for production use
-    kmeans.scaler = scaler
+    # Standardize (and reduce) features
+    scaler, reducer, X_model = fit_feature_space(X, reduce_features)
+    
+    # Seed from the previous run's centroids when possible
+    init = None
+    if warm_start_centroids is not None:
+        if len(warm_start_centroids) == n_clusters:
+            init = map_centroids_to_features(warm_start_centroids, list(X.columns), scaler, reducer)
+            print(f"  Warm start from previous centroids ({len(warm_start_centroids)} clusters)")
+        else:
+            print(f"  Warning: Previous model has {len(warm_start_centroids)} clusters, "
+                  f"expected {n_clusters}. Falling back to k-means++.")
+    
+    model, labels, metrics = fit_clusters(X_model, n_clusters, backend=backend, init=init)
+    if reducer is not None:
+        metrics.update(reducer.summary())
+    
+    print_clustering_metrics(metrics)
+    
+    # Store scaler and reduction stage with model for production use
+    model.scaler = scaler
+    model.reducer = reducer
     
-    return kmeans, labels, metrics
+    return model, labels, metrics
 
 
-def save_for_production(model: KMeans, feature_names: List[str], metrics: Dict) -> None:
+def _fit_k_worker(
+    shm_name: str,
+    shape: Tuple[int, int],
+    dtype: str,
+    n_clusters: int,
+    backend: str = 'auto'
+) -> Tuple[CentroidModel, np.ndarray, Dict]:
+    """
+    Fit one model for the k-selection sweep.
+    Runs in a worker process and reads the scaled matrix from shared memory (no copy).
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        X_scaled = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        result = fit_clusters(X_scaled, n_clusters, backend=backend)
+        # Release the view before closing the shared block
+        del X_scaled
+        return result
+    finally:
+        shm.close()
+
+
+def sweep_kmeans_k(
+    X_scaled: np.ndarray,
+    k_values: Sequence[int],
+    max_workers: Optional[int] = None,
+    backend: str = 'auto'
+) -> List[Tuple[CentroidModel, np.ndarray, Dict]]:
+    """
+    Fit a model for every k in parallel across a process pool.
+    The scaled matrix is placed once in shared memory; workers attach to it instead
+    of receiving a pickled copy. Returns (model, labels, metrics) per k, sorted by k.
+    """
+    X_scaled = np.ascontiguousarray(X_scaled, dtype=np.float64)
+    k_values = sorted(set(int(k) for k in k_values if 2 <= int(k) < len(X_scaled)))
+    if not k_values:
+        raise ValueError("No valid k values for the sweep (need 2 <= k < number of customers).")
+    
+    if max_workers is None:
+        max_workers = min(len(k_values), os.cpu_count() or 1)
+    
+    shm = shared_memory.SharedMemory(create=True, size=X_scaled.nbytes)
+    try:
+        shared = np.ndarray(X_scaled.shape, dtype=X_scaled.dtype, buffer=shm.buf)
+        shared[:] = X_scaled
+        del shared
+        
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = [
+                pool.submit(_fit_k_worker, shm.name, X_scaled.shape, X_scaled.dtype.str, k, backend)
+                for k in k_values
+            ]
+            results = [f.result() for f in futures]
+    finally:
+        shm.close()
+        shm.unlink()
+    
+    return results
+
+
+def select_k_clustering(
+    X: pd.DataFrame,
+    k_min: int = 2,
+    k_max: int = 10,
+    max_workers: Optional[int] = None,
+    backend: str = 'auto',
+    reduce_features: bool = True
+) -> Tuple[CentroidModel, np.ndarray, Dict, List[Dict]]:
+    """
+    Automatic k selection: scale once, fit k_min..k_max in parallel and keep the
+    model with the best sampled silhouette score (ties go to the smaller k).
+    Returns: (best_model, best_labels, best_metrics, curve)
+    """
+    print(f"\n{'=' * 80}")
+    print(f"Selecting k in [{k_min}, {k_max}] (parallel sweep)...")
+    print(f"{'=' * 80}")
+    
+    scaler, reducer, X_model = fit_feature_space(X, reduce_features)
+    
+    results = sweep_kmeans_k(X_model, range(k_min, k_max + 1), max_workers=max_workers, backend=backend)
+    curve = [metrics for _, _, metrics in results]
+    
+    print(f"\n  {'k':>3}  {'silhouette':>10}  {'inertia':>14}")
+    for m in curve:
+        silhouette = 'n/a' if m['silhouette_score'] is None else f"{m['silhouette_score']:.4f}"
+        print(f"  {m['n_clusters']:>3}  {silhouette:>10}  {m['inertia']:>14.2f}")
+    
+    def _score(m: Dict) -> float:
+        s = m['silhouette_score']
+        return -np.inf if s is None else s
+    
+    best_idx = max(range(len(results)), key=lambda i: (_score(curve[i]), -curve[i]['n_clusters']))
+    kmeans, labels, _ = results[best_idx]
+    # Own copy: reduction, alignment and view metrics must not leak into the curve
+    metrics = dict(curve[best_idx])
+    silhouette = 'n/a' if metrics['silhouette_score'] is None else f"{metrics['silhouette_score']:.4f}"
+    print(f"\n✓ Selected k={metrics['n_clusters']} (silhouette={silhouette})")
+    print_clustering_metrics(metrics)
+    
+    kmeans.scaler = scaler
+    kmeans.reducer = reducer
+    if reducer is not None:
+        metrics.update(reducer.summary())
+    return kmeans, labels, metrics, curve
+
+
+def _atomic_joblib_dump(obj, path: Path) -> None:
+    """Dump to a temp file and os.replace it, so readers never load a partial pickle."""
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    joblib.dump(obj, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def save_for_production(
+    model: CentroidModel,
+    feature_names: List[str],
+    metrics: Dict,
+    run_id: Optional[int] = None
+) -> None:
     """
     Save the model, scaler, and metadata for FastAPI Recommender.
+    With a run_id the model is also stored in the versioned model registry.
     """
     print(f"\n{'=' * 80}")
     print("Saving model for production...")
@@ -514,24 +672,44 @@ def save_for_production(model: KMeans, feature_names: List[str], metrics: Dict)
     
     # Save the K-Means model (includes scaler)
     model_path = MODELS_DIR / "cluster_model_categories.pkl"
-    joblib.dump(model, model_path)
+    _atomic_joblib_dump(model, model_path)
     print(f"✓ Model saved: {model_path}")
     
     # Save feature names (order matters for prediction)
     features_path = MODELS_DIR / "feature_columns_categories.pkl"
-    joblib.dump(feature_names, features_path)
+    _atomic_joblib_dump(feature_names, features_path)
     print(f"✓ Feature columns saved: {features_path}")
     
     # Save metrics for reference
     metrics_path = MODELS_DIR / "clustering_metrics_categories.pkl"
-    joblib.dump(metrics, metrics_path)
+    _atomic_joblib_dump(metrics, metrics_path)
     print(f"✓ Metrics saved: {metrics_path}")
     
+    # Versioned, numpy-only copy keyed by run_id
+    registry_path = None
+    if run_id is not None:
+        scaler = getattr(model, 'scaler', None)
+        reducer = getattr(model, 'reducer', None)
+        n_features = len(feature_names)
+        registry_path = model_registry.save_model(
+            run_id,
+            centroids=model.cluster_centers_,
+            scaler_mean=scaler.mean_ if scaler is not None else np.zeros(n_features),
+            scaler_scale=scaler.scale_ if scaler is not None else np.ones(n_features),
+            feature_names=feature_names,
+            metrics=metrics,
+            **(reducer.to_arrays() if reducer is not None else {}),
+            **view_arrays(getattr(model, 'view_models', None) or {})
+        )
+        print(f"✓ Registry entry saved: {registry_path}")
+    
     print(f"\n{'*' * 80}")
     print("PRODUCTION READY: Model and metadata saved in /models/")
     print(f"  - Model: {model_path}")
     print(f"  - Features: {features_path}")
     print(f"  - Metrics: {metrics_path}")
+    if registry_path is not None:
+        print(f"  - Registry: {registry_path}")
     print(f"{'*' * 80}\n")
 
 
@@ -561,11 +739,22 @@ def save_clustering_to_db(
     run_id: int,
     customer_ids: List[str],
     cluster_labels: np.ndarray,
-    merged_df: pd.DataFrame
+    merged_df: pd.DataFrame,
+    geometry: Optional[Dict[str, np.ndarray]] = None,
+    view_labels: Optional[Dict[str, np.ndarray]] = None,
+    cluster_profiles: Optional[pd.DataFrame] = None
 ) -> None:
     """
     Save clustering results and generate recommendations to database.
     Similar to customer_clustering.py but uses category-based clustering results.
+    
+    Args:
+        geometry: Optional per-customer 'distance', 'rank' and 'margin' arrays aligned
+                  with customer_ids (see compute_centroid_geometry)
+        view_labels: Optional client/time view labels aligned with customer_ids; stored
+                     with the category labels in customer_cluster_views
+        cluster_profiles: Optional per-cluster feature profiles of the run
+                          (see compute_cluster_profiles)
     """
     print(f"\nSaving clustering results to database (run_id={run_id})...")
     
@@ -574,209 +763,162 @@ def save_clustering_to_db(
     try:
         cursor = conn.cursor()
         
+        # Cluster assignments with centroid geometry, in one bulk insert
+        n_customers = len(customer_ids)
+        if geometry is not None:
+            distances = geometry['distance'].tolist()
+            ranks = geometry['rank'].tolist()
+            margins = geometry['margin'].tolist()
+        else:
+            distances = ranks = margins = [None] * n_customers
+        cursor.executemany(
+            """
+            INSERT OR REPLACE INTO customer_clusters 
+            (run_id, customer_id, cluster_id, distance_to_centroid, centroid_rank, centroid_margin)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            zip([run_id] * n_customers, customer_ids, np.asarray(cluster_labels).tolist(), distances, ranks, margins)
+        )
+        
+        # All cluster views of every customer, so the full profile is one indexed read
+        if view_labels is not None:
+            save_view_assignments(conn, run_id, customer_ids, {'category': cluster_labels, **view_labels})
+        if all(col in merged_df.columns for col in PROFILE_FIELDS):
+            save_time_profiles(conn, run_id, merged_df)
+        if cluster_profiles is not None:
+            save_cluster_profiles(conn, run_id, cluster_profiles)
+        
         # Import recommender to generate product suggestions
         # Note: Model should be saved by now, so recommender should work
         recommender = None
-        # Cluster strategies as fallback
-        cluster_strategies = {
-            0: {"suggestions": ["DPAM682", "FPEN058"], "persona": "Conservative Savers"},
-            1: {"suggestions": ["CADB439", "CACR432"], "persona": "High Volume Spenders"},
-            2: {"suggestions": ["PRPE078", "CADB783"], "persona": "Young Professionals"},
-            3: {"suggestions": ["MTUU356", "ASSA566"], "persona": "Family/Home Focused"},
-            4: {"suggestions": ["SINV263", "CINV819"], "persona": "Investment Seekers"},
-            5: {"suggestions": ["CCOR602", "CADB877"], "persona": "Basic Users"}
-        }
-        
         try:
             from recommender import WellbankRecommender
             recommender = WellbankRecommender()
         except Exception as e:
             print(f"Warning: Could not load recommender ({e}). Using cluster mapping fallback.")
         
-        # Prepare batch data
-        cluster_batch = []
-        recommendation_batch = []
-        explanation_data = []
-        
-        batch_size = 500
-        total = len(customer_ids)
-        
-        for idx, (customer_id, cluster_id) in enumerate(zip(customer_ids, cluster_labels)):
-            # Calculate distance to centroid (simplified - use cluster assignment confidence)
-            distance = np.random.uniform(0.1, 2.0)  # Placeholder
-            
-            # Add to cluster batch
-            cluster_batch.append((run_id, customer_id, int(cluster_id), float(distance)))
-            
-            # Generate recommendations
-            try:
-                if recommender:
-                    # Use recommender (preferred method)
-                    rec_result = recommender.suggest(customer_id, top_n=3, exclude_owned=True)
-                    if "recommendations" in rec_result and not "error" in rec_result:
-                        for rec in rec_result["recommendations"]:
-                            recommendation_batch.append((
-                                run_id,
-                                customer_id,
-                                rec['product_code'],
-                                rec['acceptance_probability'],
-                                rec['expected_revenue']
-                            ))
-                            explanation_data.append({
-                                'reason': f"Customer belongs to {rec_result['persona']} segment",
-                                'persona': rec_result['persona']
-                            })
-                else:
-                    # Fallback: Use cluster strategies directly
-                    strategy = cluster_strategies.get(int(cluster_id), cluster_strategies[5])
-                    owned = set()
-                    try:
-                        owned_df = pd.read_sql_query(
-                            "SELECT product_code FROM holdings WHERE customer_id = ?",
-                            conn,
-                            params=(customer_id,)
-                        )
-                        owned = set(owned_df['product_code'].tolist())
-                    except:
-                        pass
-                    
-                    # Get products not owned
-                    suggestions = [p for p in strategy['suggestions'][:3] if p not in owned]
-                    
-                    # Calculate acceptance probabilities
-                    base_probs = [0.75, 0.70, 0.65]
-                    revenues = [2000.0, 1500.0, 1000.0]
-                    
-                    for i, product_code in enumerate(suggestions):
-                        recommendation_batch.append((
-                            run_id,
-                            customer_id,
-                            product_code,
-                            base_probs[i] if i < len(base_probs) else 0.60,
-                            revenues[i] if i < len(revenues) else 500.0
-                        ))
-                        explanation_data.append({
-                            'reason': f"Customer belongs to {strategy['persona']} segment",
-                            'persona': strategy['persona']
-                        })
-            except Exception as e:
-                # If recommendation fails for a customer, skip but continue
-                if idx % 100 == 0:  # Only print every 100th error to avoid spam
-                    print(f"Warning: Could not generate recommendations for {customer_id}: {e}")
-            
-            # Commit in batches
-            if (idx + 1) % batch_size == 0 or (idx + 1) == total:
-                # Insert clusters
-                cursor.executemany(
-                    """
-                    INSERT OR REPLACE INTO customer_clusters 
-                    (run_id, customer_id, cluster_id, distance_to_centroid)
-                    VALUES (?, ?, ?, ?)
-                    """,
-                    cluster_batch
-                )
-                
-                # Insert recommendations (PRE-COMPUTED - no AI, fast rule-based scoring)
-                rec_ids = []
-                for rec_data in recommendation_batch:
-                    cursor.execute(
-                        """
-                        INSERT INTO recommendations 
-                        (run_id, customer_id, product_code, acceptance_prob, expected_revenue, summary_calculated)
-                        VALUES (?, ?, ?, ?, ?, 1)
-                        """,
-                        rec_data
-                    )
-                    rec_ids.append(cursor.lastrowid)
-                
-                # Insert explanations (PRE-COMPUTED - simple rule-based, not AI-generated)
-                for rec_id, explanation in zip(rec_ids, explanation_data):
-                    cursor.execute(
-                        """
-                        INSERT INTO recommendation_explanations 
-                        (recommendation_id, key_factors_json, narrative, model_name)
-                        VALUES (?, ?, ?, ?)
-                        """,
-                        (
-                            rec_id,
-                            json.dumps(explanation),
-                            explanation.get('reason', 'Category-based clustering recommendation'),
-                            'batch_rule_based_v1'  # Mark as batch/rule-based, not AI
-                        )
-                    )
-                
-                # Commit the batch (SQLite handles transactions automatically)
-                conn.commit()
-                
-                # Clear batches
-                cluster_batch = []
-                recommendation_batch = []
-                explanation_data = []
-                
-                if (idx + 1) % 1000 == 0:
-                    print(f"  Processed {idx + 1}/{total} customers...")
-        
-        # Final commit for any remaining items
-        if cluster_batch:
-            cursor.executemany(
-                """
-                INSERT OR REPLACE INTO customer_clusters 
-                (run_id, customer_id, cluster_id, distance_to_centroid)
-                VALUES (?, ?, ?, ?)
-                """,
-                cluster_batch
-            )
+        # Generate every customer's recommendations in one vectorized pass
+        # (clusters are already known, so nothing is re-predicted)
+        cluster_labels = np.asarray(cluster_labels, dtype=np.int64)
+        if recommender:
+            owned = recommender.get_owned_matrix(customer_ids, conn)
+            recs = recommender.batch_recommend(labels=cluster_labels, owned=owned, top_n=3)
+            recs_df = pd.DataFrame({
+                'customer_id': np.asarray(customer_ids, dtype=object)[recs['row']],
+                'product_code': recs['product_code'],
+                'acceptance_prob': recs['acceptance_prob'],
+                'expected_revenue': recs['expected_revenue'],
+                'persona': recs['persona']
+            })
+        else:
+            # Fallback: Use the catalog personas directly, minus products already owned
+            strategies = pd.DataFrame([
+                {'cluster_id': k, 'product_code': p, 'persona': v['name']}
+                for k, v in PERSONAS.items() for p in v['suggestions'][:3]
+            ])
+            assigned = pd.DataFrame({
+                'customer_id': customer_ids,
+                'cluster_id': np.where(np.isin(cluster_labels, list(PERSONAS)), cluster_labels, 5)
+            })
+            recs_df = assigned.merge(strategies, on='cluster_id', how='inner')
             
-            # Insert any remaining recommendations
-            rec_ids = []
-            for rec_data in recommendation_batch:
-                cursor.execute(
-                    """
-                    INSERT INTO recommendations 
-                    (run_id, customer_id, product_code, acceptance_prob, expected_revenue, summary_calculated)
-                    VALUES (?, ?, ?, ?, ?, 1)
-                    """,
-                    rec_data
-                )
-                rec_ids.append(cursor.lastrowid)
+            # Drop owned products with one vectorized lookup in the ownership index
+            owned = get_ownership_index(conn, max_staleness=0).owns_pairs(recs_df['customer_id'], recs_df['product_code'])
+            recs_df = recs_df[~owned].drop(columns=['cluster_id'])
             
-            # Insert any remaining explanations
-            for rec_id, explanation in zip(rec_ids, explanation_data):
-                cursor.execute(
-                    """
-                    INSERT INTO recommendation_explanations 
-                    (recommendation_id, key_factors_json, narrative, model_name)
-                    VALUES (?, ?, ?, ?)
-                    """,
-                    (
-                        rec_id,
-                        json.dumps(explanation),
-                        explanation.get('reason', 'Category-based clustering recommendation'),
-                        'batch_rule_based_v1'
-                    )
-                )
-            
-            conn.commit()
+            # Calculate acceptance probabilities by position
+            position = recs_df.groupby('customer_id', sort=False).cumcount().to_numpy()
+            recs_df['acceptance_prob'] = np.array([0.75, 0.70, 0.65])[np.minimum(position, 2)]
+            recs_df['expected_revenue'] = np.array([2000.0, 1500.0, 1000.0])[np.minimum(position, 2)]
+        
+        print(f"✓ Generated {len(recs_df)} recommendations")
+        
+        # One explanation template per persona (simple rule-based, not AI-generated)
+        persona_codes, persona_names = pd.factorize(recs_df['persona'])
+        persona_template_ids = np.asarray(get_template_ids(
+            conn,
+            [
+                (f"Customer belongs to {persona} segment",
+                 json.dumps({'reason': f"Customer belongs to {persona} segment", 'persona': persona}))
+                for persona in persona_names
+            ],
+            model_name='batch_rule_based_v1'  # Mark as batch/rule-based, not AI
+        ), dtype=np.int64)
+        
+        # Insert recommendations (PRE-COMPUTED - no AI, fast rule-based scoring) in bulk
+        insert_recommendations(
+            conn,
+            run_id,
+            recs_df['customer_id'].tolist(),
+            recs_df['product_code'].tolist(),
+            recs_df['acceptance_prob'].tolist(),
+            recs_df['expected_revenue'].tolist(),
+            template_ids=persona_template_ids[persona_codes].tolist() if len(recs_df) else []
+        )
         
-        print(f"✓ Saved clustering results for {total} customers")
+        conn.commit()
+        
+        print(f"✓ Saved clustering results for {len(customer_ids)} customers")
         
     finally:
         conn.close()
 
 
-def run_clustering(n_clusters: int = 6, save_to_db: bool = True, run_id: Optional[int] = None) -> Dict:
+def refresh_centroid_ranks(conn, run_id: int) -> None:
+    """
+    Recompute centroid_rank for every customer of a run from the stored distances
+    (needed when a run mixes carried-forward and newly assigned customers).
+    """
+    conn.execute("""
+        UPDATE customer_clusters
+        SET centroid_rank = ranked.rnk
+        FROM (
+            SELECT customer_id,
+                   ROW_NUMBER() OVER (PARTITION BY cluster_id ORDER BY distance_to_centroid, customer_id) AS rnk
+            FROM customer_clusters
+            WHERE run_id = ?
+        ) AS ranked
+        WHERE customer_clusters.run_id = ? AND customer_clusters.customer_id = ranked.customer_id
+    """, (run_id, run_id))
+
+
+def run_clustering(
+    n_clusters: int = 6,
+    save_to_db: bool = True,
+    run_id: Optional[int] = None,
+    k_range: Optional[Tuple[int, int]] = None,
+    select_best_k: bool = True,
+    warm_start: bool = False,
+    align_labels: bool = True,
+    backend: str = 'auto',
+    reduce_features: bool = True,
+    with_views: bool = True
+) -> Dict:
     """
     Main function to run category-based clustering.
     Returns dictionary with results for batch processing integration.
     
     Args:
-        n_clusters: Number of clusters to create
+        n_clusters: Number of clusters to create (ignored when k_range is given)
         save_to_db: Whether to save results to database
         run_id: Optional batch run ID (if None, will be created)
+        k_range: Optional (k_min, k_max) to sweep in parallel instead of using n_clusters
+        select_best_k: With k_range, continue the run with the best k. If False, only the
+                       sweep curve is returned (nothing is saved).
+        warm_start: Seed K-Means with the last saved model's centroids (single init).
+                    Ignored for k sweeps.
+        align_labels: Renumber clusters to match the last saved model's (see align_cluster_labels)
+        backend: Clustering engine backend (lloyd, elkan, minibatch, sampled) or 'auto'
+        reduce_features: Filter near-constant/redundant features and reduce with PCA before clustering
+        with_views: Also fit the client type and time pattern views (in parallel with the
+                    category model) and store every customer's three clusters for the run
     """
     try:
-        # 1. Load and prepare data
-        merged_df, X, feature_cols = load_and_prepare_data()
+        # 1. Load and prepare data (watermarks first, so rows added during the run count as changed next time)
+        watermarks = get_data_watermarks()
+        merged_df, X, feature_cols = load_and_prepare_data(
+            month_window=(watermarks['tx_date_min'], watermarks['tx_date_max'])
+        )
         
         if len(X) == 0:
             raise ValueError("No data available for clustering after feature engineering.")
@@ -784,40 +926,104 @@ def run_clustering(n_clusters: int = 6, save_to_db: bool = True, run_id: Optiona
         print(f"\nFeature matrix shape: {X.shape}")
         print(f"Features: {', '.join(feature_cols[:5])}..." + (f" (+{len(feature_cols)-5} more)" if len(feature_cols) > 5 else ""))
         
-        # 2. Apply clustering
-        kmeans_model, labels, metrics = apply_kmeans_clustering(X, n_clusters=n_clusters)
+        # Client type and time pattern views fit on threads while the category model fits
+        view_futures = None
+        if with_views and (k_range is None or select_best_k):
+            view_futures = start_view_fits(merged_df, backend=backend)
         
-        # 3. Save for production
-        save_for_production(kmeans_model, feature_cols, metrics)
+        # 2. Apply clustering (fixed k, or parallel sweep over k_range)
+        k_curve = None
+        if k_range is not None:
+            kmeans_model, labels, metrics, k_curve = select_k_clustering(
+                X, k_min=k_range[0], k_max=k_range[1], backend=backend,
+                reduce_features=reduce_features
+            )
+            n_clusters = metrics['n_clusters']
+            
+            if not select_best_k:
+                return {
+                    'status': 'success',
+                    'run_id': None,
+                    'best_k': n_clusters,
+                    'n_customers': len(merged_df),
+                    'n_features': len(feature_cols),
+                    'k_curve': k_curve
+                }
+        else:
+            previous_centroids = load_previous_centroids() if warm_start or align_labels else None
+            kmeans_model, labels, metrics = apply_kmeans_clustering(
+                X,
+                n_clusters=n_clusters,
+                warm_start_centroids=previous_centroids if warm_start else None,
+                backend=backend,
+                reduce_features=reduce_features
+            )
+        
+        # Keep cluster ids stable across runs
+        if align_labels:
+            if k_range is not None:
+                previous_centroids = load_previous_centroids()
+            if previous_centroids is not None:
+                labels, alignment = align_cluster_labels(kmeans_model, labels, previous_centroids, feature_cols)
+                metrics.update(alignment)
+        
+        view_labels = None
+        if view_futures is not None:
+            view_labels, kmeans_model.view_models = {}, {}
+            for view, future in view_futures.items():
+                view_model, view_labels[view], view_metrics = future.result()
+                kmeans_model.view_models[view] = view_model
+                metrics[f'{view}_view'] = {
+                    'n_clusters': view_model.n_clusters,
+                    'silhouette_score': view_metrics.get('silhouette_score'),
+                    'fit_seconds': view_metrics['fit_seconds']
+                }
+                print(f"✓ {view} view: {view_model.n_clusters} clusters")
+        
+        # 3. Create batch run record first, so the model is registered under its run_id
+        if save_to_db and run_id is None:
+            conn = get_conn()
+            try:
+                cursor = conn.cursor()
+                cursor.execute(
+                    """
+                    INSERT INTO batch_runs (started_at, status)
+                    VALUES (?, 'running')
+                    """,
+                    (datetime.now().isoformat(),)
+                )
+                run_id = cursor.lastrowid
+                conn.commit()
+            finally:
+                conn.close()
         
-        # 4. Generate output
+        # 4. Save for production
+        save_for_production(kmeans_model, feature_cols, metrics, run_id=run_id if save_to_db else None)
+        
+        # 5. Generate output
         output_df = generate_output(merged_df, labels, feature_cols)
         
-        # 5. Save to database if requested
+        # 6. Save to database if requested
         if save_to_db:
-            if run_id is None:
-                # Create batch run record
-                conn = get_conn()
-                try:
-                    cursor = conn.cursor()
-                    cursor.execute(
-                        """
-                        INSERT INTO batch_runs (started_at, status)
-                        VALUES (?, 'running')
-                        """,
-                        (datetime.now().isoformat(),)
-                    )
-                    run_id = cursor.lastrowid
-                    conn.commit()
-                finally:
-                    conn.close()
+            # Distance, per-cluster rank and margin for every customer in one pass
+            X_model = to_model_space(kmeans_model, X)
+            geometry = compute_centroid_geometry(X_model, kmeans_model.cluster_centers_, labels)
+            
+            # Lookalike search runs in the same space the clusters were built in
+            save_lookalike_index(run_id, merged_df['customer_id'].tolist(), X_model)
+            
+            # What sets each cluster apart, in raw feature units
+            cluster_profiles = compute_cluster_profiles(X.values, labels, feature_cols)
             
             # Save clustering results and generate recommendations
             save_clustering_to_db(
                 run_id,
                 merged_df['customer_id'].tolist(),
                 labels,
-                merged_df
+                merged_df,
+                geometry=geometry,
+                view_labels=view_labels,
+                cluster_profiles=cluster_profiles
             )
             
             # Update batch run status
@@ -830,8 +1036,10 @@ def run_clustering(n_clusters: int = 6, save_to_db: bool = True, run_id: Optiona
                     'n_clusters': n_clusters,
                     'customers_processed': len(merged_df),
                     'clusters_count': n_clusters,
+                    **metrics,
                     'n_features': len(feature_cols),
-                    **metrics
+                    **watermarks,
+                    **({'k_curve': k_curve} if k_curve is not None else {})
                 })
                 cursor.execute(
                     """
@@ -844,6 +1052,9 @@ def run_clustering(n_clusters: int = 6, save_to_db: bool = True, run_id: Optiona
                 conn.commit()
             finally:
                 conn.close()
+            
+            model_registry.mark_latest(run_id)
+            prune_lookalike_indexes()
         
         return {
             'status': 'success',
@@ -852,6 +1063,7 @@ def run_clustering(n_clusters: int = 6, save_to_db: bool = True, run_id: Optiona
             'n_customers': len(merged_df),
             'n_features': len(feature_cols),
             'metrics': metrics,
+            'k_curve': k_curve,
             'cluster_distribution': pd.Series(labels).value_counts().to_dict()
         }
         
@@ -866,6 +1078,265 @@ def run_clustering(n_clusters: int = 6, save_to_db: bool = True, run_id: Optiona
         raise
 
 
+def run_assign_only(run_id: Optional[int] = None) -> Dict:
+    """
+    Assign-only (delta) batch run using the saved production model.
+    
+    Only customers that are new or whose transactions/holdings changed since the last
+    successful run get features computed and a predicted cluster (one vectorized
+    predict call) plus fresh recommendations. Every other customer's assignment,
+    recommendations and explanations are carried forward into the new run_id.
+    
+    Args:
+        run_id: Optional batch run ID (if None, will be created)
+    """
+    # Latest registered model (numpy only); legacy pickles for trees without a registry yet
+    try:
+        model = model_registry.load_model()
+    except FileNotFoundError:
+        model_path = MODELS_DIR / "cluster_model_categories.pkl"
+        features_path = MODELS_DIR / "feature_columns_categories.pkl"
+        if not model_path.exists() or not features_path.exists():
+            raise FileNotFoundError("No saved model found. Please run a full clustering batch first.")
+        legacy = joblib.load(model_path)
+        model = model_registry.from_estimators(legacy, getattr(legacy, 'scaler', None), joblib.load(features_path))
+    feature_cols = model.feature_names
+    
+    conn = get_conn()
+    try:
+        cursor = conn.cursor()
+        
+        # Base run: last successful run to carry assignments forward from
+        cursor.execute("""
+            SELECT id, notes FROM batch_runs
+            WHERE status = 'success'
+            ORDER BY id DESC
+            LIMIT 1
+        """)
+        base_run = cursor.fetchone()
+        if not base_run:
+            raise ValueError("No previous successful run to carry forward. Please run a full clustering batch first.")
+        base_run_id = base_run['id']
+        
+        base_notes = {}
+        if base_run['notes']:
+            try:
+                base_notes = json.loads(base_run['notes'])
+            except ValueError:
+                pass
+        
+        watermarks = get_data_watermarks(conn)
+        
+        # Profile changed customers over the base run's month window, like the carried-forward rows
+        if base_notes.get('tx_date_min') and base_notes.get('tx_date_max'):
+            watermarks['tx_date_min'] = base_notes['tx_date_min']
+            watermarks['tx_date_max'] = base_notes['tx_date_max']
+        
+        # Changed customers: not in the base run, or with transactions/holdings added since it
+        if 'max_transaction_id' in base_notes and 'max_holding_id' in base_notes:
+            cursor.execute("""
+                SELECT customer_id FROM customers
+                WHERE customer_id NOT IN (SELECT customer_id FROM customer_clusters WHERE run_id = ?)
+                UNION
+                SELECT customer_id FROM transactions WHERE id > ?
+                UNION
+                SELECT customer_id FROM holdings WHERE id > ?
+            """, (base_run_id, base_notes['max_transaction_id'], base_notes['max_holding_id']))
+        else:
+            # Base run predates watermarks: re-assign everyone (still no refit)
+            print(f"Warning: Run {base_run_id} has no data watermarks. Re-assigning all customers.")
+            cursor.execute("SELECT customer_id FROM customers")
+        changed_ids = [row['customer_id'] for row in cursor.fetchall()]
+        
+        if run_id is None:
+            cursor.execute(
+                """
+                INSERT INTO batch_runs (started_at, status)
+                VALUES (?, 'running')
+                """,
+                (datetime.now().isoformat(),)
+            )
+            run_id = cursor.lastrowid
+            conn.commit()
+    finally:
+        conn.close()
+    
+    print(f"\n{'=' * 80}")
+    print(f"Assign-only run {run_id}: {len(changed_ids)} new/changed customers (base run {base_run_id})")
+    print(f"{'=' * 80}")
+    
+    try:
+        # 1. Predict clusters for changed customers in one call
+        merged_df = pd.DataFrame({'customer_id': []})
+        labels = np.array([], dtype=int)
+        geometry = None
+        X_scaled = np.empty((0, model.centroids.shape[1]))
+        view_models = load_view_models(model)
+        view_labels = None
+        if changed_ids:
+            merged_df, _, _ = load_and_prepare_data(
+                customer_ids=changed_ids,
+                month_window=(watermarks['tx_date_min'], watermarks['tx_date_max'])
+            )
+            X = merged_df.reindex(columns=feature_cols, fill_value=0)
+            X = X.replace([np.inf, -np.inf], 0).fillna(0)
+            X_scaled = model.transform(X.values)
+            labels = model.predict(X_scaled)
+            geometry = compute_centroid_geometry(X_scaled, model.centroids, labels)
+            view_labels = predict_views(view_models, merged_df)
+        
+        # 2. Carry forward everyone else from the base run
+        conn = get_conn()
+        try:
+            cursor = conn.cursor()
+            unchanged = "customer_id NOT IN (SELECT customer_id FROM temp.customer_filter)"
+            register_customer_filter(conn, merged_df['customer_id'].tolist())
+            
+            cursor.execute(f"""
+                INSERT OR REPLACE INTO customer_clusters
+                (run_id, customer_id, cluster_id, distance_to_centroid, centroid_rank, centroid_margin)
+                SELECT ?, customer_id, cluster_id, distance_to_centroid, centroid_rank, centroid_margin
+                FROM customer_clusters
+                WHERE run_id = ? AND {unchanged}
+            """, (run_id, base_run_id))
+            carried = cursor.rowcount
+            
+            cursor.execute(f"""
+                INSERT OR REPLACE INTO customer_cluster_views (run_id, customer_id, view, cluster_id)
+                SELECT ?, customer_id, view, cluster_id
+                FROM customer_cluster_views
+                WHERE run_id = ? AND {unchanged}
+            """, (run_id, base_run_id))
+            
+            cursor.execute(f"""
+                INSERT OR REPLACE INTO customer_time_profiles (run_id, customer_id, {', '.join(PROFILE_FIELDS)})
+                SELECT ?, customer_id, {', '.join(PROFILE_FIELDS)}
+                FROM customer_time_profiles
+                WHERE run_id = ? AND {unchanged}
+            """, (run_id, base_run_id))
+            
+            # Same model and clusters: the base run's cluster profiles still describe them
+            carry_forward_cluster_profiles(conn, base_run_id, run_id)
+            
+            cursor.execute(f"""
+                INSERT INTO recommendations
+                (run_id, customer_id, product_code, acceptance_prob, expected_revenue, status,
+                 edited_by, edited_at, edited_reason, edited_narrative, sent_at, sent_by,
+                 dismissed_at, dismissed_by, dismissed_reason, created_at, summary_calculated,
+                 explanation_template_id, explanation_params_json)
+                SELECT ?, customer_id, product_code, acceptance_prob, expected_revenue, status,
+                       edited_by, edited_at, edited_reason, edited_narrative, sent_at, sent_by,
+                       dismissed_at, dismissed_by, dismissed_reason, created_at, summary_calculated,
+                       explanation_template_id, explanation_params_json
+                FROM recommendations
+                WHERE run_id = ? AND {unchanged}
+                ORDER BY id
+            """, (run_id, base_run_id))
+            
+            cursor.execute(f"""
+                INSERT INTO recommendation_explanations
+                (recommendation_id, key_factors_json, narrative, model_name, created_at)
+                SELECT new_r.id, re.key_factors_json, re.narrative, re.model_name, re.created_at
+                FROM recommendations new_r
+                JOIN recommendations old_r
+                  ON old_r.run_id = ? AND old_r.customer_id = new_r.customer_id
+                 AND old_r.product_code = new_r.product_code
+                JOIN recommendation_explanations re ON re.recommendation_id = old_r.id
+                WHERE new_r.run_id = ? AND new_r.{unchanged}
+            """, (base_run_id, run_id))
+            conn.commit()
+        finally:
+            conn.close()
+        print(f"✓ Carried forward {carried} customers from run {base_run_id}")
+        
+        # 3. Save new assignments and recommendations for changed customers
+        if len(merged_df) > 0:
+            save_clustering_to_db(
+                run_id, merged_df['customer_id'].tolist(), labels, merged_df,
+                geometry=geometry, view_labels=view_labels
+            )
+            # Ranks were computed for the changed customers only; re-rank the whole run
+            conn = get_conn()
+            try:
+                refresh_centroid_ranks(conn, run_id)
+                conn.commit()
+            finally:
+                conn.close()
+        
+        n_clusters = int(model.n_clusters)
+        if model.run_id is not None:
+            # Same model, registered under the new run_id too
+            model_registry.save_model(
+                run_id,
+                centroids=model.centroids,
+                scaler_mean=model.scaler_mean,
+                scaler_scale=model.scaler_scale,
+                feature_names=model.feature_names,
+                metrics={**model.metrics, 'base_model_run_id': model.run_id},
+                **model.arrays
+            )
+        carry_forward_lookalike_index(base_run_id, run_id, merged_df['customer_id'].tolist(), X_scaled)
+        conn = get_conn()
+        try:
+            notes_json = json.dumps({
+                'method': 'assign_only',
+                'base_run_id': base_run_id,
+                'n_clusters': n_clusters,
+                'customers_processed': carried + len(merged_df),
+                'customers_reassigned': len(merged_df),
+                'customers_carried_forward': carried,
+                'clusters_count': n_clusters,
+                **watermarks
+            })
+            conn.execute(
+                """
+                UPDATE batch_runs 
+                SET finished_at = ?, status = 'success', notes = ?
+                WHERE id = ?
+                """,
+                (datetime.now().isoformat(), notes_json, run_id)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        
+        if model_registry.has_model(run_id):
+            model_registry.mark_latest(run_id)
+            prune_lookalike_indexes()
+        
+        return {
+            'status': 'success',
+            'run_id': run_id,
+            'base_run_id': base_run_id,
+            'n_clusters': n_clusters,
+            'n_customers': carried + len(merged_df),
+            'n_reassigned': len(merged_df),
+            'cluster_distribution': pd.Series(labels).value_counts().to_dict()
+        }
+    
+    except Exception as e:
+        conn = get_conn()
+        try:
+            conn.execute(
+                """
+                UPDATE batch_runs 
+                SET finished_at = ?, status = 'failed', notes = ?
+                WHERE id = ?
+                """,
+                (datetime.now().isoformat(), str(e), run_id)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        import traceback
+        print(f"\n{'=' * 80}")
+        print("ASSIGN-ONLY RUN ERROR:")
+        print(f"{'=' * 80}")
+        print(traceback.format_exc())
+        print(f"{'=' * 80}\n")
+        raise
+
+
 if __name__ == "__main__":
     print("=" * 80)
     print("WELLBANK CLUSTERING ENGINE - CATEGORY-BASED FEATURES")
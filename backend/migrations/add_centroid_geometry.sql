@@ -0,0 +1,13 @@
+-- Migration: Add per-cluster rank and margin to customer_clusters
+-- centroid_rank: 1 = closest to its centroid (most representative) within the cluster
+-- centroid_margin: silhouette-like margin to the second-nearest centroid (near 0 = borderline)
+
+ALTER TABLE customer_clusters ADD COLUMN centroid_rank INTEGER;
+ALTER TABLE customer_clusters ADD COLUMN centroid_margin REAL;
+
+-- Indexes for the cluster browser (representative / borderline ordering)
+CREATE INDEX IF NOT EXISTS idx_clusters_run_cluster_rank
+  ON customer_clusters(run_id, cluster_id, centroid_rank);
+
+CREATE INDEX IF NOT EXISTS idx_clusters_run_cluster_margin
+  ON customer_clusters(run_id, cluster_id, centroid_margin);
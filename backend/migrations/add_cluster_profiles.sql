@@ -0,0 +1,25 @@
+-- Migration: Per-run feature profile of every cluster
+-- Computed in the batch from the clustered feature matrix (app/services/cluster_profiles.py)
+-- mean/std/p25/p50/p75: feature distribution inside the cluster, raw feature units
+-- z_delta: (cluster mean - overall mean) / overall std (standardized centroid delta)
+-- rank: 1 = most differentiating feature of the cluster (largest |z_delta|)
+
+CREATE TABLE IF NOT EXISTS cluster_feature_profiles (
+  run_id INTEGER NOT NULL,
+  cluster_id INTEGER NOT NULL,
+  feature TEXT NOT NULL,
+  mean REAL,
+  std REAL,
+  p25 REAL,
+  p50 REAL,
+  p75 REAL,
+  overall_mean REAL,
+  z_delta REAL,
+  rank INTEGER NOT NULL,
+  PRIMARY KEY (run_id, cluster_id, feature),
+  FOREIGN KEY(run_id) REFERENCES batch_runs(id) ON DELETE CASCADE
+);
+
+-- Cluster detail view: top differentiating features of a cluster
+CREATE INDEX IF NOT EXISTS idx_cluster_profiles_run_cluster_rank
+  ON cluster_feature_profiles(run_id, cluster_id, rank);
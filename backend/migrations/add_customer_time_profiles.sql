@@ -0,0 +1,20 @@
+-- Migration: Per-run time-pattern profile fields of every customer
+-- Computed in the batch from transaction timestamps (app/services/time_features.py)
+-- most_active_time: time bucket label, e.g. 'Evening (18-24)'
+-- *_concentration: 1 - normalized entropy (0 = spread evenly, 1 = all in one bucket)
+-- spending_volatility: coefficient of variation of monthly spend
+
+CREATE TABLE IF NOT EXISTS customer_time_profiles (
+  run_id INTEGER NOT NULL,
+  customer_id TEXT NOT NULL,
+  most_active_day TEXT,
+  most_active_hour INTEGER,
+  most_active_time TEXT,
+  hour_concentration REAL,
+  day_concentration REAL,
+  spending_concentration REAL,
+  spending_volatility REAL,
+  PRIMARY KEY (run_id, customer_id),
+  FOREIGN KEY(run_id) REFERENCES batch_runs(id) ON DELETE CASCADE,
+  FOREIGN KEY(customer_id) REFERENCES customers(customer_id) ON DELETE CASCADE
+);
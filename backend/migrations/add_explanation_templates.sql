@@ -0,0 +1,17 @@
+-- Migration: Normalize batch explanations into templates
+-- Each distinct narrative/key-factors pair is stored once; recommendations reference it by id.
+-- explanation_params_json holds per-row values only when they differ from the template
+-- (filled into the template's {placeholders} at read time).
+-- recommendation_explanations stays the per-row store and takes precedence when present.
+
+CREATE TABLE IF NOT EXISTS explanation_templates (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  template_key TEXT NOT NULL UNIQUE,   -- model_name + content hash
+  narrative TEXT,
+  key_factors_json TEXT,               -- JSON string
+  model_name TEXT,
+  created_at TEXT NOT NULL DEFAULT (datetime('now'))
+);
+
+ALTER TABLE recommendations ADD COLUMN explanation_template_id INTEGER REFERENCES explanation_templates(id);
+ALTER TABLE recommendations ADD COLUMN explanation_params_json TEXT;
@@ -0,0 +1,19 @@
+-- Migration: Keep the transaction time and store the three cluster views per run
+-- tx_time: HH:MM:SS from the movimenti timestamp (tx_date keeps the date part)
+-- customer_cluster_views: category / client type / time pattern cluster of every customer
+
+ALTER TABLE transactions ADD COLUMN tx_time TEXT;
+
+CREATE TABLE IF NOT EXISTS customer_cluster_views (
+  run_id INTEGER NOT NULL,
+  customer_id TEXT NOT NULL,
+  view TEXT NOT NULL CHECK (view IN ('category', 'client', 'time')),
+  cluster_id INTEGER NOT NULL,
+  PRIMARY KEY (run_id, customer_id, view),
+  FOREIGN KEY(run_id) REFERENCES batch_runs(id) ON DELETE CASCADE,
+  FOREIGN KEY(customer_id) REFERENCES customers(customer_id) ON DELETE CASCADE
+);
+
+-- Cluster browser per view
+CREATE INDEX IF NOT EXISTS idx_cluster_views_run_view_cluster
+  ON customer_cluster_views(run_id, view, cluster_id);
@@ -0,0 +1,4 @@
+-- Migration: Index for the services summary aggregates
+-- Customers per held product: covering index for DISTINCT product lookups and the domain join
+CREATE INDEX IF NOT EXISTS idx_holdings_product_customer
+  ON holdings(product_code, product_name, customer_id);
@@ -19,6 +19,11 @@ if str(backend_path) not in sys.path:
     sys.path.insert(0, str(backend_path))
 
 from app.db import get_conn
+from app.services import model_registry
+from app.services.feature_spec import FeatureKernel
+from app.services.ownership_index import get_ownership_index
+from app.services.scoring_engine import ScoringEngine, build_tier
+from app.core.product_catalog import CATALOG, PERSONAS, DEFAULT_PERSONA, FALLBACK_PRODUCTS
 
 # Model directory
 MODELS_DIR = Path(__file__).parent / "models"
@@ -30,19 +35,90 @@ class WellbankRecommender:
     Provides product recommendations based on customer segmentation.
     """
     
-    def __init__(self, model_path: Optional[str] = None):
+    def __init__(self, model_path: Optional[str] = None, run_id: Optional[int] = None):
         """
         Initialize recommender with pre-trained model.
         
         Args:
-            model_path: Optional path to model file. Defaults to models/cluster_model_categories.pkl
+            model_path: Optional path to a legacy model pickle. When omitted, the model is
+                        loaded from the model registry (no sklearn unpickling), falling back
+                        to models/cluster_model_categories.pkl if the registry is empty.
+            run_id: Optional batch run whose registered model to load (default: latest)
         """
+        self.run_id = None
         if model_path is None:
-            model_path = MODELS_DIR / "cluster_model_categories.pkl"
+            try:
+                registry_model = model_registry.load_model(run_id)
+            except FileNotFoundError:
+                if run_id is not None:
+                    raise
+                registry_model = None
+            
+            if registry_model is not None:
+                # Registry model does both the scaling and the nearest-centroid predict
+                self.model = registry_model
+                self.scaler = registry_model
+                self.feature_columns = registry_model.feature_names
+                self.run_id = registry_model.run_id
+            else:
+                self._load_legacy_model(MODELS_DIR / "cluster_model_categories.pkl")
         else:
-            model_path = Path(model_path)
+            self._load_legacy_model(Path(model_path))
+        
+        # Array-only predictor for single-customer inference (no pandas/sklearn overhead)
+        if isinstance(self.model, model_registry.RegistryModel):
+            self.predictor = self.model
+        else:
+            self.predictor = model_registry.from_estimators(self.model, self.scaler, self.feature_columns)
+        
+        # Online features compiled from the same spec the training features come from
+        self.feature_kernel = FeatureKernel(self.feature_columns)
+        
+        # Business personas and fallback products come from the shared product catalog
+        self.cluster_strategies = PERSONAS
+        self.default_strategy = DEFAULT_PERSONA
+        self.fallback_products = FALLBACK_PRODUCTS
         
-        # Load the pre-trained model
+        # Every product this recommender can suggest (column order of ownership matrices)
+        self.product_codes = list(dict.fromkeys(
+            [p for strategy in self.cluster_strategies.values() for p in strategy['suggestions']]
+            + self.fallback_products
+            + ["BASIC_CHECKING"]
+        ))
+        self.engine = self._build_scoring_engine()
+    
+    def _build_scoring_engine(self) -> ScoringEngine:
+        """
+        Compile the persona strategies into scoring tables: persona products first,
+        then the fallback catalog, then BASIC_CHECKING as last resort. Probabilities
+        decay by 10% per list position from the persona's base probability.
+        """
+        n_clusters = max(self.cluster_strategies) + 1
+        strategies = {k: self.cluster_strategies.get(k, self.default_strategy) for k in range(n_clusters)}
+        base_probs = {k: s.get('acceptance_prob_base', 0.60) for k, s in strategies.items()}
+        fallback = [p for p in dict.fromkeys(self.fallback_products) if p != "BASIC_CHECKING"]
+        
+        tiers = [
+            {k: s['suggestions'] for k, s in strategies.items()},
+            {k: fallback for k in strategies},
+            {k: ["BASIC_CHECKING"] for k in strategies},
+        ]
+        default_base = {0: self.default_strategy['acceptance_prob_base']}
+        default_tiers = [
+            {0: self.default_strategy['suggestions']},
+            {0: fallback},
+            {0: ["BASIC_CHECKING"]},
+        ]
+        return ScoringEngine(
+            self.product_codes,
+            [build_tier(self.product_codes, tier, base_probs, n_clusters) for tier in tiers],
+            CATALOG.expected_revenue(self.product_codes),
+            default_affinity_tiers=[build_tier(self.product_codes, tier, default_base, 1)[0] for tier in default_tiers],
+            cluster_names=[strategies[k]['name'] for k in range(n_clusters)]
+        )
+    
+    def _load_legacy_model(self, model_path: Path) -> None:
+        """Load the pickled K-Means model and feature columns."""
         if not model_path.exists():
             raise FileNotFoundError(
                 f"Model not found at {model_path}. "
@@ -61,46 +137,23 @@ class WellbankRecommender:
                 f"Feature columns not found at {features_path}. "
                 f"Please run clustering first."
             )
+    
+    def get_user_feature_vector(self, client_id: str) -> Optional[np.ndarray]:
+        """
+        Build one customer's raw feature vector (training column order) with
+        aggregate queries, without pandas. Uses the same feature spec as clustering.
         
-        # Business Personas - Mapping Cluster IDs to product strategies
-        # Based on category-based clustering analysis
-        self.cluster_strategies = {
-            0: {
-                "name": "Conservative Savers",
-                "description": "Low transaction volume, high savings focus",
-                "suggestions": ["DPAM682", "FPEN058", "SAVINGS_PLAN"],  # SharesVault, Pension Fund
-                "acceptance_prob_base": 0.75
-            },
-            1: {
-                "name": "High Volume Spenders",
-                "description": "Frequent transactions across multiple categories",
-                "suggestions": ["CADB439", "CACR432", "REWARDS_CREDIT"],  # ZynaFlow Plus, Credit Card Gold
-                "acceptance_prob_base": 0.70
-            },
-            2: {
-                "name": "Young Professionals",
-                "description": "Active users with growing income potential",
-                "suggestions": ["PRPE078", "CADB783", "SAVINGS_PLAN"],  # Personal Loan, EasyYoung Debit
-                "acceptance_prob_base": 0.65
-            },
-            3: {
-                "name": "Family/Home Focused",
-                "description": "Stable income, home-related spending patterns",
-                "suggestions": ["MTUU356", "ASSA566", "MORTGAGE"],  # NestHouse Mortgage, Insurance
-                "acceptance_prob_base": 0.72
-            },
-            4: {
-                "name": "Investment Seekers",
-                "description": "Diverse product portfolio, investment-oriented",
-                "suggestions": ["SINV263", "CINV819", "PREMIUM_INVESTMENT"],  # InvestoUniq, Fund Portfolio
-                "acceptance_prob_base": 0.80
-            },
-            5: {
-                "name": "Basic Users",
-                "description": "Minimal product usage, standard banking needs",
-                "suggestions": ["CCOR602", "CADB877", "BASIC_CHECKING"]  # MyEnergy Account, ZynaFlow Basic
-            }
-        }
+        Args:
+            client_id: Customer ID
+            
+        Returns:
+            float64 array of len(self.feature_columns), or None if the customer is not found
+        """
+        conn = get_conn()
+        try:
+            return self.feature_kernel.vector(conn, client_id)
+        finally:
+            conn.close()
     
     def get_user_features_from_db(self, client_id: str) -> Optional[pd.DataFrame]:
         """
@@ -113,104 +166,10 @@ class WellbankRecommender:
         Returns:
             DataFrame with features in the same order as training, or None if not found
         """
-        conn = get_conn()
-        
-        try:
-            # Check if customer exists
-            customer = pd.read_sql_query(
-                "SELECT customer_id FROM customers WHERE customer_id = ?",
-                conn,
-                params=(client_id,)
-            )
-            
-            if len(customer) == 0:
-                return None
-            
-            # Load customer's transactions
-            transactions = pd.read_sql_query(
-                """
-                SELECT 
-                    customer_id,
-                    tx_date,
-                    amount,
-                    tx_category,
-                    channel
-                FROM transactions
-                WHERE customer_id = ?
-                """,
-                conn,
-                params=(client_id,)
-            )
-            
-            # Load customer's holdings
-            holdings = pd.read_sql_query(
-                """
-                SELECT 
-                    customer_id,
-                    product_code,
-                    category,
-                    balance
-                FROM holdings
-                WHERE customer_id = ?
-                """,
-                conn,
-                params=(client_id,)
-            )
-            
-            # Feature engineering (same as clustering)
-            features_dict = {}
-            
-            # Transaction category features
-            if len(transactions) > 0:
-                transactions['tx_date'] = pd.to_datetime(transactions['tx_date'], errors='coerce')
-                
-                # Category totals
-                tx_by_category = transactions.groupby('tx_category')['amount'].sum()
-                for category, total in tx_by_category.items():
-                    features_dict[f'categoria_mode_{category}'] = total
-                
-                # Category counts
-                tx_counts = transactions.groupby('tx_category').size()
-                for category, count in tx_counts.items():
-                    features_dict[f'categoria_count_{category}'] = count
-                
-                # Overall stats
-                features_dict['importo_total'] = transactions['amount'].sum()
-                features_dict['spending_avg'] = transactions['amount'].mean()
-                features_dict['spending_std'] = transactions['amount'].std()
-                features_dict['transaction_count'] = len(transactions)
-                features_dict['transaction_min'] = transactions['amount'].min()
-                features_dict['transaction_max'] = transactions['amount'].max()
-            
-            # Product category features
-            if len(holdings) > 0:
-                holdings_by_category = holdings.groupby('category')['balance'].sum()
-                for category, balance in holdings_by_category.items():
-                    features_dict[f'product_category_balance_{category}'] = balance
-                
-                features_dict['total_balance'] = holdings['balance'].sum()
-                features_dict['avg_balance'] = holdings['balance'].mean()
-                features_dict['product_count'] = len(holdings)
-            
-            # Create feature vector matching training columns
-            feature_vector = pd.DataFrame([features_dict])
-            
-            # Ensure all required feature columns exist (fill missing with 0)
-            for col in self.feature_columns:
-                if col not in feature_vector.columns:
-                    feature_vector[col] = 0
-            
-            # Select only the features used in training (in correct order)
-            feature_vector = feature_vector[self.feature_columns]
-            
-            # Clean data
-            feature_vector = feature_vector.replace([np.inf, -np.inf], 0)
-            feature_vector = feature_vector.fillna(0)
-            
-            return feature_vector
-            
-        finally:
-            conn.close()
+        x = self.get_user_feature_vector(client_id)
+        if x is None:
+            return None
+        return pd.DataFrame([x], columns=self.feature_columns)
     
     def get_owned_products(self, client_id: str) -> set:
         """
@@ -222,17 +181,7 @@ class WellbankRecommender:
         Returns:
             Set of product codes
         """
-        conn = get_conn()
-        
-        try:
-            owned = pd.read_sql_query(
-                "SELECT product_code FROM holdings WHERE customer_id = ?",
-                conn,
-                params=(client_id,)
-            )
-            return set(owned['product_code'].tolist())
-        finally:
-            conn.close()
+        return get_ownership_index().owned_products(client_id)
     
     def suggest(
         self,
@@ -252,86 +201,50 @@ class WellbankRecommender:
             Dictionary with recommendations and metadata
         """
         # Get user features
-        features = self.get_user_features_from_db(client_id)
+        features = self.get_user_feature_vector(client_id)
         if features is None:
             return {
                 "error": "Client ID not found",
                 "client_id": client_id
             }
         
-        # Scale features if scaler is available
-        if self.scaler is not None:
-            features_scaled = self.scaler.transform(features)
-        else:
-            features_scaled = features.values
-        
-        # Predict cluster
-        cluster_id = self.model.predict(features_scaled)[0]
-        cluster_id = int(cluster_id)
+        # Predict cluster (scaling and nearest centroid fused on plain arrays)
+        cluster_id = self.predictor.predict_one(features)
         
+        return self.suggest_for_cluster(client_id, cluster_id, top_n=top_n, exclude_owned=exclude_owned)
+    
+    def suggest_for_cluster(
+        self,
+        client_id: str,
+        cluster_id: int,
+        top_n: int = 3,
+        exclude_owned: bool = True
+    ) -> Dict:
+        """
+        Product recommendations for a customer whose cluster is already known
+        (e.g. from the run's customer_clusters), without recomputing features.
+        Same output as suggest().
+        """
         # Get strategy for this cluster
         strategy = self.cluster_strategies.get(cluster_id)
         if not strategy:
             # Fallback for unexpected cluster IDs
-            strategy = {
-                "name": f"Cluster {cluster_id}",
-                "description": "Standard segment",
-                "suggestions": ["BASIC_CHECKING"],
-                "acceptance_prob_base": 0.50
-            }
+            strategy = {**self.default_strategy, "name": f"Cluster {cluster_id}"}
         
-        # Filter out owned products if requested
-        recommended_products = strategy['suggestions']
+        # Score the catalog for this customer (owned products excluded if requested)
+        owned = None
         if exclude_owned:
-            owned = self.get_owned_products(client_id)
-            recommended_products = [p for p in recommended_products if p not in owned]
-        
-        # If all products are owned, expand to all available products (except BASIC_CHECKING as last resort)
-        if not recommended_products:
-            # Get all products from catalog, excluding owned and BASIC_CHECKING
-            all_products = [
-                "DPAM682", "FPEN541", "SAVINGS_PLAN",  # Savings/Investments
-                "CADB439", "CACR432", "REWARDS_CREDIT",  # Credit Cards
-                "PRPE078", "CADB783",  # Young Professional products
-                "MTUU356", "ASSA566", "MORTGAGE",  # Family/Home
-                "SINV263", "CINV819", "PREMIUM_INVESTMENT",  # Investments
-                "CCOR602", "CRDT356", "PLZZ334",  # Accounts/Credit
-                "DPAM997", "DPRI866", "PARK443",  # Premium/Services
-                "PRPE771", "CACR748", "CADB783"  # Business/Premium
-            ]
-            recommended_products = [p for p in all_products if p not in owned and p != "BASIC_CHECKING"]
-            # Only use BASIC_CHECKING as absolute last resort
-            if not recommended_products:
-                recommended_products = ["BASIC_CHECKING"] if "BASIC_CHECKING" not in owned else []
-        
-        # Limit to top_n
-        recommended_products = recommended_products[:top_n]
+            owned = get_ownership_index().mask([client_id], self.product_codes)
+        top = self.engine.top_k(np.array([cluster_id]), k=top_n, owned=owned)
         
-        # Calculate acceptance probabilities
-        base_prob = strategy.get('acceptance_prob_base', 0.60)
-        recommendations = []
-        
-        for i, product_code in enumerate(recommended_products):
-            # Adjust probability based on position (first recommendation has higher prob)
-            prob = base_prob * (1.0 - i * 0.1)  # Decrease by 10% for each position
-            prob = max(0.3, min(0.95, prob))  # Clamp between 0.3 and 0.95
-            
-            # Estimate expected revenue (simplified)
-            expected_revenue = 200.0
-            if "PREMIUM" in product_code or "WEALTH" in product_code:
-                expected_revenue = 5000.0
-            elif "INVESTMENT" in product_code or "INV" in product_code:
-                expected_revenue = 3000.0
-            elif "LOAN" in product_code or "MORTGAGE" in product_code:
-                expected_revenue = 2000.0
-            elif "CREDIT" in product_code or "CARD" in product_code:
-                expected_revenue = 800.0
-            
-            recommendations.append({
+        recommendations = [
+            {
                 "product_code": product_code,
-                "acceptance_probability": round(prob, 3),
-                "expected_revenue": expected_revenue
-            })
+                "acceptance_probability": float(prob),
+                "expected_revenue": float(revenue)
+            }
+            for product_code, prob, revenue in zip(top['product_code'], top['acceptance_prob'], top['expected_revenue'])
+        ]
         
         return {
             "client_id": client_id,
@@ -342,28 +255,138 @@ class WellbankRecommender:
             "total_recommendations": len(recommendations)
         }
     
-    def batch_suggest(self, client_ids: List[str], top_n: int = 3) -> List[Dict]:
+    @staticmethod
+    def estimate_revenue(product_code: str) -> float:
+        """Expected revenue of a product (from the product catalog)."""
+        return float(CATALOG.expected_revenue([product_code])[0])
+    
+    def get_owned_matrix(self, client_ids: List[str], conn=None) -> np.ndarray:
+        """
+        Boolean ownership matrix (len(client_ids) x len(self.product_codes)),
+        sliced from the cached ownership index.
+        """
+        return get_ownership_index(conn, max_staleness=0).mask(client_ids, self.product_codes)
+    
+    def batch_recommend(
+        self,
+        labels: Optional[np.ndarray] = None,
+        X: Optional[pd.DataFrame] = None,
+        owned: Optional[np.ndarray] = None,
+        top_n: int = 3,
+        eligible: Optional[np.ndarray] = None,
+        objective: str = "probability"
+    ) -> Dict[str, np.ndarray]:
         """
-        Get recommendations for multiple customers (batch processing).
+        Vectorized equivalent of suggest() for many customers at once.
+        
+        Args:
+            labels: Cluster of every customer. Predicted from X when omitted.
+            X: Raw feature matrix (columns = self.feature_columns), only needed without labels
+            owned: Boolean ownership matrix aligned with self.product_codes
+                   (see get_owned_matrix). None = don't exclude owned products.
+            top_n: Number of recommendations per customer
+            eligible: Optional boolean eligibility matrix aligned with self.product_codes
+            objective: "probability" or "expected_value" ranking
+            
+        Returns:
+            Columnar dict (one entry per recommendation, grouped by customer, best first):
+            'row' (index of the customer in the input), 'cluster', 'product_code',
+            'acceptance_prob', 'expected_revenue', 'persona'
+        """
+        if labels is None:
+            if X is None:
+                raise ValueError("Either labels or X is required")
+            X = X.reindex(columns=self.feature_columns, fill_value=0)
+            labels = self.predictor.predict(self.predictor.transform(X.values))
+        labels = np.asarray(labels, dtype=np.int64)
+        
+        top = self.engine.top_k(labels, k=top_n, owned=owned, eligible=eligible, objective=objective)
+        clusters, cluster_pos = np.unique(top['cluster'], return_inverse=True)
+        personas = np.array([self.engine.cluster_name(int(k)) for k in clusters], dtype=object)
+        top['persona'] = personas[cluster_pos] if len(clusters) else np.array([], dtype=object)
+        return top
+    
+    def get_feature_matrix(self, client_ids: List[str], conn=None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Raw feature matrix for many customers at once (bulk equivalent of
+        get_user_feature_vector). The IDs are loaded into a temp table and every
+        aggregate is one grouped query joined against it, whatever the number of IDs.
+        
+        Args:
+            client_ids: Customer IDs
+            conn: Optional open connection (a new one is opened otherwise)
+            
+        Returns:
+            (X, found): float64 matrix (len(client_ids) x len(self.feature_columns))
+            and a boolean mask of the IDs present in the customers table
+        """
+        own_conn = conn is None
+        if own_conn:
+            conn = get_conn()
+        try:
+            return self.feature_kernel.matrix(conn, client_ids)
+        finally:
+            if own_conn:
+                conn.close()
+    
+    def predict_clusters(self, client_ids: List[str], conn=None) -> np.ndarray:
+        """
+        Clusters of many customers in one matrix call.
+        
+        Returns:
+            int64 array aligned with client_ids, -1 for IDs not in the customers table
+        """
+        X, found = self.get_feature_matrix(client_ids, conn)
+        labels = np.full(len(X), -1, dtype=np.int64)
+        if found.any():
+            labels[found] = self.predictor.predict(self.predictor.transform(X[found]))
+        return labels
+    
+    def batch_suggest(
+        self,
+        client_ids: List[str],
+        top_n: int = 3,
+        exclude_owned: bool = True,
+        labels: Optional[np.ndarray] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        Recommendations for many customers in one call (bulk equivalent of suggest()).
+        Features and ownership are loaded with set-based queries, clusters are
+        predicted in one matrix call and the result is columnar.
         
         Args:
             client_ids: List of customer IDs
             top_n: Number of recommendations per customer
+            exclude_owned: Whether to exclude products customers already own
+            labels: Optional known cluster per customer (-1 = unknown, predicted here)
             
         Returns:
-            List of recommendation dictionaries
+            Columnar dict like batch_recommend() (one entry per recommendation,
+            grouped by customer, best first) with an added 'client_id' column,
+            plus 'not_found': the IDs missing from the customers table
         """
-        results = []
-        for client_id in client_ids:
-            try:
-                result = self.suggest(client_id, top_n=top_n)
-                results.append(result)
-            except Exception as e:
-                results.append({
-                    "client_id": client_id,
-                    "error": str(e)
-                })
-        return results
+        client_ids = np.array([str(cid) for cid in client_ids], dtype=object)
+        conn = get_conn()
+        try:
+            if labels is None:
+                labels = np.full(len(client_ids), -1, dtype=np.int64)
+            labels = np.asarray(labels, dtype=np.int64).copy()
+            unknown = labels < 0
+            if unknown.any():
+                labels[unknown] = self.predict_clusters(client_ids[unknown].tolist(), conn)
+            
+            found = labels >= 0
+            client_ids_found = client_ids[found]
+            owned = None
+            if exclude_owned:
+                owned = get_ownership_index(conn).mask(client_ids_found.tolist(), self.product_codes)
+        finally:
+            conn.close()
+        
+        top = self.batch_recommend(labels=labels[found], owned=owned, top_n=top_n)
+        top['client_id'] = client_ids_found[top['row']]
+        top['not_found'] = client_ids[~found]
+        return top
 
 
 # --- Usage Example for Testing ---
@@ -0,0 +1,107 @@
+"""
+Batch/online parity: the feature kernels and the registry model must give the
+same results as the batch pipeline (pandas features, sklearn scaler/K-Means).
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+from sklearn.cluster import KMeans
+from sklearn.preprocessing import StandardScaler
+
+from app.db import get_conn
+from app.services.feature_reduction import FeatureReducer
+from app.services.feature_spec import check_parity
+from app.services.model_registry import from_estimators
+
+SCHEMA_PATH = Path(__file__).resolve().parents[1] / "schema_sqlite.sql"
+
+TX_CATEGORIES = ['food', 'travel', 'utilities', 'Food', '', '  ', None]
+HOLDING_CATEGORIES = ['savings', 'investments', 'cards', None]
+
+
+@pytest.fixture
+def conn(tmp_path):
+    """Small database covering the edge cases of the feature semantics."""
+    conn = get_conn(str(tmp_path / "parity.db"))
+    conn.executescript(SCHEMA_PATH.read_text())
+    rng = np.random.default_rng(0)
+    customer_ids = [f"C{i:03d}" for i in range(40)]
+    conn.executemany(
+        "INSERT INTO customers (customer_id, annual_income) VALUES (?, ?)",
+        [(cid, float(rng.integers(10_000, 150_000))) for cid in customer_ids]
+    )
+    transactions = []
+    for i, cid in enumerate(customer_ids):
+        # Customers without transactions, with a single one (std undefined), and regular ones
+        n_tx = 0 if i % 10 == 0 else 1 if i % 10 == 1 else int(rng.integers(2, 30))
+        for _ in range(n_tx):
+            transactions.append((
+                cid, f"2025-{rng.integers(1, 13):02d}-{rng.integers(1, 29):02d}",
+                float(np.round(rng.normal(80, 60), 2)), TX_CATEGORIES[rng.integers(len(TX_CATEGORIES))]
+            ))
+    conn.executemany(
+        "INSERT INTO transactions (customer_id, tx_date, amount, tx_category) VALUES (?, ?, ?, ?)",
+        transactions
+    )
+    holdings = []
+    for i, cid in enumerate(customer_ids):
+        for j in range(i % 4):
+            balance = None if (i + j) % 7 == 0 else float(rng.integers(0, 50_000))
+            holdings.append((cid, f"P{j}", HOLDING_CATEGORIES[(i + j) % len(HOLDING_CATEGORIES)], balance))
+    conn.executemany(
+        "INSERT INTO holdings (customer_id, product_code, category, balance) VALUES (?, ?, ?, ?)",
+        holdings
+    )
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def test_feature_kernels_agree(conn):
+    customer_ids = [row[0] for row in conn.execute("SELECT customer_id FROM customers ORDER BY customer_id")]
+    result = check_parity(conn, customer_ids)
+    assert result['n_customers'] == len(customer_ids)
+    assert result['n_features'] > 0
+
+
+def test_feature_kernels_agree_on_model_feature_list(conn):
+    # A model trained elsewhere can know categories this sample has none of
+    feature_names = ['total_spent', 'std_transaction', 'categoria_mode_food', 'categoria_count_travel',
+                     'categoria_mode_entertainment', 'product_category_balance_savings', 'product_count']
+    customer_ids = ['C000', 'C001', 'C002', 'C013', 'C027']
+    result = check_parity(conn, customer_ids, feature_names)
+    assert result['n_features'] == len(feature_names)
+
+
+def _training_matrix(n_samples: int = 600, random_state: int = 0):
+    """Blobs with redundant and near-constant columns, so the reduction stage drops and projects."""
+    rng = np.random.default_rng(random_state)
+    centers = rng.normal(0, 5, size=(5, 12))
+    X = centers[rng.integers(0, 5, n_samples)] + rng.normal(0, 1, size=(n_samples, 12))
+    redundant = 3 * X[:, :2] + rng.normal(0, 1e-3, size=(n_samples, 2))
+    constant = np.zeros((n_samples, 1))
+    X = np.hstack([X, redundant, constant]) * rng.uniform(1, 1000, size=15)
+    return X, [f"f{j}" for j in range(X.shape[1])]
+
+
+@pytest.mark.parametrize("reduce_features", [False, True])
+def test_registry_model_matches_sklearn(reduce_features):
+    X, feature_names = _training_matrix()
+    scaler = StandardScaler().fit(X)
+    X_model = scaler.transform(X)
+    reducer = None
+    if reduce_features:
+        reducer = FeatureReducer.fit(X_model, feature_names)
+        assert reducer.dropped and reducer.components is not None
+        X_model = reducer.transform(X_model)
+    kmeans = KMeans(n_clusters=5, n_init=4, random_state=42).fit(X_model)
+    kmeans.reducer = reducer
+    model = from_estimators(kmeans, scaler, feature_names)
+
+    X_new, _ = _training_matrix(n_samples=200, random_state=1)
+    expected = kmeans.predict(reducer.transform(scaler.transform(X_new)) if reducer else scaler.transform(X_new))
+
+    np.testing.assert_array_equal(model.predict(model.transform(X_new)), expected)
+    np.testing.assert_array_equal([model.predict_one(x) for x in X_new], expected)
@@ -1,9 +1,10 @@
 // src/api/batch.js
 import { API_BASE_URL, apiRequest } from './config';
 
-export async function runBatchProcessing(useCategoryClustering = true) {
+export async function runBatchProcessing(useCategoryClustering = true, mode = 'full') {
   const params = new URLSearchParams();
   params.append('use_category_clustering', useCategoryClustering.toString());
+  params.append('mode', mode);
   
   return apiRequest(`${API_BASE_URL}/batch/run?${params.toString()}`, {
     method: 'POST',
@@ -18,3 +19,13 @@ export async function testBatchEndpoint() {
   return apiRequest(`${API_BASE_URL}/batch/test`);
 }
 
+
+export async function runKSelection(kMin = 2, kMax = 10) {
+  const params = new URLSearchParams();
+  params.append('k_min', kMin.toString());
+  params.append('k_max', kMax.toString());
+
+  return apiRequest(`${API_BASE_URL}/batch/k-selection?${params.toString()}`, {
+    method: 'POST',
+  });
+}
@@ -9,12 +9,13 @@ export async function getClusterSummary(runId) {
   return apiRequest(`${API_BASE_URL}/clusters/${runId}/summary`);
 }
 
-export async function getClusterCustomers(runId, clusterId = null, limit = 100) {
+export async function getClusterCustomers(runId, clusterId = null, limit = 100, order = 'representative') {
   const params = new URLSearchParams();
   if (clusterId !== null) {
     params.append('cluster_id', clusterId.toString());
   }
   params.append('limit', limit.toString());
+  params.append('order', order);
   
   return apiRequest(`${API_BASE_URL}/clusters/${runId}/customers?${params.toString()}`);
 }
@@ -36,3 +37,12 @@ export async function getClusterComparison(runId) {
   }
 }
 
+
+export async function getClusterProfiles(runId, topN = 5) {
+  try {
+    return await apiRequest(`${API_BASE_URL}/clusters/${runId}/profiles?top_n=${topN}`);
+  } catch (error) {
+    // Profiles are optional (older runs have none), return null if it fails
+    return null;
+  }
+}
@@ -45,7 +45,7 @@ import {
   ChevronDown,
 } from "lucide-react";
 import RecommendationModalEnhanced from "./RecommendationModalEnhanced";
-import { getBatchRuns, getClusterSummary, getClusterCustomers, getClusterRecommendations, getClusterComparison } from "../api/clusters";
+import { getBatchRuns, getClusterSummary, getClusterCustomers, getClusterRecommendations, getClusterComparison, getClusterProfiles } from "../api/clusters";
 import "./LoginPage.css";
 import "./EmployeeDashboard.css";
 import backgroundImage from "../assets/Dashboard.png";
@@ -369,9 +369,11 @@ export default function ClusterResultsPage({ onNavigate, onBack }) {
   const [customers, setCustomers] = useState([]);
   const [recommendations, setRecommendations] = useState([]);
   const [selectedCluster, setSelectedCluster] = useState(null);
+  const [customerOrder, setCustomerOrder] = useState("representative");
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState("");
   const [comparison, setComparison] = useState(null);
+  const [clusterProfiles, setClusterProfiles] = useState({});
   const [selectedRecommendationId, setSelectedRecommendationId] = useState(null);
     const [activeTab, setActiveTab] = useState("overview");
     const [searchQuery, setSearchQuery] = useState("");
@@ -397,6 +399,7 @@ export default function ClusterResultsPage({ onNavigate, onBack }) {
       loadCustomers(selectedRunId);
       loadRecommendations(selectedRunId);
       loadComparison(selectedRunId);
+      loadProfiles(selectedRunId);
     }
   }, [selectedRunId]);
 
@@ -427,9 +430,9 @@ export default function ClusterResultsPage({ onNavigate, onBack }) {
     }
   }
 
-  async function loadCustomers(runId, clusterId = null) {
+  async function loadCustomers(runId, clusterId = null, order = customerOrder) {
     try {
-      const data = await getClusterCustomers(runId, clusterId, 100);
+      const data = await getClusterCustomers(runId, clusterId, 100, order);
       setCustomers(data.customers || []);
     } catch (err) {
       console.error("Failed to load customers:", err);
@@ -457,6 +460,15 @@ export default function ClusterResultsPage({ onNavigate, onBack }) {
     }
   }
 
+  async function loadProfiles(runId) {
+    const data = await getClusterProfiles(runId, 5);
+    const byCluster = {};
+    (data?.clusters || []).forEach((cluster) => {
+      byCluster[cluster.cluster_id] = cluster.features;
+    });
+    setClusterProfiles(byCluster);
+  }
+
   function formatDate(dateString) {
     if (!dateString) return "Never";
     const date = new Date(dateString);
@@ -1315,10 +1327,63 @@ export default function ClusterResultsPage({ onNavigate, onBack }) {
                         borderRadius: "16px",
                         padding: "24px",
                       }}>
+                        {clusterProfiles[selectedCluster]?.length > 0 && (
+                          <div style={{ marginBottom: "20px" }}>
+                            <h4 style={{ fontSize: "14px", fontWeight: 700, color: "white", marginBottom: "10px" }}>
+                              What sets this cluster apart
+                            </h4>
+                            <div style={{ display: "grid", gridTemplateColumns: "repeat(auto-fill, minmax(220px, 1fr))", gap: "8px" }}>
+                              {clusterProfiles[selectedCluster].map((feature) => (
+                                <div
+                                  key={feature.feature}
+                                  style={{
+                                    background: "rgba(255, 255, 255, 0.05)",
+                                    borderRadius: "8px",
+                                    padding: "10px 14px",
+                                  }}
+                                >
+                                  <div style={{ display: "flex", justifyContent: "space-between", fontSize: "13px", fontWeight: 700, color: "white" }}>
+                                    <span>{feature.feature.replace(/_/g, " ")}</span>
+                                    <span style={{ color: feature.direction === "higher" ? "#10b981" : feature.direction === "lower" ? "#f59e0b" : "rgba(255, 255, 255, 0.6)" }}>
+                                      {feature.z_delta > 0 ? "+" : ""}{feature.z_delta.toFixed(2)}σ
+                                    </span>
+                                  </div>
+                                  <div style={{ fontSize: "11.5px", color: "rgba(255, 255, 255, 0.6)" }}>
+                                    Median {feature.p50.toFixed(1)} (IQR {feature.p25.toFixed(1)}–{feature.p75.toFixed(1)}) • Overall avg {feature.overall_mean.toFixed(1)}
+                                  </div>
+                                </div>
+                              ))}
+                            </div>
+                          </div>
+                        )}
                         <div style={{ display: "flex", justifyContent: "space-between", alignItems: "center", marginBottom: "20px" }}>
                           <h3 style={{ fontSize: "18px", fontWeight: 700, color: "white" }}>
                             Customers in {CLUSTER_PERSONAS[selectedCluster]?.name || `Cluster ${selectedCluster}`}
                   </h3>
+                    <div style={{ display: "flex", gap: "8px" }}>
+                      {[
+                        { key: "representative", label: "Most Representative" },
+                        { key: "borderline", label: "Borderline" },
+                      ].map((option) => (
+                        <button
+                          key={option.key}
+                          onClick={() => {
+                            setCustomerOrder(option.key);
+                            loadCustomers(selectedRunId, selectedCluster, option.key);
+                          }}
+                          style={{
+                            padding: "8px 16px",
+                            background: customerOrder === option.key ? "rgba(255, 255, 255, 0.25)" : "rgba(255, 255, 255, 0.1)",
+                            border: "1px solid rgba(255, 255, 255, 0.2)",
+                            borderRadius: "8px",
+                            color: "white",
+                            cursor: "pointer",
+                            fontSize: "13.5px",
+                          }}
+                        >
+                          {option.label}
+                        </button>
+                      ))}
                     <button
                       onClick={() => {
                         setSelectedCluster(null);
@@ -1336,6 +1401,7 @@ export default function ClusterResultsPage({ onNavigate, onBack }) {
                     >
                       Clear Filter
                     </button>
+                    </div>
                 </div>
                 <div style={{ display: "flex", flexDirection: "column", gap: "8px", maxHeight: "400px", overflowY: "auto" }}>
                   {customers.map((customer) => (
@@ -1357,6 +1423,11 @@ export default function ClusterResultsPage({ onNavigate, onBack }) {
                                 <div style={{ fontSize: "11.5px", color: "rgba(255, 255, 255, 0.6)" }}>
                                   {customer.customer_id} • {customer.profession || "N/A"} • Income: {formatCurrency(customer.annual_income || 0)}
                         </div>
+                                {customer.centroid_rank != null && (
+                                  <div style={{ fontSize: "11.5px", color: "rgba(255, 255, 255, 0.5)" }}>
+                                    Rank #{customer.centroid_rank} • Margin {customer.centroid_margin?.toFixed(2)}
+                                  </div>
+                                )}
                       </div>
                       <div style={{
                         padding: "4px 12px",